@@ -0,0 +1,90 @@
+"""
+log_collector 메모리 벤치마크: json.load(예전 방식) vs 스트리밍 파서
+
+    python benchmarks/bench_collector_memory.py --size-mb 50
+
+합성 CloudTrail 파일(--size-mb 크기)을 만들어 두 방식으로 정규화하고
+tracemalloc 최대 메모리와 처리 시간을 비교한다.
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.log_collector import iter_file_events  # noqa: E402
+
+
+def make_record(i):
+    return {
+        "eventVersion": "1.08",
+        "userIdentity": {
+            "type": "IAMUser",
+            "arn": f"arn:aws:iam::123456789012:user/user{i % 50}",
+            "accountId": "123456789012",
+            "userName": f"user{i % 50}",
+        },
+        "eventTime": "2025-11-20T10:59:52Z",
+        "eventSource": ["ec2", "iam", "s3", "sts"][i % 4] + ".amazonaws.com",
+        "eventName": ["DescribeInstances", "CreateUser", "GetObject", "AssumeRole"][i % 4],
+        "awsRegion": "ap-northeast-2",
+        "sourceIPAddress": "192.0.2.0",
+        "userAgent": "aws-cli/2.13.5 Python/3.11.4 Linux/4.14",
+        "requestParameters": {"filter": "x" * 200},
+        "responseElements": None,
+        "requestID": f"req-{i}",
+        "eventID": f"evt-{i}",
+    }
+
+
+def write_synthetic(path: Path, size_mb: int):
+    """대략 size_mb 크기의 {"Records": [...]} 파일 생성"""
+    target = size_mb * 1024 * 1024
+    written = 0
+    n = 0
+    with path.open("w", encoding="utf-8") as f:
+        f.write('{"Records": [')
+        while written < target:
+            s = json.dumps(make_record(n))
+            if n:
+                f.write(",")
+            f.write(s)
+            written += len(s) + 1
+            n += 1
+        f.write("]}")
+    return n
+
+
+def measure(fp: Path, streaming: bool):
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    count = 0
+    for _ in iter_file_events(fp, streaming=streaming):
+        count += 1
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return count, peak, elapsed
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--size-mb", type=int, default=50)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fp = Path(tmp) / "synthetic_cloudtrail.json"
+        n = write_synthetic(fp, args.size_mb)
+        print(f"synthetic file: {fp.stat().st_size / 1e6:.1f} MB, {n} records")
+
+        for label, streaming in [("json.load", False), ("streaming", True)]:
+            count, peak, elapsed = measure(fp, streaming)
+            print(f"{label:>10}: {count} events, peak {peak / 1e6:8.1f} MB, {elapsed:6.2f}s")
+
+
+if __name__ == "__main__":
+    main()
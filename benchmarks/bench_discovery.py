@@ -0,0 +1,79 @@
+"""
+raw 로그 탐색 벤치마크: 평탄화 폴더 glob vs 파티션 폴더 재귀 탐색(+ mtime 캐시)
+
+    python benchmarks/bench_discovery.py --files 200000
+
+임시 폴더에 같은 수의 빈 .json.gz 파일을
+  flat/        : 한 폴더에 전부 (예전 s3_downloader 방식)
+  partitioned/ : account/region/YYYY/MM/DD 폴더
+로 만들고, 처음 탐색(캐시 없음)과 다시 탐색(캐시 있음, 새 파일 1개 추가) 시간을 비교한다.
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.log_discovery import discover_raw_files  # noqa: E402
+
+ACCOUNTS = ["111111111111", "222222222222"]
+REGIONS = ["us-east-1", "ap-northeast-2"]
+
+
+def make_tree(root: Path, n: int):
+    flat = root / "flat"
+    part = root / "partitioned"
+    flat.mkdir()
+    per_dir = max(1, n // (len(ACCOUNTS) * len(REGIONS) * 365))
+    i = 0
+    day = 0
+    while i < n:
+        acct = ACCOUNTS[day % len(ACCOUNTS)]
+        region = REGIONS[(day // len(ACCOUNTS)) % len(REGIONS)]
+        d = day // (len(ACCOUNTS) * len(REGIONS))
+        rel = f"{acct}/{region}/2025/{1 + d // 28 % 12:02d}/{1 + d % 28:02d}"
+        (part / rel).mkdir(parents=True, exist_ok=True)
+        for _ in range(per_dir):
+            if i >= n:
+                break
+            name = f"{acct}_CloudTrail_{region}_{i:08d}.json.gz"
+            (part / rel / name).touch()
+            (flat / name).touch()
+            i += 1
+        day += 1
+    return flat, part, rel
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--files", type=int, default=200_000)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        flat, part, last_rel = make_tree(tmp, args.files)
+        time.sleep(2.1)   # 방금 만든 폴더는 캐시하지 않으므로 잠시 대기
+
+        files, t_glob = timed(lambda: sorted(list(flat.glob("*.json")) + list(flat.glob("*.json.gz"))))
+        print(f"flat glob             : {len(files):>9,} files {t_glob:7.3f}s")
+
+        index = tmp / "index.json"
+        (files, _), t_cold = timed(lambda: discover_raw_files(part, index))
+        print(f"partitioned, cold     : {len(files):>9,} files {t_cold:7.3f}s")
+
+        (part / last_rel / "new.json.gz").touch()
+        (files, rescanned), t_warm = timed(lambda: discover_raw_files(part, index))
+        print(f"partitioned, warm     : {len(files):>9,} files {t_warm:7.3f}s "
+              f"(다시 나열한 폴더 {len(rescanned)}개)")
+
+
+if __name__ == "__main__":
+    main()
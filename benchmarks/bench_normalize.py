@@ -0,0 +1,117 @@
+"""
+normalize_event 마이크로벤치마크: 예전 구현 vs 캐시+intern dict vs NormalizedEvent 튜플
+
+    python benchmarks/bench_normalize.py --events 500000
+
+- CPU : 이미 파싱된 레코드를 정규화하는 데 걸린 이벤트당 시간
+- 메모리 : 레코드를 하나씩 json.loads → 정규화 → 원본은 버리고 결과만 보관할 때
+           (스트리밍 수집과 같은 상황) 결과 목록이 차지하는 tracemalloc 메모리
+"""
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.log_collector import normalize_event, normalize_event_tuple  # noqa: E402
+
+SOURCES = [f"{s}.amazonaws.com" for s in
+           ["ec2", "iam", "s3", "sts", "cloudtrail", "kms", "lambda", "logs", "rds", "ssm"]]
+ACTIONS = ["DescribeInstances", "CreateUser", "GetObject", "AssumeRole", "Decrypt", "Invoke"]
+
+
+def normalize_event_old(event: dict) -> dict:
+    """변경 전 normalize_event (캐시/intern 없음)"""
+    service = ""
+    src = event.get("eventSource")
+    if src:
+        service = src.split(".")[0].lower()
+
+    action = event.get("eventName") or "Unknown"
+
+    identity = event.get("userIdentity", {}) or {}
+    actor = identity.get("userName")
+    if not actor:
+        arn = identity.get("arn", "Unknown")
+        actor = arn.split("/")[-1] if "/" in arn else arn
+
+    result = "Allowed"
+    err = event.get("errorCode")
+    if err:
+        result = err
+
+    return {
+        "eventTime": event.get("eventTime", ""),
+        "service": service,
+        "action": action,
+        "actor": actor,
+        "result": result,
+        "region": event.get("awsRegion", ""),
+    }
+
+
+def make_lines(n):
+    rnd = random.Random(7)
+    lines = []
+    for i in range(n):
+        k = rnd.randrange(300)
+        identity = {"type": "AssumedRole", "arn": f"arn:aws:sts::123456789012:assumed-role/role{k % 40}/session{k}"}
+        if i % 3 == 0:
+            identity = {"type": "IAMUser", "userName": f"user{k}", "arn": f"arn:aws:iam::123456789012:user/user{k}"}
+        evt = {
+            "eventTime": f"2025-11-20T10:{i % 60:02d}:{i % 59:02d}Z",
+            "eventSource": SOURCES[k % len(SOURCES)],
+            "eventName": ACTIONS[k % len(ACTIONS)],
+            "awsRegion": "ap-northeast-2" if k % 5 else "us-east-1",
+            "userIdentity": identity,
+        }
+        if i % 13 == 0:
+            evt["errorCode"] = "AccessDenied"
+        lines.append(json.dumps(evt))
+    return lines
+
+
+def bench_cpu(records, fn, repeat=5):
+    """repeat 번 중 가장 빠른 값 (ns/event)"""
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for r in records:
+            fn(r)
+        best = min(best, time.perf_counter() - t0)
+    return best / len(records) * 1e9
+
+
+def bench_mem(lines, fn):
+    tracemalloc.start()
+    out = [fn(json.loads(line)) for line in lines]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del out
+    return current / len(lines)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--events", type=int, default=500_000)
+    args = ap.parse_args()
+
+    lines = make_lines(args.events)
+    records = [json.loads(line) for line in lines]
+
+    print(f"{args.events:,} events")
+    for label, fn in [("old dict", normalize_event_old),
+                      ("cached dict", normalize_event),
+                      ("NormalizedEvent", normalize_event_tuple)]:
+        fn(records[0])
+        ns = bench_cpu(records, fn)
+        per_evt = bench_mem(lines, fn)
+        print(f"{label:>16}: {ns:7.0f} ns/event CPU, {per_evt:7.0f} B/event retained")
+
+
+if __name__ == "__main__":
+    main()
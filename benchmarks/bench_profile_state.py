@@ -0,0 +1,91 @@
+"""
+프로파일 상태 증분 갱신 벤치마크: 매번 전체 재계산 vs 새로 append 된 구간만 fold
+
+    python benchmarks/bench_profile_state.py --events 1000000 --append 10000 --workers 4
+
+합성 parsed_logs.jsonl 을 임시 폴더에 만들고
+  1) 전체 집계 (workers 1 / N)
+  2) 이벤트를 append 한 뒤 증분 갱신
+  3) append 된 파일 전체 재집계
+시간을 재고, 증분 결과 user_summary 가 전체 재집계와 같은지 확인한다.
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src import user_profiler  # noqa: E402
+from src.user_profiler import fold_events, update_profile_state  # noqa: E402
+
+SERVICES = ["ec2", "iam", "s3", "sts", "cloudtrail", "kms", "lambda", "logs", "rds", "ssm"]
+ACTIONS = [f"Action{i}" for i in range(40)]
+REGIONS = ["ap-northeast-2", "us-east-1", "eu-west-1", "us-west-2"]
+
+
+def make_lines(n, n_actors, seed):
+    rnd = np.random.default_rng(seed)
+    actor_ids = np.minimum(rnd.zipf(1.3, n), n_actors) - 1
+    secs = rnd.integers(0, 30 * 86400, n)
+    times = np.datetime_as_string(np.datetime64("2025-11-01T00:00:00")
+                                  + secs.astype("timedelta64[s]"), unit="s")
+    services = rnd.integers(0, len(SERVICES), n)
+    actions = np.minimum(rnd.zipf(1.5, n), len(ACTIONS)) - 1
+    regions = rnd.integers(0, len(REGIONS), n)
+    for i in range(n):
+        yield json.dumps({
+            "eventTime": f"{times[i]}Z", "actor": f"user{actor_ids[i]}",
+            "service": SERVICES[services[i]], "action": ACTIONS[actions[i]],
+            "result": "Success", "region": REGIONS[regions[i]],
+        }) + "\n"
+
+
+def timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--events", type=int, default=1_000_000)
+    ap.add_argument("--append", type=int, default=10_000)
+    ap.add_argument("--actors", type=int, default=5_000)
+    ap.add_argument("--workers", type=int, default=4)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        parsed = Path(tmp) / "parsed_logs.jsonl"
+        state_path = Path(tmp) / "profile_state.json"
+        with open(parsed, "w", encoding="utf-8") as f:
+            f.writelines(make_lines(args.events, args.actors, seed=11))
+        size = parsed.stat().st_size
+        print(f"{args.events:,} events ({size / (1 << 20):.0f} MB), {args.actors:,} actors")
+
+        _, t_one = timed(fold_events, parsed, 0, size, workers=1)
+        print(f"  full fold, 1 worker      : {t_one:7.2f}s")
+        if args.workers > 1:
+            user_profiler.PARALLEL_BYTES = 0
+            _, t_par = timed(fold_events, parsed, 0, size, workers=args.workers)
+            print(f"  full fold, {args.workers} workers     : {t_par:7.2f}s  ({t_one / t_par:.1f}x)")
+
+        update_profile_state(parsed, state_path, workers=args.workers)
+        with open(parsed, "a", encoding="utf-8") as f:
+            f.writelines(make_lines(args.append, args.actors, seed=12))
+        (state, info), t_inc = timed(update_profile_state, parsed, state_path, workers=1)
+        print(f"  +{args.append:,} events incremental : {t_inc:7.2f}s  "
+              f"(+{info['new_bytes']:,} bytes, rebuilt={info['rebuilt']})")
+
+        full, t_full = timed(fold_events, parsed, 0, parsed.stat().st_size, workers=1)
+        print(f"  same events, full refold : {t_full:7.2f}s  ({t_full / t_inc:.1f}x)")
+        same = json.dumps(state.to_summary()) == json.dumps(full.to_summary())
+        print(f"  same summary: {same}")
+
+
+if __name__ == "__main__":
+    main()
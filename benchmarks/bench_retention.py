@@ -0,0 +1,102 @@
+"""
+일별 파티션 벤치마크: parsed_logs.jsonl 전체 규칙 매칭 vs --since 로 최근 파티션만 읽기
+
+    python benchmarks/bench_retention.py --events 1000000 --days 60 --since 24h
+
+합성 parsed_logs.jsonl (days 일치, 마지막 날이 오늘) 을 임시 폴더에 만들고
+  1) 파티션 생성 (처음 전체) / 이벤트 append 뒤 증분 갱신
+  2) 전체 파일 규칙 매칭 후 since 로 거르기 vs since 날짜 이후 파티션만 매칭
+시간을 재고, 두 방식의 알림 행이 같은지 확인한다.
+"""
+import argparse
+import json
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src import retention  # noqa: E402
+from src.log_analyzer import iter_alert_rows, load_rules  # noqa: E402
+
+SERVICES = ["ec2", "iam", "s3", "sts", "cloudtrail", "kms", "lambda", "logs", "rds", "ssm"]
+ACTIONS = ["CreateUser", "AttachUserPolicy", "StopLogging", "RunInstances", "GetObject",
+           "AssumeRole", "Decrypt", "PutObject", "DescribeInstances", "DeleteTrail"]
+
+
+def make_lines(n, days, seed):
+    rnd = np.random.default_rng(seed)
+    end = np.datetime64(datetime.now(timezone.utc).replace(tzinfo=None), "s")
+    secs = rnd.integers(0, days * 86400, n)
+    times = np.datetime_as_string(end - secs.astype("timedelta64[s]"), unit="s")
+    actors = rnd.integers(0, 2000, n)
+    services = rnd.integers(0, len(SERVICES), n)
+    actions = rnd.integers(0, len(ACTIONS), n)
+    for i in range(n):
+        yield json.dumps({
+            "eventTime": f"{times[i]}Z", "service": SERVICES[services[i]],
+            "action": ACTIONS[actions[i]], "actor": f"user{actors[i]}",
+            "result": "Allowed", "region": "ap-northeast-2", "account": "123456789012",
+        }) + "\n"
+
+
+def timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - t0
+
+
+def collect(paths, rules, since):
+    rows = []
+    for batch in iter_alert_rows(paths, rules, since=since):
+        rows.extend(batch)
+    return rows
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--events", type=int, default=1_000_000)
+    ap.add_argument("--days", type=int, default=60)
+    ap.add_argument("--append", type=int, default=10_000)
+    ap.add_argument("--since", default="24h")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        parsed = Path(tmp) / "parsed_logs.jsonl"
+        # 임시 폴더를 보도록 모듈 경로만 바꿈 (collector 상태 없음 → generation None)
+        retention.PARSED_PATH = parsed
+        retention.PARTITION_DIR = Path(tmp) / "partitions"
+        retention.PARTITION_STATE = retention.PARTITION_DIR / "_state.json"
+        retention.collector_generation = lambda: None
+
+        with open(parsed, "w", encoding="utf-8") as f:
+            f.writelines(make_lines(args.events, args.days, seed=3))
+        size = parsed.stat().st_size
+        print(f"{args.events:,} events over {args.days} days ({size / (1 << 20):.0f} MB)")
+
+        info, t_part = timed(retention.partition_events)
+        print(f"  partition (full)         : {t_part:7.2f}s  ({len(info['dates'])} dates)")
+        with open(parsed, "a", encoding="utf-8") as f:
+            f.writelines(make_lines(args.append, 1, seed=4))
+        info, t_inc = timed(retention.partition_events)
+        print(f"  +{args.append:,} events incremental : {t_inc:7.2f}s  "
+              f"(+{info['new_bytes']:,} bytes, rebuilt={info['rebuilt']})")
+
+        rules = load_rules()
+        since = retention.parse_since(args.since)
+        full, t_full = timed(collect, [parsed], rules, since)
+        paths = retention.partition_files(since=since)
+        part, t_since = timed(collect, paths, rules, since)
+        print(f"  --since {args.since}, full scan   : {t_full:7.2f}s")
+        print(f"  --since {args.since}, partitions  : {t_since:7.2f}s  ({t_full / t_since:.1f}x, "
+              f"{len(paths)} partitions)")
+        same = sorted(map(tuple, full)) == sorted(map(tuple, part))
+        print(f"  same rows: {same} ({len(part):,} alerts)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+JSON 직렬화 백엔드 벤치마크 (src/serializer.py)
+
+    python benchmarks/bench_serializer.py --events 1000000
+
+설치된 백엔드(orjson / msgspec / json)마다
+  - encode : 정규화 이벤트 dict → JSONL 줄 (collector 경로)
+  - decode : JSONL 줄 → dict (analyzer 행 단위 경로)
+  - typed  : JSONL 줄 → event_decoder 결과 (msgspec 이 있으면 Struct)
+처리량을 비교하고, 디코딩 결과가 표준 json 과 같은지 확인한다.
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.serializer import available_backends, get_backend, event_decoder  # noqa: E402
+
+FIELDS = ["eventTime", "actor", "service", "action", "result"]
+
+
+def make_events(n):
+    rnd = random.Random(3)
+    services = ["ec2", "iam", "s3", "sts", "cloudtrail", "kms", ""]
+    actions = ["DescribeInstances", "CreateUser", "GetObject", "AssumeRole", "Decrypt"]
+    return [{
+        "eventTime": f"2025-11-{1 + i % 28:02d}T10:{i % 60:02d}:52Z",
+        "service": rnd.choice(services),
+        "action": rnd.choice(actions),
+        "actor": f"사용자{rnd.randrange(500)}" if i % 7 == 0 else f"user{rnd.randrange(500)}",
+        "result": "Allowed" if i % 17 else "AccessDenied",
+        "region": "ap-northeast-2",
+    } for i in range(n)]
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--events", type=int, default=1_000_000)
+    args = ap.parse_args()
+
+    events = make_events(args.events)
+    n = len(events)
+    reference = get_backend("json")
+    ref_lines = [reference.dumps_line(e) for e in events]
+    ref_decoded = [reference.loads(line) for line in ref_lines]
+
+    print(f"{n:,} events, backends: {', '.join(available_backends())}")
+    for name in available_backends():
+        b = get_backend(name)
+        lines, t_enc = timed(lambda: [b.dumps_line(e) for e in events])
+        decoded, t_dec = timed(lambda: [b.loads(line) for line in lines])
+        decode, _ = event_decoder(FIELDS, backend=b)
+        typed, t_typed = timed(lambda: [decode(line) for line in lines])
+
+        same = decoded == ref_decoded and all(
+            t.get(f) == r.get(f) for t, r in zip(typed, ref_decoded) for f in FIELDS)
+        mb = sum(map(len, lines)) / 1e6
+        print(f"{name:>8}: encode {n / t_enc:>11,.0f}/s ({mb / t_enc:6.1f} MB/s) | "
+              f"decode {n / t_dec:>11,.0f}/s | typed {n / t_typed:>11,.0f}/s "
+              f"({type(typed[0]).__name__}) | same={same}")
+
+
+if __name__ == "__main__":
+    main()
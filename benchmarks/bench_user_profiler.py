@@ -0,0 +1,99 @@
+"""
+사용자 프로파일링 벤치마크: 예전 actor 별 groupby 루프 vs 벡터화 build_profiles
+
+    python benchmarks/bench_user_profiler.py --events 1000000 --actors 5000
+
+합성 alerts DataFrame 으로 두 구현의 시간을 재고, 결과 dict(user_summary.json 내용)가 같은지 확인한다.
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.user_profiler import build_profiles  # noqa: E402
+
+SERVICES = ["ec2", "iam", "s3", "sts", "cloudtrail", "kms", "lambda", "logs", "rds", "ssm"]
+ACTIONS = [f"Action{i}" for i in range(40)]
+REGIONS = ["ap-northeast-2", "us-east-1", "eu-west-1", "us-west-2"]
+
+
+def extract_hour(timestamp):
+    try:
+        return datetime.fromisoformat(timestamp.replace("Z", "")).hour
+    except Exception:
+        return None
+
+
+def build_profiles_old(df):
+    """변경 전 generate_user_profile 의 프로파일 계산"""
+    profiles = {}
+    for user, group in df.groupby("actor"):
+        profile = {
+            "total_events": len(group),
+            "services": group["service"].value_counts().to_dict(),
+            "actions": group["action"].value_counts().head(5).to_dict(),
+        }
+        if "region" in group.columns:
+            profile["regions"] = group["region"].value_counts().to_dict()
+        hours = group["time"].dropna().apply(extract_hour).dropna()
+        if not hours.empty:
+            hour_bins = pd.cut(hours, bins=[0, 6, 12, 18, 24],
+                               labels=["00-06", "06-12", "12-18", "18-24"], right=False)
+            profile["time_distribution"] = hour_bins.value_counts().sort_index().to_dict()
+        profiles[user] = profile
+    return profiles
+
+
+def make_frame(n, n_actors):
+    rnd = np.random.default_rng(11)
+    # 실제 trail 처럼 소수 actor 가 대부분의 이벤트를 차지하도록 (Zipf)
+    actor_ids = np.minimum(rnd.zipf(1.3, n), n_actors) - 1
+    secs = rnd.integers(0, 30 * 86400, n)
+    base = np.datetime64("2025-11-01T00:00:00")
+    times = np.datetime_as_string(base + secs.astype("timedelta64[s]"), unit="s")
+    df = pd.DataFrame({
+        "time": [t + "Z" for t in times],
+        "actor": np.array([f"user{i}" for i in range(n_actors)], dtype=object)[actor_ids],
+        "service": np.array(SERVICES, dtype=object)[rnd.integers(0, len(SERVICES), n)],
+        "action": np.array(ACTIONS, dtype=object)[np.minimum(rnd.zipf(1.5, n), len(ACTIONS)) - 1],
+        "region": np.array(REGIONS, dtype=object)[rnd.integers(0, len(REGIONS), n)],
+    })
+    df.loc[::97, "service"] = None
+    df.loc[::101, "time"] = "invalid"
+    return df
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--events", type=int, default=1_000_000)
+    ap.add_argument("--actors", type=int, default=5_000)
+    args = ap.parse_args()
+
+    df = make_frame(args.events, args.actors)
+    n_actors = df["actor"].nunique()
+    print(f"{len(df):,} events, {n_actors:,} actors")
+
+    new, t_new = timed(build_profiles, df)
+    print(f"  vectorized : {t_new:7.2f}s")
+    old, t_old = timed(build_profiles_old, df)
+    print(f"  groupby loop: {t_old:7.2f}s  ({t_old / t_new:.1f}x)")
+
+    same = json.dumps(old, sort_keys=True) == json.dumps(new, sort_keys=True)
+    print(f"  same values: {same}, same key order: {json.dumps(old) == json.dumps(new)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,13 @@ import pandas as pd
 import streamlit as st
 import altair as alt
 
+from src.event_store import STORE_DIR, alerts_available, load_alerts as load_alert_store
+from src.rollups import (ROLLUP_PARQUET, ROLLUP_CSV, ARCHIVE_PARQUET, ARCHIVE_CSV, OTHER_ACTOR,
+                         load_rollups, rollup_from_alerts)
+from src.event_index import INDEX_PATH, EventIndex, index_available
+from src.top_events import TOP_EVENTS_PATH, load_top_events, top_frame
+from src.sketches import SKETCHES_PATH, load_sketches, unique_actors, heavy_hitters
+
 BASE = Path(__file__).resolve().parent
 OUT  = BASE / "out"
 
@@ -18,14 +25,37 @@ st.set_page_config(page_title="Cloud Forensic Dashboard (V4)", layout="wide")
 st.title("☁️ Cloud Forensic Dashboard (V4)")
 st.caption("AWS CloudTrail 기반 자동 분석 리포트 (alerts.csv, anomalies.csv, user_summary.json)")
 
+# ---------- 캐시 ----------
+# 캐시는 프로세스 전체(모든 세션)가 공유한다.
+# 키에 출력 파일의 (mtime, size) 를 넣어 두면 파이프라인이 새 출력을 교체했을 때
+# 다음 rerun 에서 키가 바뀌어 한 번만 다시 읽고, 예전 키 항목은 max_entries 에 밀려 사라진다.
+CACHE_ENTRIES = int(os.environ.get("DASHBOARD_CACHE_ENTRIES", "8"))
+
+def file_stamp(*paths):
+    """파일들의 (mtime_ns, size) 튜플 (없는 파일은 None)"""
+    stamp = []
+    for p in paths:
+        try:
+            s = p.stat()
+            stamp.append((s.st_mtime_ns, s.st_size))
+        except FileNotFoundError:
+            stamp.append(None)
+    return tuple(stamp)
+
+def alerts_stamp():
+    return file_stamp(ALERTS, STORE_DIR / "_SUCCESS")
+
 # ---------- 데이터 로드 ----------
-def load_alerts():
-    if not ALERTS.exists():
+# 큰 DataFrame 은 cache_resource 로 세션끼리 같은 객체를 공유 (복사 없음 → 읽기 전용으로만 사용)
+@st.cache_resource(max_entries=CACHE_ENTRIES, show_spinner=False)
+def load_alerts(stamp, date_range=None):
+    """원본 이벤트 (Top/Recent 테이블 drill-down 용, 날짜 범위는 event_store 파티션으로 먼저 거름)"""
+    if not alerts_available():
         return pd.DataFrame()
-    df = pd.read_csv(ALERTS)
-    # 컬럼 표준화
+    # event_store(Parquet)가 있으면 그걸, 없으면 alerts.csv 를 읽음
     expected = ["time","actor","service","action","result","risk_score","reason"]
-    df = df[[c for c in expected if c in df.columns]]
+    date_from, date_to = date_range if date_range else (None, None)
+    df = load_alert_store(columns=expected, date_from=date_from, date_to=date_to)
     # 시간 파싱 & 파생
     if "time" in df.columns:
         df["time"] = pd.to_datetime(df["time"], errors="coerce")
@@ -35,64 +65,136 @@ def load_alerts():
         df["risk_score"] = pd.to_numeric(df["risk_score"], errors="coerce")
     return df
 
-def load_csv(path):
+@st.cache_resource(max_entries=CACHE_ENTRIES, show_spinner=False)
+def load_rollup(stamp):
+    """
+    시간 × service × actor × action × risk_score 사전 집계 (KPI / 차트용)
+    rollup 이 없는 예전 출력이면 alerts 에서 바로 계산
+    """
+    rollup = load_rollups()
+    if rollup is None:
+        if not alerts_available():
+            return pd.DataFrame()
+        raw = load_alert_store(columns=["time","actor","service","action","result","risk_score"])
+        rollup = rollup_from_alerts(raw)
+    rollup["date"] = rollup["hour"].dt.date
+    return rollup
+
+@st.cache_resource(max_entries=CACHE_ENTRIES, show_spinner=False)
+def load_actor_rollup(stamp, actor):
+    """
+    sketch 모드 rollup 은 actor 를 나누지 않으므로 (OTHER_ACTOR) actor 하나를 고르면
+    그 actor 의 원본 이벤트만 읽어서 rollup 을 따로 만듦 (이벤트 인덱스가 있으면 actor 인덱스로)
+    """
+    if index_available():
+        raw = EventIndex().query(actor=actor)
+    elif alerts_available():
+        raw = load_alert_store(columns=["time","actor","service","action","result","risk_score"])
+        raw = raw[raw["actor"] == actor]
+    else:
+        return pd.DataFrame()
+    rollup = rollup_from_alerts(raw)
+    rollup["date"] = rollup["hour"].dt.date
+    return rollup
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+def load_csv(path, stamp):
+    path = Path(path)
     return pd.read_csv(path) if path.exists() else pd.DataFrame()
 
-def load_user_summary():
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+def load_user_summary(stamp):
     if not USRJS.exists():
         return {}
     with open(USRJS, "r", encoding="utf-8") as f:
         return json.load(f)
 
-df = load_alerts()
-anomalies = load_csv(ANOM)
-event_anom = load_csv(EV_AN)
-profiles = load_user_summary()
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+def load_sketch_summary(stamp):
+    """sketch 모드(CF_SKETCH=1)로 분석했을 때의 HLL / heavy hitter (없거나 오래됐으면 None)"""
+    return load_sketches()
 
-if df.empty:
+rollup = load_rollup(file_stamp(ROLLUP_PARQUET, ROLLUP_CSV, ARCHIVE_PARQUET, ARCHIVE_CSV)
+                     + alerts_stamp())
+anomalies = load_csv(str(ANOM), file_stamp(ANOM))
+event_anom = load_csv(str(EV_AN), file_stamp(EV_AN))
+profiles = load_user_summary(file_stamp(USRJS))
+sketches = load_sketch_summary(file_stamp(SKETCHES_PATH) + alerts_stamp())
+
+if rollup.empty:
     st.warning("`out/alerts.csv` 가 아직 없습니다. 파이프라인을 먼저 실행하세요.")
     st.stop()
 
+# sketch 모드(CF_SKETCH=1)로 만든 rollup 은 actor 를 나누지 않음
+per_actor = not (rollup["actor"] == OTHER_ACTOR).any()
+
 # ---------- 사이드바 필터 ----------
 with st.sidebar:
     st.header("🔎 Filters")
-    dates = sorted(df["date"].dropna().unique())
+    dates = sorted(rollup["date"].dropna().unique())
     date_range = st.date_input("Date range", value=(dates[0], dates[-1]) if len(dates)>=2 else None)
-    services = ["<All>"] + sorted(df["service"].dropna().unique())
-    actors   = ["<All>"] + sorted(df["actor"].dropna().unique())
+    services = ["<All>"] + sorted(rollup["service"].dropna().unique())
+    if per_actor:
+        actors = ["<All>"] + sorted(rollup["actor"].dropna().unique())
+    else:
+        # actor 종류 수만큼 목록이 커지지 않도록 sketch 의 heavy hitter 후보만
+        known = heavy_hitters(sketches) if sketches else []
+        known += [a for a in rollup["actor"].dropna().unique() if a != OTHER_ACTOR and a not in known]
+        actors = ["<All>"] + known
     service_sel = st.selectbox("Service", services)
     actor_sel   = st.selectbox("Actor", actors)
-    min_risk    = st.slider("Min Risk Score", 0, int(df["risk_score"].max() if "risk_score" in df else 100), 0)
+    max_risk    = rollup["risk_max"].max()
+    min_risk    = st.slider("Min Risk Score", 0, int(max_risk) if pd.notna(max_risk) else 100, 0)
 
-# 날짜 필터
-if isinstance(date_range, tuple) and len(date_range)==2 and date_range[0] and date_range[1]:
-    df = df[(df["date"] >= date_range[0]) & (df["date"] <= date_range[1])]
-# 서비스/사용자/리스크 필터
-if service_sel != "<All>":
-    df = df[df["service"] == service_sel]
-if actor_sel != "<All>":
-    df = df[df["actor"] == actor_sel]
-if "risk_score" in df.columns:
-    df = df[df["risk_score"] >= min_risk]
+def apply_filters(frame):
+    """rollup / 원본 이벤트 모두 같은 컬럼(date, service, actor, risk_score)으로 필터"""
+    if frame.empty:
+        return frame
+    # 날짜 필터
+    if isinstance(date_range, tuple) and len(date_range)==2 and date_range[0] and date_range[1]:
+        frame = frame[(frame["date"] >= date_range[0]) & (frame["date"] <= date_range[1])]
+    # 서비스/사용자/리스크 필터
+    if service_sel != "<All>":
+        frame = frame[frame["service"] == service_sel]
+    if actor_sel != "<All>":
+        frame = frame[frame["actor"] == actor_sel]
+    if "risk_score" in frame.columns:
+        frame = frame[frame["risk_score"] >= min_risk]
+    return frame
+
+if per_actor or actor_sel == "<All>":
+    r = apply_filters(rollup)
+else:
+    r = apply_filters(load_actor_rollup(file_stamp(INDEX_PATH) + alerts_stamp(), actor_sel))
+total_events = int(r["count"].sum())
 
 # ---------- KPI 상단 카드 ----------
 col1, col2, col3, col4 = st.columns(4)
 with col1:
-    st.metric("Total Events", len(df))
+    st.metric("Total Events", total_events)
 with col2:
-    st.metric("Unique Actors", df["actor"].nunique() if "actor" in df else 0)
+    # 날짜 외 필터가 없으면 날짜별 HyperLogLog 합집합으로 (actor 종류 수와 무관한 고정 메모리)
+    if sketches and service_sel == "<All>" and actor_sel == "<All>" and min_risk == 0:
+        dr = date_range if isinstance(date_range, tuple) and len(date_range) == 2 else (None, None)
+        est, err = unique_actors(sketches, *dr)
+        st.metric("Unique Actors", f"≈{est:,}", help=f"HyperLogLog 추정 (상대 표준오차 ±{err:.1%})")
+    elif per_actor or actor_sel != "<All>":
+        st.metric("Unique Actors", r["actor"].nunique())
+    else:
+        st.metric("Unique Actors", "-", help="sketch 모드 rollup 은 actor 를 나누지 않음 (날짜 외 필터를 풀면 추정값 표시)")
 with col3:
-    st.metric("Unique Services", df["service"].nunique() if "service" in df else 0)
+    st.metric("Unique Services", r["service"].nunique())
 with col4:
-    avg_risk = round(df["risk_score"].mean(), 2) if "risk_score" in df and len(df)>0 else 0
+    avg_risk = round(r["risk_sum"].sum() / total_events, 2) if total_events > 0 else 0
     st.metric("Avg Risk Score", avg_risk)
 
 st.divider()
 
 # ---------- 차트: 서비스 분포 ----------
 st.subheader("📊 Event Distribution by Service")
-if "service" in df.columns and not df.empty:
-    svc = df["service"].value_counts().reset_index()
+svc = r.groupby("service")["count"].sum()
+if not svc.empty:
+    svc = svc.sort_values(ascending=False).reset_index()
     svc.columns = ["service","count"]
     chart = alt.Chart(svc).mark_bar().encode(
         x=alt.X("service:N", sort="-y"),
@@ -105,8 +207,9 @@ else:
 
 # ---------- 시간 추이 ----------
 st.subheader("⏱️ Events Over Time")
-if "time" in df.columns and not df["time"].isna().all():
-    ts = df.dropna(subset=["time"]).set_index("time").resample("H").size().reset_index(name="events")
+hourly = r.dropna(subset=["hour"]).groupby("hour")["count"].sum()
+if not hourly.empty:
+    ts = hourly.resample("h").sum().reset_index(name="events").rename(columns={"hour": "time"})
     line = alt.Chart(ts).mark_line(point=True).encode(
         x="time:T", y="events:Q", tooltip=["time:T","events:Q"]
     ).properties(height=280)
@@ -114,24 +217,106 @@ if "time" in df.columns and not df["time"].isna().all():
 else:
     st.info("시간 정보가 없습니다.")
 
+# ---------- 원본 이벤트 조회 ----------
+# event_index.sqlite 가 있으면 필터/정렬/페이지를 인덱스 쿼리로 처리 (전체 DataFrame 을 올리지 않음).
+# 없으면 필터가 없을 때는 분석 단계에서 골라 둔 top_events.json 을 쓰고,
+# 그 밖에는 예전처럼 원본 이벤트를 읽어서 pandas 로 처리
+@st.cache_resource(max_entries=CACHE_ENTRIES, show_spinner=False)
+def open_event_index(stamp):
+    return EventIndex() if index_available() else None
+
+@st.cache_data(max_entries=CACHE_ENTRIES, show_spinner=False)
+def load_top(stamp):
+    return load_top_events()
+
+filters = {
+    "service": None if service_sel == "<All>" else service_sel,
+    "actor": None if actor_sel == "<All>" else actor_sel,
+    "min_risk": min_risk,
+}
+if isinstance(date_range, tuple) and len(date_range)==2 and date_range[0] and date_range[1]:
+    filters["date_from"] = date_range[0].isoformat()
+    filters["date_to"] = date_range[1].isoformat()
+unfiltered = (
+    filters["service"] is None and filters["actor"] is None and not min_risk
+    and ("date_from" not in filters or (date_range[0] <= dates[0] and date_range[1] >= dates[-1]))
+)
+
+def filtered_alerts():
+    date_key = (filters["date_from"], filters["date_to"]) if "date_from" in filters else None
+    return apply_filters(load_alerts(alerts_stamp(), date_key))
+
+idx = open_event_index(file_stamp(INDEX_PATH) + alerts_stamp())
+top = load_top(file_stamp(TOP_EVENTS_PATH) + alerts_stamp()) if idx is None and unfiltered else None
+df = filtered_alerts() if idx is None and top is None else None
+
 # ---------- 테이블: Top 5 위험 이벤트 / 최근 5개 ----------
 left, right = st.columns(2)
 with left:
     st.markdown("### 🔥 Top 5 Risky Events")
-    if "risk_score" in df.columns:
-        top5 = df.sort_values("risk_score", ascending=False).head(5)
+    if idx is not None:
+        st.dataframe(idx.top_k(5, **filters), use_container_width=True)
+    elif top is not None:
+        st.dataframe(top_frame(top, "risky"), use_container_width=True)
+    elif "risk_score" in df.columns:
+        top5 = df.nlargest(5, "risk_score")
         st.dataframe(top5, use_container_width=True)
     else:
         st.info("risk_score 컬럼이 없습니다.")
 
 with right:
     st.markdown("### 🆕 Recent 5 Events")
-    if "time" in df.columns:
-        recent5 = df.sort_values("time", ascending=False).head(5)
+    if idx is not None:
+        st.dataframe(idx.recent(5, **filters), use_container_width=True)
+    elif top is not None:
+        st.dataframe(top_frame(top, "recent"), use_container_width=True)
+    elif "time" in df.columns:
+        recent5 = df.nlargest(5, "time")
         st.dataframe(recent5, use_container_width=True)
     else:
         st.info("time 컬럼이 없습니다.")
 
+# ---------- 전체 이벤트 (검색 + 페이지) ----------
+st.subheader("📋 All Events")
+show_all = idx is not None or st.checkbox("Load all events (event_index.sqlite 없음 → 전체 alerts 를 읽음)")
+if show_all:
+    c_search, c_order, c_size = st.columns([3, 1, 1])
+    with c_search:
+        search = st.text_input("Search (actor / action / reason)", "").strip()
+    with c_order:
+        order = st.selectbox("Sort", ["recent", "risk", "time"])
+    with c_size:
+        page_size = st.selectbox("Rows per page", [25, 50, 100, 200], index=1)
+
+    if idx is not None:
+        total = idx.count(search=search, **filters)
+    else:
+        if df is None:
+            df = filtered_alerts()
+        view = df
+        if search:
+            hit = pd.Series(False, index=df.index)
+            for c in ("actor", "action", "reason"):
+                if c in df.columns:
+                    hit |= df[c].astype(str).str.contains(search, case=False, regex=False)
+            view = df[hit]
+        total = len(view)
+
+    n_pages = max(1, -(-total // page_size))
+    page = st.number_input(f"Page (1 - {n_pages})", min_value=1, max_value=n_pages, value=1, step=1)
+    st.caption(f"{total:,} events")
+    if idx is not None:
+        rows = idx.page(page, page_size, order=order, search=search, **filters)
+    else:
+        sort_cols = {"recent": ("time", False), "risk": ("risk_score", False), "time": ("time", True)}
+        col, asc = sort_cols[order]
+        if col in view.columns:
+            view = view.sort_values(col, ascending=asc, kind="stable")
+        rows = view.iloc[(page - 1) * page_size : page * page_size]
+    st.dataframe(rows, use_container_width=True)
+else:
+    st.info("`out/event_index.sqlite` 가 없어 전체 목록은 요청할 때만 읽습니다.")
+
 st.divider()
 
 # ---------- 이상탐지 섹션 ----------
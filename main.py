@@ -1,14 +1,17 @@
 import os
 from pathlib import Path
 
-import boto3
 import pandas as pd
 
 from src.log_collector import collect_logs
 from src.log_analyzer import analyze_logs
 from src.user_profiler import generate_user_profile
 from src.report_generator import generate_report
+from src.accounts import generate_account_outputs
 from src.alert_sender import send_slack_message
+from src.s3_downloader import download_logs, MAX_WORKERS
+from src.event_store import alerts_available, load_alerts
+from src.retention import compact_raw_logs, apply_retention, parse_since
 
 # ==============================
 # 🔧 환경 설정
@@ -18,6 +21,15 @@ from src.alert_sender import send_slack_message
 BUCKET = "cloudtrail-log-demo-goeun"     # ← 필요하면 여기 버킷 이름만 수정
 PREFIX = "AWSLogs/"                      # CloudTrail이 기본으로 쓰는 prefix
 
+# 1 이면 계정별 alerts / 프로파일 / PDF 도 생성 (out/accounts/, reports/accounts/)
+PER_ACCOUNT = os.environ.get("CF_PER_ACCOUNT", "0") == "1"
+
+# 설정하면 수집 전에 작은 raw 파일을 세그먼트로 합치고, 수집 뒤 이 일수보다 오래된 이벤트를
+# rollup archive 로 줄여서 삭제 (src/retention.py)
+RETENTION_DAYS = os.environ.get("CF_RETENTION_DAYS")
+# 설정하면 (예: 24h) 분석 / 리포트를 그 시각 이후 이벤트로만 만듦 (일별 파티션만 읽음)
+SINCE = os.environ.get("CF_SINCE")
+
 ROOT_DIR = Path(__file__).resolve().parent
 RAW_DIR = ROOT_DIR / "data" / "raw_logs"
 OUT_DIR = ROOT_DIR / "out"
@@ -27,38 +39,17 @@ OUT_DIR = ROOT_DIR / "out"
 # 1️⃣ S3에서 CloudTrail 로그 다운로드
 # ==============================
 
-def download_new_logs():
-    s3 = boto3.client("s3")
-
-    RAW_DIR.mkdir(parents=True, exist_ok=True)
-
-    print(f"[S3] Listing objects from s3://{BUCKET}/{PREFIX}")
-    objects = s3.list_objects_v2(Bucket=BUCKET, Prefix=PREFIX)
-
-    if "Contents" not in objects:
-        print("[S3] No logs found in S3.")
-        return
-
-    count = 0
-    for obj in objects["Contents"]:
-        key = obj["Key"]
-
-        # CloudTrail 로그 파일만 대상 (.json 또는 .json.gz)
-        if not (key.endswith(".json") or key.endswith(".json.gz")):
-            continue
-
-        # 로컬 파일 이름: 경로 구분자를 _로 치환
-        local_path = RAW_DIR / key.replace("/", "_")
-        if local_path.exists():
-            # 이미 받은 파일은 스킵 (원하면 지우고 다시 받는 로직으로 바꿀 수 있음)
-            continue
-
-        print(f"[S3] Downloading {key} → {local_path}")
-        local_path.parent.mkdir(parents=True, exist_ok=True)
-        s3.download_file(BUCKET, key, str(local_path))
-        count += 1
-
-    print(f"[S3] ✅ S3 Log Download Complete (new files: {count})")
+def download_new_logs(max_workers=MAX_WORKERS):
+    """
+    S3 → data/raw_logs 병렬 다운로드 (src/s3_downloader 엔진 사용)
+    페이지네이션으로 전체 목록을 돌고, 스레드 풀로 동시에 받음
+    """
+    return download_logs(
+        bucket=BUCKET,
+        prefix=PREFIX,
+        dest_dir=RAW_DIR,
+        max_workers=max_workers,
+    )
 
 
 # ==============================
@@ -70,16 +61,15 @@ def send_slack_summary():
     alerts.csv / anomalies.csv / event_anomalies.csv 기반으로
     Slack에 간단한 요약 알림 전송
     """
-    alerts_path = OUT_DIR / "alerts.csv"
     user_anom_path = OUT_DIR / "anomalies.csv"
     event_anom_path = OUT_DIR / "event_anomalies.csv"
 
-    if not alerts_path.exists():
+    if not alerts_available():
         print("[Slack] alerts.csv 가 없어서 Slack 요약을 건너뜀")
         return
 
     try:
-        df_alerts = pd.read_csv(alerts_path)
+        df_alerts = load_alerts(columns=["risk_score"])
     except Exception as e:
         print(f"[Slack] alerts.csv 읽기 오류: {e}")
         return
@@ -154,16 +144,25 @@ def main():
     download_new_logs()
 
     print("\n=== Step 2: Normalizing Logs (log_collector) ===")
+    if RETENTION_DAYS:
+        compact_raw_logs()
     collect_logs()
+    if RETENTION_DAYS:
+        print("\n=== Step 2-1: Retention (retention) ===")
+        apply_retention(int(RETENTION_DAYS))
 
     print("\n=== Step 3: Detecting Anomalies (log_analyzer) ===")
-    analyze_logs()
+    since = parse_since(SINCE) if SINCE else None
+    analyze_logs(by_account=PER_ACCOUNT, since=since)
 
     print("\n=== Step 4: User Profiling (user_profiler) ===")
-    generate_user_profile()
+    generate_user_profile(since=since)
 
     print("\n=== Step 5: Generating PDF Report (report_generator) ===")
-    generate_report()
+    generate_report(since=since)
+    if PER_ACCOUNT:
+        print("\n=== Step 5-1: Per-account Profiles & Reports (accounts) ===")
+        generate_account_outputs()
 
     print("\n=== Step 6: Sending Slack Summary ===")
     try:
@@ -0,0 +1,239 @@
+"""
+AWS 계정별 결과 분리 (분석 한 번 → 계정별 alerts / 프로파일 / PDF)
+
+generate_alerts(by_account=True) 가 알림 행을 만드는 같은 패스에서
+account 컬럼 기준으로 행을 나눠
+    out/accounts/<account>/alerts.csv
+    out/accounts/index.json          (계정 → 이벤트 수)
+를 쓴다. 그 다음 generate_account_outputs() 가 계정마다
+    out/accounts/<account>/user_summary.json
+    out/accounts/<account>/anomalies.csv, event_anomalies.csv   (그 계정 alerts 만으로 계산한 Z-score)
+    reports/accounts/<account>/report.pdf
+를 프로세스 풀로 병렬 생성한다.
+
+    python src/accounts.py [--accounts 123456789012 ...] [--workers 4] [--no-report]
+"""
+import argparse
+import csv
+import json
+import re
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    from src.atomic_writer import AtomicWriter
+except ImportError:  # python src/xxx.py 로 직접 실행한 경우
+    from atomic_writer import AtomicWriter
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+ACCOUNTS_DIR = ROOT_DIR / "out" / "accounts"
+ACCOUNT_REPORTS_DIR = ROOT_DIR / "reports" / "accounts"
+INDEX_PATH = ACCOUNTS_DIR / "index.json"
+
+UNKNOWN_ACCOUNT = "unknown"
+# 계정이 많아도 메모리가 커지지 않게 계정별 writer 버퍼는 작게
+ACCOUNT_BUFFER = 1 << 20
+# 계정별 이상 사용자 / action Z-score 임계값 (analyze_logs 기본값과 같음)
+ANOMALY_THRESHOLD = 2.0
+
+
+def account_dir_name(account):
+    """계정 ID → 폴더 이름 (빈 값은 unknown, 경로에 쓸 수 없는 문자는 _)"""
+    if not account or not isinstance(account, str):
+        return UNKNOWN_ACCOUNT
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", account)
+
+
+def account_alerts_path(account):
+    return ACCOUNTS_DIR / account_dir_name(account) / "alerts.csv"
+
+
+# ==========================
+# ✂️ 분석 패스에서 계정별로 나누기
+# ==========================
+
+class AccountFanout:
+    """
+    generate_alerts 의 sink: write_rows(rows) 로 받은 alerts 행을 account 별 alerts.csv 로 나눠 씀.
+    header : alerts 컬럼 목록 (ALERT_HEADER), account 컬럼 위치도 여기서 찾음
+    """
+
+    def __init__(self, header, root=ACCOUNTS_DIR):
+        self.header = list(header)
+        self.root = Path(root)
+        self.account_col = self.header.index("account")
+        self.writers = {}    # 폴더 이름 → (AtomicWriter, csv.writer)
+        self.counts = {}
+
+    def _writer(self, name):
+        entry = self.writers.get(name)
+        if entry is None:
+            f = AtomicWriter(self.root / name / "alerts.csv", text=True, buffer_size=ACCOUNT_BUFFER)
+            w = csv.writer(f)
+            w.writerow(self.header)
+            entry = self.writers[name] = (f, w)
+            self.counts[name] = 0
+        return entry[1]
+
+    def write_rows(self, rows):
+        col = self.account_col
+        groups = {}
+        for r in rows:
+            groups.setdefault(r[col], []).append(r)
+        for account, group in groups.items():
+            name = account_dir_name(account)
+            self._writer(name).writerows(group)
+            self.counts[name] += len(group)
+
+    def close(self):
+        """모든 계정 파일 교체 + index.json 기록, 이번에 없는 계정의 예전 폴더(프로파일 / 이상탐지 포함) 삭제"""
+        for f, _ in self.writers.values():
+            f.close()
+        if self.root.exists():
+            for old in self.root.iterdir():
+                if old.is_dir() and old.name not in self.counts:
+                    shutil.rmtree(old)
+        with AtomicWriter(self.root / INDEX_PATH.name, text=True) as f:
+            json.dump(dict(sorted(self.counts.items())), f, ensure_ascii=False, indent=2)
+        return dict(self.counts)
+
+    def abort(self):
+        for f, _ in self.writers.values():
+            f.abort()
+
+
+# ==========================
+# 📖 읽기
+# ==========================
+
+def list_accounts():
+    """계정 폴더 이름 → 이벤트 수 (분리된 결과가 없으면 빈 dict)"""
+    if not INDEX_PATH.exists():
+        return {}
+    with open(INDEX_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_account_alerts(account, columns=None, date_from=None, date_to=None):
+    """계정 alerts.csv → DataFrame (event_store.load_alerts 와 같은 모양)"""
+    path = account_alerts_path(account)
+    if not path.exists():
+        return pd.DataFrame(columns=columns)
+    usecols = None
+    if columns:
+        wanted = set(columns) | ({"time"} if date_from or date_to else set())
+        usecols = lambda c: c in wanted
+    df = pd.read_csv(path, usecols=usecols, dtype={"account": str})
+    if (date_from or date_to) and "time" in df.columns:
+        dates = df["time"].astype(str).str[:10]
+        if date_from:
+            df = df[dates >= str(date_from)]
+        if date_to:
+            df = df[dates <= str(date_to)]
+    return df[[c for c in columns if c in df.columns]] if columns else df
+
+
+# ==========================
+# 🗂 계정별 프로파일 / 리포트 병렬 생성
+# ==========================
+
+def _build_account(args):
+    """워커 프로세스에서 실행: 계정 하나의 프로파일 + PDF"""
+    account, report = args
+    # report_generator 가 이 모듈을 import 하므로 순환 import 를 피해 여기서 import
+    try:
+        from src.user_profiler import generate_user_profile
+        from src.report_generator import generate_report
+        from src.log_analyzer import _save_user_anomalies, _save_event_anomalies
+    except ImportError:  # python src/accounts.py 로 직접 실행한 경우
+        from user_profiler import generate_user_profile
+        from report_generator import generate_report
+        from log_analyzer import _save_user_anomalies, _save_event_anomalies
+
+    timings = {}
+    t0 = time.perf_counter()
+    summary_path = ACCOUNTS_DIR / account / "user_summary.json"
+    df = load_account_alerts(account, columns=["time", "actor", "service", "action", "region"])
+    generate_user_profile(df, out_path=summary_path)
+    timings["profile"] = time.perf_counter() - t0
+
+    # 전체 anomalies.csv 에는 다른 계정의 actor / action 이 있으므로 계정 alerts 로 따로 계산
+    t0 = time.perf_counter()
+    anomaly_paths = (ACCOUNTS_DIR / account / "anomalies.csv",
+                     ACCOUNTS_DIR / account / "event_anomalies.csv")
+    for path in anomaly_paths:
+        path.unlink(missing_ok=True)   # 건수가 적어 이번에 못 만들면 예전 결과가 남지 않게
+    for col, path, save in (("actor", anomaly_paths[0], _save_user_anomalies),
+                            ("action", anomaly_paths[1], _save_event_anomalies)):
+        counts = df[col].value_counts().reset_index()
+        counts.columns = [col, "count"]
+        save(counts, ANOMALY_THRESHOLD, out_path=path)
+    timings["anomalies"] = time.perf_counter() - t0
+
+    if report:
+        t0 = time.perf_counter()
+        generate_report(ACCOUNT_REPORTS_DIR / account / "report.pdf", account=account,
+                        summary_path=summary_path, anomaly_paths=anomaly_paths)
+        timings["report"] = time.perf_counter() - t0
+    return account, timings
+
+
+def generate_account_outputs(accounts=None, workers=None, report=True):
+    """
+    계정별 user_summary.json / report.pdf 생성 (out/accounts/ 가 먼저 있어야 함)
+    accounts : 계정 목록 (None 이면 index.json 의 전체, index.json 에 없는 계정은 경고 후 건너뜀)
+    workers  : 프로세스 수 (None 이면 CPU 수, 1 이면 현재 프로세스에서 순서대로)
+    """
+    everything = not accounts
+    known = list_accounts()
+    if everything:
+        accounts = list(known)
+    else:
+        # 오타 / 예전 계정 ID 로 0건짜리 폴더와 리포트를 만들지 않도록 index.json 기준으로 확인
+        unknown = [a for a in accounts if account_dir_name(a) not in known]
+        if unknown:
+            print(f"⚠ 계정별 alerts 에 없는 계정은 건너뜁니다: {', '.join(map(str, unknown))}")
+        accounts = [a for a in accounts if account_dir_name(a) in known]
+        if not accounts and known:
+            return {}
+    if not accounts:
+        print("⚠ 계정별 alerts 가 없습니다 → generate_alerts(by_account=True) 를 먼저 실행하세요.")
+        return {}
+
+    started = time.perf_counter()
+    jobs = [(account_dir_name(a), report) for a in accounts]
+    if workers == 1 or len(jobs) == 1:
+        results = dict(map(_build_account, jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = dict(pool.map(_build_account, jobs))
+    elapsed = time.perf_counter() - started
+
+    # 이번 목록에 없는 계정의 예전 리포트 정리 (전체를 다시 만든 경우만)
+    if report and everything and ACCOUNT_REPORTS_DIR.exists():
+        for d in ACCOUNT_REPORTS_DIR.iterdir():
+            if d.is_dir() and d.name not in results:
+                shutil.rmtree(d)
+
+    for account, t in results.items():
+        parts = ", ".join(f"{k} {v:.2f}s" for k, v in t.items())
+        print(f"   {account}: {parts}")
+    print(f"⏱ 계정별 결과 {len(results)}개 생성 ({elapsed:.2f}s)")
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser(description="계정별 프로파일 / PDF 리포트 생성")
+    ap.add_argument("--accounts", nargs="*", help="만들 계정 (기본: 전체)")
+    ap.add_argument("--workers", type=int, default=None, help="병렬 프로세스 수")
+    ap.add_argument("--no-report", action="store_true", help="PDF 는 만들지 않음")
+    args = ap.parse_args()
+    generate_account_outputs(args.accounts or None, workers=args.workers, report=not args.no_report)
+
+
+if __name__ == "__main__":
+    main()
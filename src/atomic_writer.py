@@ -0,0 +1,140 @@
+"""
+버퍼링 + 원자적 교체 파일 writer
+
+    with AtomicWriter(ALERTS_PATH, text=True) as f:
+        writer = csv.writer(f)
+        writer.writerows(rows)
+
+- 쓰기는 메모리 버퍼(buffer_size, 기본 CF_WRITE_BUFFER_MB=8MB)에 모았다가 큰 덩어리로 한 번에 기록
+  → 네트워크 파일시스템에서 이벤트/행마다 write 호출하는 비용을 줄임
+- 같은 폴더의 임시 파일(프로세스·스레드별 이름)에 쓰고 close() 에서 os.replace → 읽는 쪽(대시보드 등)이
+  반쯤 쓰인 파일을 보지 않음. 예외로 with 블록을 빠져나가면 임시 파일만 지우고 기존 파일은 그대로.
+- compression="gzip" / "zstd" 면 쓰는 동안 스트리밍 압축
+  ("auto"(기본)는 경로 확장자 .gz / .zst 로 판단, zstd 는 zstandard 패키지 필요)
+"""
+import os
+import gzip
+import codecs
+import threading
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:  # 선택 의존성 (zstd 압축할 때만 필요)
+    zstandard = None
+
+WRITE_BUFFER = int(float(os.environ.get("CF_WRITE_BUFFER_MB", "8")) * (1 << 20))
+
+_SUFFIX_COMPRESSION = {".gz": "gzip", ".zst": "zstd"}
+
+
+class AtomicWriter:
+    """
+    path     : 최종 파일 경로
+    text     : True 면 write(str) (encoding 으로 인코딩, csv.writer / DataFrame.to_csv 에 바로 사용)
+               False 면 write(bytes)
+    buffer_size : 이만큼 모이면 한 번에 기록 (bytes, text 모드는 대략 문자 수)
+    compression : None / "gzip" / "zstd" / "auto"
+    fsync    : True 면 교체 전에 fsync (전원 장애까지 대비할 때)
+    """
+
+    def __init__(self, path, text=False, encoding="utf-8", buffer_size=WRITE_BUFFER,
+                 compression="auto", fsync=False):
+        self.path = Path(path)
+        self.text = text
+        self.mode = "w" if text else "wb"   # pandas 등이 텍스트/바이너리 판단에 사용
+        self.buffer_size = max(1, int(buffer_size))
+        self.fsync = fsync
+        # 프로세스 + 스레드마다 다른 임시 파일 (watcher 워커 / 대시보드 세션 스레드가 같은 파일을
+        # 동시에 써도 서로의 임시 파일을 덮어쓰지 않음, 마지막으로 교체한 쪽이 남음)
+        self.tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        self._encoder = codecs.getincrementalencoder(encoding)() if text else None
+        self._buf = []
+        self._buffered = 0
+        self.closed = False
+
+        if compression == "auto":
+            compression = _SUFFIX_COMPRESSION.get(self.path.suffix)
+        if compression == "zstd" and zstandard is None:
+            raise RuntimeError("zstd 압축에는 zstandard 패키지가 필요합니다 (pip install zstandard)")
+        if compression not in (None, "gzip", "zstd"):
+            raise ValueError(f"지원하지 않는 압축 형식: {compression}")
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.tmp, "wb")
+        if compression == "gzip":
+            self._sink = gzip.GzipFile(fileobj=self._file, mode="wb", compresslevel=6, mtime=0)
+        elif compression == "zstd":
+            self._sink = zstandard.ZstdCompressor(level=3).stream_writer(self._file, closefd=False)
+        else:
+            self._sink = None
+
+    # ---------- 쓰기 ----------
+
+    def write(self, data):
+        self._buf.append(data)
+        self._buffered += len(data)
+        if self._buffered >= self.buffer_size:
+            self.flush()
+        return len(data)
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def flush(self):
+        """모아 둔 버퍼를 한 번의 write 로 기록"""
+        if not self._buf:
+            return
+        if self.text:
+            data = self._encoder.encode("".join(self._buf))
+        else:
+            data = b"".join(self._buf)
+        self._buf = []
+        self._buffered = 0
+        (self._sink or self._file).write(data)
+
+    # ---------- 마무리 ----------
+
+    def close(self):
+        """남은 버퍼 기록 → 압축 스트림 마무리 → 최종 경로로 교체"""
+        if self.closed:
+            return
+        try:
+            self.flush()
+            if self.text:
+                tail = self._encoder.encode("", final=True)
+                if tail:
+                    (self._sink or self._file).write(tail)
+            if self._sink is not None:
+                self._sink.close()
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self._file.close()
+            os.replace(self.tmp, self.path)
+        except BaseException:
+            self.abort()
+            raise
+        self.closed = True
+
+    def abort(self):
+        """기록 취소: 임시 파일 삭제 (기존 파일은 그대로)"""
+        if self.closed:
+            return
+        self.closed = True
+        self._buf = []
+        try:
+            self._file.close()
+        finally:
+            if self.tmp.exists():
+                self.tmp.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
@@ -0,0 +1,244 @@
+"""
+알림 이벤트 인덱스 (SQLite)
+
+generate_alerts 가 알림 행을 만드는 같은 패스에서 out/event_index.sqlite 를 만든다.
+  - events 테이블 (alerts 컬럼 + seq = 원래 행 순서)
+  - time / (actor, time) / (service, time) / (risk_score, time) / (account, time) 인덱스
+  - events_fts: actor / action / reason 의 FTS5 trigram 전문 검색 인덱스 (search 필터용)
+    → 3글자 이상 부분 문자열 검색도 전체 테이블을 훑지 않음 (대소문자 무시, LIKE 와 같은 결과)
+    FTS5 가 없는 SQLite 이거나 2글자 이하 검색어면 LIKE 로 전체를 훑음
+
+대시보드는 전체 DataFrame 에 boolean mask 를 씌우고 정렬하는 대신
+이 인덱스에 필터 + ORDER BY + LIMIT/OFFSET 쿼리를 보내서
+Top-k / 최근 이벤트 / 페이지 단위 전체 이벤트 목록을 가져온다.
+
+    idx = EventIndex()
+    idx.top_k(5, service="iam", min_risk=50)
+    idx.page(page=3, page_size=50, search="Delete")
+"""
+import os
+import threading
+import sqlite3
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    from src.event_store import newer_than_alerts
+except ImportError:  # python src/xxx.py 로 직접 실행한 경우
+    from event_store import newer_than_alerts
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+OUT_DIR = ROOT_DIR / "out"
+INDEX_PATH = OUT_DIR / "event_index.sqlite"
+
+COLUMNS = ["time", "actor", "service", "action", "result", "risk_score", "reason",
+           "region", "account"]
+
+_SCHEMA = """
+CREATE TABLE events (
+    seq        INTEGER PRIMARY KEY,
+    time       TEXT,
+    actor      TEXT,
+    service    TEXT,
+    action     TEXT,
+    result     TEXT,
+    risk_score REAL,
+    reason     TEXT,
+    region     TEXT,
+    account    TEXT
+);
+"""
+
+# 적재가 끝난 뒤 한 번에 생성 (행마다 인덱스를 갱신하는 것보다 훨씬 빠름)
+_INDEXES = """
+CREATE INDEX idx_events_time ON events (time);
+CREATE INDEX idx_events_actor ON events (actor, time);
+CREATE INDEX idx_events_service ON events (service, time);
+CREATE INDEX idx_events_risk ON events (risk_score, time);
+CREATE INDEX idx_events_account ON events (account, time);
+ANALYZE;
+"""
+
+# trigram 토크나이저 (SQLite 3.34+) 로 만든 external content 전문 검색 테이블
+_FTS = """
+CREATE VIRTUAL TABLE events_fts USING fts5(
+    actor, action, reason, content='events', content_rowid='seq', tokenize='trigram'
+);
+INSERT INTO events_fts(events_fts) VALUES ('rebuild');
+"""
+# trigram 인덱스로 찾을 수 있는 최소 검색어 길이
+FTS_MIN_CHARS = 3
+
+_INSERT = f"INSERT INTO events ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+
+# 정렬 기준 → ORDER BY 절 (같은 값이면 원래 행 순서)
+ORDER_BY = {
+    "risk": "risk_score DESC, seq",
+    "recent": "time DESC, seq DESC",
+    "time": "time, seq",
+}
+
+
+# ==========================
+# ✏️ 쓰기
+# ==========================
+
+class EventIndexWriter:
+    """
+    write_rows(rows) 로 alerts 행(ALERT_HEADER 순서)을 받아 임시 SQLite 파일에 적재하고,
+    close() 에서 인덱스를 만든 뒤 INDEX_PATH 로 교체한다 (읽는 쪽은 항상 완성된 파일만 봄).
+    """
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.tmp = self.path.with_name(f".{self.path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        if self.tmp.exists():
+            self.tmp.unlink()
+        self.conn = sqlite3.connect(str(self.tmp))
+        # 한 번 쓰고 교체하는 파일이라 저널/동기화 불필요
+        self.conn.execute("PRAGMA journal_mode=OFF")
+        self.conn.execute("PRAGMA synchronous=OFF")
+        self.conn.executescript(_SCHEMA)
+        self.count = 0
+
+    def write_rows(self, rows):
+        self.conn.executemany(_INSERT, rows)
+        self.count += len(rows)
+
+    def close(self):
+        """인덱스 생성 → 교체, 적재한 행 수 반환"""
+        try:
+            self.conn.executescript(_INDEXES)
+            try:
+                self.conn.executescript(_FTS)
+            except sqlite3.OperationalError:   # FTS5 / trigram 미지원 SQLite → 검색은 LIKE
+                self.conn.execute("DROP TABLE IF EXISTS events_fts")
+            self.conn.commit()
+            self.conn.close()
+            os.replace(self.tmp, self.path)
+        except BaseException:
+            self.abort()
+            raise
+        return self.count
+
+    def abort(self):
+        try:
+            self.conn.close()
+        finally:
+            if self.tmp.exists():
+                self.tmp.unlink()
+
+
+# ==========================
+# 📖 읽기
+# ==========================
+
+def index_available(path=INDEX_PATH):
+    """인덱스가 있고 alerts 출력보다 최신이면 True (build_index=False 로 알림만 다시 만든 경우 False)"""
+    return newer_than_alerts(path)
+
+
+def _like_pattern(text):
+    """LIKE 부분 문자열 패턴 (사용자가 입력한 % _ \\ 는 문자 그대로, ESCAPE '\\' 와 함께 사용)"""
+    text = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{text}%"
+
+
+def _where(date_from=None, date_to=None, service=None, actor=None, min_risk=None, search=None,
+           account=None, fts=False):
+    """
+    필터 → (WHERE 절, 파라미터). date_from / date_to 는 'YYYY-MM-DD' (포함)
+    fts=True 면 (events_fts 가 있으면) 3글자 이상 search 는 전문 검색 인덱스로
+    """
+    conds, params = [], []
+    if date_from:
+        conds.append("time >= ?")
+        params.append(str(date_from))
+    if date_to:
+        # '2025-11-20' 로 시작하는 모든 시각 포함
+        conds.append("time < ?")
+        params.append(str(date_to) + "\U0010ffff")
+    if service is not None:
+        conds.append("service = ?")
+        params.append(service)
+    if actor is not None:
+        conds.append("actor = ?")
+        params.append(actor)
+    if account is not None:
+        conds.append("account = ?")
+        params.append(account)
+    if min_risk:
+        conds.append("risk_score >= ?")
+        params.append(min_risk)
+    if search and fts and len(search) >= FTS_MIN_CHARS:
+        # 큰따옴표로 감싼 phrase → trigram 부분 문자열 일치 (FTS 연산자로 해석하지 않음)
+        conds.append("seq IN (SELECT rowid FROM events_fts WHERE events_fts MATCH ?)")
+        params.append('"' + search.replace('"', '""') + '"')
+    elif search:
+        conds.append("(actor LIKE ? ESCAPE '\\' OR action LIKE ? ESCAPE '\\' "
+                     "OR reason LIKE ? ESCAPE '\\')")
+        params.extend([_like_pattern(search)] * 3)
+    return (" WHERE " + " AND ".join(conds)) if conds else "", params
+
+
+class EventIndex:
+    """
+    읽기 전용 쿼리. 쿼리마다 짧은 커넥션을 열어서 스레드(대시보드 세션) 간에 공유해도 안전하다.
+    필터 인자(date_from, date_to, service, actor, account, min_risk, search)는 모든 메서드 공통.
+    """
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = Path(path)
+        # 파일은 통째로 교체될 뿐 제자리 수정되지 않으므로 immutable 로 열어 잠금 생략
+        self._uri = f"{self.path.resolve().as_uri()}?mode=ro&immutable=1"
+        self._fts = None
+
+    def _connect(self):
+        return sqlite3.connect(self._uri, uri=True, check_same_thread=False)
+
+    def _where(self, filters):
+        if self._fts is None:
+            conn = self._connect()
+            try:
+                self._fts = conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'events_fts'").fetchone() is not None
+            finally:
+                conn.close()
+        return _where(fts=self._fts, **filters)
+
+    def query(self, order="time", limit=None, offset=0, **filters):
+        """필터 + 정렬 + LIMIT/OFFSET → DataFrame (alerts 컬럼)"""
+        where, params = self._where(filters)
+        sql = f"SELECT {', '.join(COLUMNS)} FROM events{where} ORDER BY {ORDER_BY[order]}"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params += [int(limit), int(offset)]
+        conn = self._connect()
+        try:
+            rows = conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+        return pd.DataFrame(rows, columns=COLUMNS)
+
+    def count(self, **filters):
+        where, params = self._where(filters)
+        conn = self._connect()
+        try:
+            return conn.execute(f"SELECT COUNT(*) FROM events{where}", params).fetchone()[0]
+        finally:
+            conn.close()
+
+    def top_k(self, k=5, **filters):
+        """risk_score 상위 k 건"""
+        return self.query(order="risk", limit=k, **filters)
+
+    def recent(self, k=5, **filters):
+        """가장 최근 k 건"""
+        return self.query(order="recent", limit=k, **filters)
+
+    def page(self, page=1, page_size=50, order="recent", **filters):
+        """1부터 시작하는 페이지 번호의 이벤트 목록"""
+        page = max(1, int(page))
+        return self.query(order=order, limit=page_size, offset=(page - 1) * page_size, **filters)
@@ -0,0 +1,224 @@
+import os
+import shutil
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow 없으면 CSV 만 사용
+    pa = None
+
+# ==========================
+# 📁 경로 설정 (프로젝트 루트 기준)
+# ==========================
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+OUT_DIR = ROOT_DIR / "out"
+STORE_DIR = OUT_DIR / "event_store"
+ALERTS_PATH = OUT_DIR / "alerts.csv"
+
+ALERT_COLUMNS = ["time", "actor", "service", "action", "result", "risk_score", "reason",
+                 "region", "account"]
+# 값 종류가 적은 문자열 컬럼 → dictionary 인코딩
+DICT_COLUMNS = ["actor", "action", "result", "reason", "region", "account"]
+PARTITION_COLUMNS = ["date", "service"]
+
+# 파일 하나에 모아서 쓸 최대 행 수
+BATCH_ROWS = 250_000
+
+_SUCCESS = "_SUCCESS"
+
+
+def store_available():
+    """pyarrow 가 설치되어 있으면 True"""
+    return pa is not None
+
+
+def _event_date(t):
+    """'2025-11-20T10:59:52Z' → '2025-11-20' (형식이 이상하면 'unknown')"""
+    t = t or ""
+    return t[:10] if len(t) >= 10 and t[4] == "-" and t[7] == "-" else "unknown"
+
+
+# ==========================
+# ✏️ 쓰기
+# ==========================
+
+class EventStoreWriter:
+    """
+    alerts 행을 배치 단위로 받아서 date / service 파티션 Parquet 로 기록.
+      out/event_store/date=YYYY-MM-DD/service=xxx/part-*.parquet
+    actor/action/result/reason 은 dictionary 인코딩 컬럼으로 저장하고,
+    원래 행 순서를 복원할 수 있게 _seq 컬럼을 함께 기록한다.
+    임시 디렉터리에 다 쓴 뒤 close() 에서 교체하므로 읽는 쪽이 중간 상태를 보지 않는다.
+    """
+
+    def __init__(self, root=STORE_DIR, batch_rows=BATCH_ROWS):
+        self.root = Path(root)
+        self.tmp = self.root.with_name(self.root.name + ".tmp")
+        self.batch_rows = batch_rows
+        self.rows = []
+        self.seq = 0
+        self.batch_no = 0
+        if self.tmp.exists():
+            shutil.rmtree(self.tmp)
+        self.tmp.mkdir(parents=True)
+
+    def write_row(self, row):
+        """row: ALERT_COLUMNS 순서의 리스트"""
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_rows:
+            self.flush()
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.write_row(row)
+
+    def flush(self):
+        if not self.rows:
+            return
+        cols = list(zip(*self.rows))
+        n = len(self.rows)
+
+        arrays = {}
+        for name, values in zip(ALERT_COLUMNS, cols):
+            if name == "risk_score":
+                # 묶음마다 타입을 추론하면 실수 점수가 섞인 묶음만 double 이 되어
+                # 파티션 파일끼리 스키마가 달라짐 → 항상 double 로 고정
+                arrays[name] = pa.array(values, type=pa.float64())
+            elif name in DICT_COLUMNS:
+                arrays[name] = pa.array(values, type=pa.string()).dictionary_encode()
+            else:
+                arrays[name] = pa.array(values, type=pa.string())
+        arrays["_seq"] = pa.array(range(self.seq, self.seq + n), type=pa.int64())
+        arrays["date"] = pa.array([_event_date(t) for t in cols[0]], type=pa.string())
+
+        table = pa.table(arrays)
+        pq.write_to_dataset(
+            table,
+            root_path=str(self.tmp),
+            partition_cols=PARTITION_COLUMNS,
+            basename_template=f"part-{self.batch_no:05d}-{{i}}.parquet",
+            compression="zstd",
+        )
+        self.seq += n
+        self.batch_no += 1
+        self.rows = []
+
+    def close(self):
+        self.flush()
+        (self.tmp / _SUCCESS).touch()
+        old = self.root.with_name(self.root.name + ".old")
+        if old.exists():
+            shutil.rmtree(old)
+        if self.root.exists():
+            os.replace(self.root, old)
+        os.replace(self.tmp, self.root)
+        if old.exists():
+            shutil.rmtree(old)
+        return self.seq
+
+    def abort(self):
+        if self.tmp.exists():
+            shutil.rmtree(self.tmp)
+
+
+# ==========================
+# 📖 읽기
+# ==========================
+
+def _store_is_fresh():
+    """
+    event_store 가 있고 alerts.csv 보다 최신이면 True
+    (CSV 내보내기만 따로 돌린 경우엔 CSV 를 읽도록)
+    """
+    if pa is None:
+        return False
+    marker = STORE_DIR / _SUCCESS
+    if not marker.exists():
+        return False
+    if ALERTS_PATH.exists():
+        return marker.stat().st_mtime_ns >= ALERTS_PATH.stat().st_mtime_ns
+    return True
+
+
+def newer_than_alerts(path):
+    """
+    path(알림과 같은 패스에서 만드는 부산물: 인덱스, top-k 등)가 있고
+    alerts 출력(alerts.csv, event_store)보다 나중에 기록됐으면 True
+    (부산물 없이 알림만 다시 만든 경우 예전 부산물을 쓰지 않도록)
+    """
+    path = Path(path)
+    if not path.exists():
+        return False
+    mtime = path.stat().st_mtime_ns
+    for p in (ALERTS_PATH, STORE_DIR / _SUCCESS):
+        if p.exists() and p.stat().st_mtime_ns > mtime:
+            return False
+    return True
+
+
+def alerts_available():
+    """읽을 수 있는 alerts 데이터(event_store 또는 alerts.csv)가 있으면 True"""
+    return _store_is_fresh() or ALERTS_PATH.exists()
+
+
+def load_alerts(columns=None, date_from=None, date_to=None):
+    """
+    alerts 데이터를 DataFrame 으로 로드.
+      - event_store(Parquet)가 있으면 필요한 컬럼/파티션만 읽음
+      - 없으면 alerts.csv 에서 필요한 컬럼만 읽음
+    columns   : 읽을 컬럼 목록 (None 이면 전체)
+    date_from / date_to : 'YYYY-MM-DD' 문자열, date 파티션 기준 범위 (포함)
+    행 순서는 alerts.csv 와 같다.
+    """
+    columns = list(columns) if columns else list(ALERT_COLUMNS)
+
+    if _store_is_fresh():
+        dataset = ds.dataset(
+            str(STORE_DIR),
+            format="parquet",
+            partitioning=ds.partitioning(
+                pa.schema([("date", pa.string()), ("service", pa.string())]),
+                flavor="hive",
+            ),
+            exclude_invalid_files=True,
+        )
+        expr = None
+        if date_from:
+            expr = ds.field("date") >= str(date_from)
+        if date_to:
+            cond = ds.field("date") <= str(date_to)
+            expr = cond if expr is None else expr & cond
+
+        # region / account 컬럼이 생기기 전에 만든 store 면 있는 컬럼만 읽음 (CSV 경로와 같게)
+        columns = [c for c in columns if c in dataset.schema.names]
+        table = dataset.to_table(columns=columns + ["_seq"], filter=expr)
+        table = table.sort_by("_seq").drop_columns(["_seq"])
+        df = table.to_pandas()
+        for c in columns:
+            # dictionary 컬럼은 category 로 나오므로 CSV 와 같은 문자열 컬럼으로 맞춤
+            if isinstance(df[c].dtype, pd.CategoricalDtype):
+                df[c] = df[c].astype(df[c].cat.categories.dtype)
+            # read_csv 처럼 빈 문자열은 결측값으로 (빈 service 는 파티션에서 이미 null)
+            if c != "risk_score":
+                df[c] = df[c].mask(df[c] == "")
+        return df[columns]
+
+    if not ALERTS_PATH.exists():
+        return pd.DataFrame(columns=columns)
+
+    need_time = bool(date_from or date_to) and "time" not in columns
+    wanted = set(columns) | ({"time"} if need_time else set())
+    # 계정 ID 는 앞자리 0 이 있을 수 있으므로 문자열로
+    df = pd.read_csv(ALERTS_PATH, usecols=lambda c: c in wanted, dtype={"account": str})
+    if (date_from or date_to) and "time" in df.columns:
+        dates = df["time"].astype(str).str[:10]
+        if date_from:
+            df = df[dates >= str(date_from)]
+        if date_to:
+            df = df[dates <= str(date_to)]
+    return df[[c for c in columns if c in df.columns]]
@@ -0,0 +1,114 @@
+import sqlite3
+from pathlib import Path
+
+# ==========================
+# 📁 경로 설정
+# ==========================
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+MANIFEST_PATH = ROOT_DIR / "data" / "ingest_manifest.sqlite"
+
+# 객체 처리 상태
+STATE_DOWNLOADED = "downloaded"
+STATE_FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    key           TEXT PRIMARY KEY,
+    etag          TEXT,
+    size          INTEGER,
+    last_modified TEXT,
+    state         TEXT NOT NULL
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS watermarks (
+    prefix   TEXT PRIMARY KEY,
+    last_key TEXT NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class IngestManifest:
+    """
+    S3 수집 매니페스트 (SQLite)
+
+    - objects    : S3 key → ETag / Size / LastModified / 처리 상태
+    - watermarks : account/region prefix 별로 "여기까지는 다 받았다"는 마지막 key
+                   → 다음 실행 때 list_objects_v2(StartAfter=...) 로 사용
+
+    로컬 파일 존재 여부(stat) 대신 이 매니페스트로 스킵 여부를 판단하고,
+    ETag/Size 가 바뀐 객체는 다시 받는다.
+    sqlite 커넥션은 스레드 간 공유하지 않으므로 메인 스레드에서만 사용할 것.
+    """
+
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+
+    # ---------- 객체 ----------
+
+    def load_known(self, prefix, start_after=""):
+        """
+        prefix 아래(start_after 이후) 이미 기록된 객체를 dict 로 반환
+        key → (etag, size, state)  : 이후 O(1) 조회용
+        """
+        rows = self.conn.execute(
+            "SELECT key, etag, size, state FROM objects "
+            "WHERE key > ? AND key >= ? AND key < ?",
+            (start_after, prefix, prefix + "\U0010ffff"),
+        )
+        return {k: (etag, size, state) for k, etag, size, state in rows}
+
+    def record_many(self, rows):
+        """rows: (key, etag, size, last_modified, state) 튜플 목록"""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO objects (key, etag, size, last_modified, state) "
+                "VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET "
+                "etag=excluded.etag, size=excluded.size, "
+                "last_modified=excluded.last_modified, state=excluded.state",
+                rows,
+            )
+
+    # ---------- 워터마크 ----------
+
+    def get_watermark(self, prefix):
+        row = self.conn.execute(
+            "SELECT last_key FROM watermarks WHERE prefix = ?", (prefix,)
+        ).fetchone()
+        return row[0] if row else ""
+
+    def set_watermark(self, prefix, last_key):
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO watermarks (prefix, last_key) VALUES (?, ?) "
+                "ON CONFLICT(prefix) DO UPDATE SET last_key=excluded.last_key",
+                (prefix, last_key),
+            )
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def is_current(known, obj):
+    """매니페스트 기록과 ETag/Size 가 같고 이미 받은 객체면 True"""
+    entry = known.get(obj["Key"])
+    if entry is None:
+        return False
+    etag, size, state = entry
+    return (
+        state == STATE_DOWNLOADED
+        and etag == obj.get("ETag")
+        and size == obj.get("Size")
+    )
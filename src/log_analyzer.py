@@ -1,10 +1,45 @@
+import argparse
+import io
 import json
+import os
 import csv
+import time
+from collections import Counter
+from itertools import islice
+from operator import itemgetter
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 from scipy.stats import zscore
 
+try:
+    import pyarrow as pa
+    import pyarrow.json as pa_json
+except ImportError:  # 없으면 pandas.read_json 사용
+    pa = None
+
+try:
+    from src.event_store import EventStoreWriter, store_available, alerts_available, load_alerts
+    from src.rule_engine import RuleEngine
+    from src.serializer import event_decoder
+    from src.atomic_writer import AtomicWriter
+    from src.rollups import RollupBuilder, rollups_path
+    from src.event_index import EventIndexWriter
+    from src.top_events import TopEventsBuilder
+    from src.accounts import AccountFanout
+    from src.sketches import SketchBuilder
+except ImportError:  # python src/log_analyzer.py 로 직접 실행한 경우
+    from event_store import EventStoreWriter, store_available, alerts_available, load_alerts
+    from rule_engine import RuleEngine
+    from serializer import event_decoder
+    from atomic_writer import AtomicWriter
+    from rollups import RollupBuilder, rollups_path
+    from event_index import EventIndexWriter
+    from top_events import TopEventsBuilder
+    from accounts import AccountFanout
+    from sketches import SketchBuilder
+
 # ==========================
 # 📁 경로 설정 (프로젝트 루트 기준)
 # ==========================
@@ -18,96 +53,429 @@ ALERTS_PATH = OUT_DIR / "alerts.csv"
 USER_ANOM_PATH = OUT_DIR / "anomalies.csv"
 EVENT_ANOM_PATH = OUT_DIR / "event_anomalies.csv"
 
+# 한 번에 처리할 묶음 크기 (행 단위 모드: 줄 수 / 배치 모드: 바이트)
+BATCH_LINES = 200_000
+BATCH_BYTES = 32 << 20
+
+# actor / action 건수를 고정 메모리 sketch 로 셀지 (actor 종류가 매우 많을 때, CF_SKETCH=1)
+SKETCH_MODE = os.environ.get("CF_SKETCH", "0") == "1"
+
 
 # ==========================
 # 🔧 규칙 로딩 & 매칭
 # ==========================
 
+_rules_cache = [None, None]    # [규칙 파일 mtime_ns, rules dict]
+
+
 def load_rules():
-    """rules/sensitive_apis.json 로드 (없으면 기본 규칙 생성)"""
+    """
+    rules/sensitive_apis.json 로드 (없으면 기본 규칙 생성)
+    파일이 바뀌지 않았으면 같은 dict 를 돌려줌 → 상주 프로세스(watcher)에서
+    컴파일된 규칙 엔진을 계속 재사용하고, 규칙 파일을 고치면 다시 컴파일됨
+    """
     if not RULES_PATH.exists():
         print(f"⚠ 규칙 파일이 없습니다: {RULES_PATH}")
         print("   → 기본 규칙(*:*) 10점 Normal event로 대체합니다.")
         return {"*:*": {"risk": 10, "reason": "Normal event"}}
 
-    with open(RULES_PATH, encoding="utf-8") as f:
-        return json.load(f)
+    mtime = RULES_PATH.stat().st_mtime_ns
+    if _rules_cache[0] != mtime:
+        with open(RULES_PATH, encoding="utf-8") as f:
+            _rules_cache[1] = json.load(f)
+        _rules_cache[0] = mtime
+    return _rules_cache[1]
+
+
+_engine_cache = [None, None]   # [rules dict, 컴파일된 RuleEngine]
+
+
+def get_rule_engine(rules):
+    """같은 rules 객체면 컴파일된 엔진을 재사용"""
+    if _engine_cache[0] is not rules:
+        _engine_cache[0] = rules
+        _engine_cache[1] = RuleEngine(rules)
+    return _engine_cache[1]
 
 
-def match_rule(rules, service, action):
+def match_rule(rules, service, action, evt=None):
     """
-    우선순위:
+    우선순위 (priority 가 같을 때):
       1) service:action
-      2) service:*
-      3) *:action
-      4) *:*
+      2) service:Prefix*
+      3) service:*
+      4) *:action
+      5) *:Prefix*
+      6) *:*
+    evt 가 있으면 규칙의 when 조건(result/region/actor 등)도 평가
+    자세한 규칙 형식은 src/rule_engine.py 참고
     """
     service = (service or "").strip().lower()
     action = action or "Unknown"
-
-    keys = [
-        f"{service}:{action}",
-        f"{service}:*",
-        f"*:{action}",
-        "*:*",
-    ]
-    for k in keys:
-        if k in rules:
-            return rules[k]
-    # 여기에 도달하면 규칙에 전혀 없음 → 기본값
-    return {"risk": 10, "reason": "규칙 없음(기본)"}
+    return get_rule_engine(rules).match(service, action, evt)
 
 
 # ==========================
 # 1️⃣ 알림(alerts.csv) 생성
 # ==========================
 
-def generate_alerts():
+# region / account 는 뒤에 붙여서 앞 7개 컬럼 위치는 예전과 같음
+ALERT_HEADER = ["time", "actor", "service", "action", "result", "risk_score", "reason",
+                "region", "account"]
+
+
+def _iter_alert_rows(fin, rules, batch_lines=BATCH_LINES):
+    """(행 단위 모드) 이벤트 한 줄씩 디코딩 + match_rule → 행 목록을 배치로 yield"""
+    while True:
+        lines = list(islice(fin, batch_lines))
+        if not lines:
+            return
+        yield _alert_rows_from_lines(lines, rules)
+
+
+_JSON_FIELDS = ["eventTime", "actor", "service", "action", "result", "region", "account"]
+
+_decoders = {}   # 필요한 필드 목록 → (디코더, 디코딩 예외)
+
+
+def _line_decoder(engine):
+    """규칙 엔진이 보는 필드까지 포함한 JSONL 한 줄 디코더 (serializer.event_decoder)"""
+    fields = tuple(_JSON_FIELDS + sorted(engine.condition_fields - set(_JSON_FIELDS)))
+    if fields not in _decoders:
+        _decoders[fields] = event_decoder(fields)
+    return _decoders[fields]
+
+
+def _alert_rows_from_lines(lines, rules):
+    engine = get_rule_engine(rules)
+    decode, decode_error = _line_decoder(engine)
+    rows = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            evt = decode(line)
+        except decode_error:
+            continue
+
+        service = (evt.get("service") or "").strip().lower()
+        action = evt.get("action") or "Unknown"
+
+        rule = engine.match(service, action, evt)
+
+        rows.append([
+            evt.get("eventTime", ""),
+            evt.get("actor", "Unknown"),
+            service,
+            action,
+            evt.get("result", ""),
+            rule.get("risk", 10),
+            rule.get("reason", "규칙 없음(기본)"),
+            evt.get("region", ""),
+            evt.get("account", ""),
+        ])
+    return rows
+
+
+def _read_line_chunks(fin, chunk_bytes, stop=None):
+    """
+    바이너리 파일에서 줄 경계에 맞춘 chunk_bytes 크기 묶음을 yield
+    stop 을 주면 그 위치(줄 경계)까지만 읽음
+    """
+    pos = fin.tell()
+    while stop is None or pos < stop:
+        chunk = fin.read(chunk_bytes if stop is None else min(chunk_bytes, stop - pos))
+        if not chunk:
+            return
+        if not chunk.endswith(b"\n"):
+            chunk += fin.readline()
+        pos += len(chunk)
+        yield chunk
+
+
+def _chunk_to_frame(chunk, fields=_JSON_FIELDS):
+    """JSONL 바이트 묶음 → DataFrame (문자열 컬럼, 파싱 실패하면 ValueError)"""
+    if pa is not None:
+        schema = pa.schema([(f, pa.string()) for f in fields])
+        table = pa_json.read_json(
+            io.BytesIO(chunk),
+            parse_options=pa_json.ParseOptions(
+                explicit_schema=schema, unexpected_field_behavior="ignore"
+            ),
+        )
+        return table.to_pandas()
+    return pd.read_json(io.BytesIO(chunk), lines=True, dtype=False, convert_dates=False)
+
+
+def iter_line_chunks(path=PARSED_PATH, start=0, stop=None, chunk_bytes=BATCH_BYTES):
+    """JSONL 파일의 [start, stop) 바이트 구간(줄 경계)을 줄 경계에 맞춘 바이트 묶음으로 yield"""
+    with open(path, "rb") as fin:
+        fin.seek(start)
+        yield from _read_line_chunks(fin, chunk_bytes, stop)
+
+
+def iter_event_frames(path=PARSED_PATH, fields=_JSON_FIELDS, start=0, stop=None,
+                      chunk_bytes=BATCH_BYTES):
+    """
+    parsed_logs.jsonl 의 [start, stop) 바이트 구간(줄 경계)을 묶음 단위 DataFrame 으로 yield
+    규칙 매칭 없이 필드만 필요한 곳(프로파일 증분 갱신 등)에서 사용.
+    없는 필드는 컬럼도 없고, 파싱이 안 되는 줄이 섞인 묶음은 줄 단위로 디코딩해서 그 줄만 건너뜀
+    """
+    for chunk in iter_line_chunks(path, start, stop, chunk_bytes):
+        if not chunk.strip():
+            continue
+        try:
+            df = _chunk_to_frame(chunk, fields)
+        except ValueError:
+            decode, decode_error = event_decoder(tuple(fields))
+            rows = []
+            for line in chunk.decode("utf-8").splitlines():
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    evt = decode(line)
+                except decode_error:
+                    continue
+                rows.append([evt.get(f) for f in fields])
+            df = pd.DataFrame(rows, columns=list(fields))
+        if not df.empty:
+            yield df
+
+
+def _column(df, name, default):
+    """없는 컬럼은 default 로 채우고, null 은 default 로 치환"""
+    if name not in df.columns:
+        return pd.Series([default] * len(df), dtype=object)
+    return df[name].fillna(default)
+
+
+def _raw_column(df, name):
+    """조건 평가용: 없는 컬럼/결측값은 None"""
+    if name not in df.columns:
+        return [None] * len(df)
+    col = df[name]
+    return col.astype(object).where(col.notna(), None).tolist()
+
+
+def _iter_alert_rows_batched(fin, rules, chunk_bytes=BATCH_BYTES):
+    """
+    (배치 모드) JSONL 을 바이트 묶음 단위로 한 번에 DataFrame 으로 파싱하고
+    고유 (service, action) 조합만 규칙 엔진에서 조회해서
+    risk_score / reason 을 일괄 계산. fin 은 바이너리 모드로 연 파일.
+    when 조건이 걸린 규칙이 후보인 행만 이벤트 단위로 평가하고,
+    new_region 처럼 상태가 있는 규칙이 있으면 모든 행의 상태를 순서대로 갱신.
+    결과는 행 단위 모드와 바이트 단위로 같음.
+    파싱이 안 되는 줄이 섞인 묶음만 행 단위 모드로 처리.
+    """
+    engine = get_rule_engine(rules)
+    risk = np.array([r.get("risk", 10) for r in engine.specs], dtype=object)
+    reason = np.array([r.get("reason", "규칙 없음(기본)") for r in engine.specs], dtype=object)
+    cond_fields = sorted(engine.condition_fields)
+    fields = _JSON_FIELDS + [f for f in cond_fields if f not in _JSON_FIELDS]
+
+    for chunk in _read_line_chunks(fin, chunk_bytes):
+        if not chunk.strip():
+            continue
+        try:
+            df = _chunk_to_frame(chunk, fields)
+        except ValueError:
+            lines = chunk.decode("utf-8").splitlines()
+            yield _alert_rows_from_lines(lines, rules)
+            continue
+        if df.empty:
+            continue
+
+        # 행 단위 모드의 (x or 기본값) 규칙과 같게 맞춤
+        service = _column(df, "service", "").str.strip().str.lower()
+        action = _column(df, "action", "")
+        action = action.where(action != "", "Unknown")
+
+        # 고유 (service, action) 조합만 규칙 조회 후 전체 행으로 펼침
+        svc_codes, svc_uniq = pd.factorize(service)
+        act_codes, act_uniq = pd.factorize(action)
+        pair = svc_codes.astype(np.int64) * len(act_uniq) + act_codes
+        pairs, inverse = np.unique(pair, return_inverse=True)
+        svc_uniq = np.asarray(svc_uniq, dtype=object)[pairs // len(act_uniq)]
+        act_uniq = np.asarray(act_uniq, dtype=object)[pairs % len(act_uniq)]
+        static = np.array([engine.static_rule_id(s, a) for s, a in zip(svc_uniq, act_uniq)],
+                          dtype=np.int64)
+        idx = static[inverse]
+
+        # 조건부 규칙 / 상태 있는 규칙은 행 순서대로 평가
+        if engine.stateful or (idx < 0).any():
+            raw = {f: _raw_column(df, f) for f in cond_fields}
+            svc_list = service.tolist()
+            act_list = action.tolist()
+            for i in range(len(idx)):
+                evt = {f: raw[f][i] for f in cond_fields}
+                if idx[i] < 0:
+                    idx[i] = engine.match_id(svc_list[i], act_list[i], evt)
+                else:
+                    engine.observe(evt)
+
+        yield list(zip(
+            _column(df, "eventTime", "").tolist(),
+            _column(df, "actor", "Unknown").tolist(),
+            service.tolist(),
+            action.tolist(),
+            _column(df, "result", "").tolist(),
+            risk[idx].tolist(),
+            reason[idx].tolist(),
+            _column(df, "region", "").tolist(),
+            _column(df, "account", "").tolist(),
+        ))
+
+
+class _CountSink:
+    """actor / action 별 건수를 알림 생성과 같은 패스에서 누적 (alerts 재읽기 없이 이상탐지)"""
+
+    def __init__(self):
+        self.actors = Counter()
+        self.actions = Counter()
+
+    def write_rows(self, rows):
+        self.actors.update(map(itemgetter(1), rows))
+        self.actions.update(map(itemgetter(3), rows))
+
+
+def iter_alert_rows(paths=(PARSED_PATH,), rules=None, batched=True, since=None):
+    """
+    JSONL 파일들(순서대로)의 알림 행(ALERT_HEADER 순서)을 묶음 단위로 yield
+    generate_alerts 와 같은 규칙 매칭 (파일 출력 없음, 규칙 엔진 상태는 호출하는 쪽에서 reset)
+    since : UTC datetime 이면 eventTime 이 그 시각 이후인 행만
+    """
+    rules = load_rules() if rules is None else rules
+    iter_rows = _iter_alert_rows_batched if batched else _iter_alert_rows
+    mode = {"mode": "rb"} if batched else {"encoding": "utf-8"}
+    since_text = since.strftime("%Y-%m-%dT%H:%M:%S") if since else None
+    for path in paths:
+        with open(path, **mode) as fin:
+            for rows in iter_rows(fin, rules):
+                if since_text:
+                    # '2025-11-20T10:59:52Z' 형식은 문자열 비교가 시각 비교와 같음
+                    rows = [r for r in rows if type(r[0]) is str and r[0] >= since_text]
+                    if not rows:
+                        continue
+                yield rows
+
+
+def generate_alerts(export_csv=True, batched=True, sinks=(), timings=None, build_index=True,
+                    by_account=False, since=None, rollup_by_actor=True):
     """
     parsed_logs.jsonl + rules/sensitive_apis.json 을 기반으로
-    out/alerts.csv 생성
+    out/event_store (Parquet, pyarrow 있을 때) 와 out/alerts.csv 생성
+    같은 패스에서 대시보드용 시간별 rollup(out/rollups/) 과
+    이벤트 인덱스(out/event_index.sqlite, build_index=False 면 생략),
+    위험도/최신 top-k(out/top_events.json) 도 함께 생성
+    by_account=True 면 계정별 alerts(out/accounts/<account>/alerts.csv) 로도 나눠 씀
+    export_csv=False 면 alerts.csv 는 만들지 않음 (event_store 만)
+    batched=True  : 줄 묶음 단위 벡터화 규칙 매칭 (기본)
+    batched=False : 예전 행 단위 json.loads + match_rule
+    sinks   : write_rows(rows) 를 가진 객체들 → 같은 패스에서 알림 행을 함께 전달받음
+    timings : dict 를 넘기면 단계별 소요 시간(초)을 채워줌
+    since   : UTC datetime (retention.parse_since("24h") 등) 이면 parsed_logs.jsonl 전체 대신
+              그 날짜 이후의 일별 파티션(data/partitions/)만 읽고, 그 시각 이후 이벤트만으로 출력을 만듦
+    rollup_by_actor=False 면 rollup 에서 actor 를 나누지 않음 (sketch 모드, actor 종류가 매우 많을 때)
+      top-k 는 k 건만, 이벤트 인덱스는 디스크(SQLite)에만 쌓으므로 actor 종류 수만큼 메모리가 늘지 않음
     """
     if not PARSED_PATH.exists():
         print(f"❌ 정규화 로그 파일이 없습니다: {PARSED_PATH}")
         print("   → 먼저 log_collector.py 를 실행해서 parsed_logs.jsonl 을 생성하세요.")
         return False
 
+    sources = [PARSED_PATH]
+    if since is not None:
+        # retention 이 이 모듈을 import 하므로 순환 import 를 피해 여기서 import
+        try:
+            from src.retention import partition_events, partition_files
+        except ImportError:  # python src/log_analyzer.py 로 직접 실행한 경우
+            from retention import partition_events, partition_files
+        partition_events()
+        sources = partition_files(since=since)
+        print(f"🕒 {since:%Y-%m-%d %H:%M} UTC 이후 이벤트만 분석 (일별 파티션 {len(sources)}개)")
+
+    if not export_csv and not store_available():
+        print("⚠ pyarrow 가 없어 event_store 를 쓸 수 없습니다 → alerts.csv 로 내보냅니다.")
+        export_csv = True
+
     rules = load_rules()
+    get_rule_engine(rules).reset_state()
     OUT_DIR.mkdir(parents=True, exist_ok=True)
 
-    with open(PARSED_PATH, encoding="utf-8") as fin, \
-         open(ALERTS_PATH, "w", newline="", encoding="utf-8") as fout:
-
-        writer = csv.writer(fout)
-        writer.writerow(["time", "actor", "service", "action", "result", "risk_score", "reason"])
+    store = EventStoreWriter() if store_available() else None
+    # 임시 파일에 버퍼링해서 쓰고 끝나면 교체 → 대시보드가 반쯤 쓰인 alerts.csv 를 읽지 않음
+    fout = AtomicWriter(ALERTS_PATH, text=True) if export_csv else None
+    rollup = RollupBuilder(by_actor=rollup_by_actor)
+    index = EventIndexWriter() if build_index else None
+    top = TopEventsBuilder()
+    fanout = AccountFanout(ALERT_HEADER) if by_account else None
+    sinks = [rollup, top, *(s for s in (index, fanout) if s), *sinks]
+    t_match = 0.0
+    t_write = 0.0
+
+    try:
+        writer = None
+        if fout:
+            writer = csv.writer(fout)
+            writer.writerow(ALERT_HEADER)
 
         count = 0
-        for line in fin:
-            line = line.strip()
-            if not line:
-                continue
-            try:
-                evt = json.loads(line)
-            except json.JSONDecodeError:
-                continue
-
-            service = (evt.get("service") or "").strip().lower()
-            action = evt.get("action") or "Unknown"
-
-            rule = match_rule(rules, service, action)
-
-            writer.writerow([
-                evt.get("eventTime", ""),
-                evt.get("actor", "Unknown"),
-                service,
-                action,
-                evt.get("result", ""),
-                rule.get("risk", 10),
-                rule.get("reason", "규칙 없음(기본)"),
-            ])
-            count += 1
-
-    print(f"✅ alerts.csv 생성 완료 → {ALERTS_PATH} (총 {count}건)")
+        rows_iter = iter_alert_rows(sources, rules, batched, since)
+        while True:
+            t0 = time.perf_counter()
+            rows = next(rows_iter, None)
+            t1 = time.perf_counter()
+            t_match += t1 - t0
+            if rows is None:
+                break
+            if writer:
+                writer.writerows(rows)
+            if store:
+                store.write_rows(rows)
+            for sink in sinks:
+                sink.write_rows(rows)
+            count += len(rows)
+            t_write += time.perf_counter() - t1
+    except BaseException:
+        if store:
+            store.abort()
+        if fout:
+            fout.abort()
+        if index:
+            index.abort()
+        if fanout:
+            fanout.abort()
+        raise
+
+    t1 = time.perf_counter()
+    if fout:
+        fout.close()
+    n_rollup = rollup.close()
+    accounts = fanout.close() if fanout else None
+    if store:
+        # CSV 보다 나중에 교체되어야 읽는 쪽이 event_store 를 최신으로 판단함
+        store.close()
+        print(f"✅ event_store 생성 완료 → {store.root} (총 {count}건)")
+    # 인덱스 / top-k 는 alerts.csv / event_store 보다 나중에 교체되어야 최신으로 판단됨
+    top_path = top.close()
+    if index:
+        index.close()
+    if export_csv:
+        print(f"✅ alerts.csv 생성 완료 → {ALERTS_PATH} (총 {count}건)")
+    print(f"✅ rollup 생성 완료 → {rollups_path()} ({n_rollup}행)")
+    print(f"✅ top-{top.k} 이벤트 생성 완료 → {top_path}")
+    if index:
+        print(f"✅ 이벤트 인덱스 생성 완료 → {index.path}")
+    if accounts is not None:
+        print(f"✅ 계정별 alerts 생성 완료 → {fanout.root} ({len(accounts)}개 계정)")
+    t_write += time.perf_counter() - t1
+
+    if timings is not None:
+        timings["parse+match"] = t_match
+        timings["write"] = t_write
+        timings["events"] = count
     return True
 
 
@@ -115,17 +483,49 @@ def generate_alerts():
 # 2️⃣ 사용자 단위 이상행동 탐지 (anomalies.csv)
 # ==========================
 
+def _counts_frame(counter, key):
+    """Counter → value_counts 와 같은 모양 (건수 내림차순, 결측/빈 값 제외)"""
+    items = [(k, c) for k, c in counter.items() if k is not None and k != ""]
+    items.sort(key=lambda kv: -kv[1])
+    return pd.DataFrame(items, columns=[key, "count"])
+
+
+def _sketch_frame(sketch, key):
+    """
+    FrequencySketch → _counts_frame 과 같은 컬럼 + 근사 zscore
+    (heavy hitter 후보만, 평균/표준편차는 HLL 고유 수와 CMS F2 추정으로 계산)
+    """
+    return sketch.zscores().rename(columns={"key": key})
+
+
+def _save_user_anomalies(user_counts, threshold, out_path=USER_ANOM_PATH):
+    if len(user_counts) < 2:
+        print("⚠ 사용자 수가 너무 적어 Z-score를 계산할 수 없습니다.")
+        return False
+
+    if "zscore" not in user_counts.columns:   # sketch 모드는 근사 Z-score 가 이미 있음
+        user_counts["zscore"] = zscore(user_counts["count"])
+
+    anomalies = user_counts[user_counts["zscore"] > threshold]
+
+    with AtomicWriter(out_path, text=True, encoding="utf-8-sig") as f:
+        anomalies.to_csv(f, index=False)
+
+    print(f"✅ 사용자 이상행동 탐지 완료 → {out_path} (임계값 Z>{threshold}, 총 {len(anomalies)}명)")
+    return True
+
+
 def detect_user_anomalies(threshold=2.0):
     """
-    alerts.csv 기반으로 actor별 이벤트 수를 세고,
+    alerts(event_store 또는 alerts.csv)의 actor 컬럼만 읽어서 actor별 이벤트 수를 세고,
     Z-score > threshold 인 사용자만 anomalies.csv에 저장
     """
-    if not ALERTS_PATH.exists():
+    if not alerts_available():
         print(f"⚠ alerts.csv 가 없습니다: {ALERTS_PATH}")
         print("   → generate_alerts()를 먼저 실행해야 합니다.")
         return False
 
-    df = pd.read_csv(ALERTS_PATH)
+    df = load_alerts(columns=["actor"])
 
     if "actor" not in df.columns:
         print("⚠ alerts.csv 에 'actor' 컬럼이 없습니다. 이상 사용자 탐지를 건너뜁니다.")
@@ -137,37 +537,40 @@ def detect_user_anomalies(threshold=2.0):
 
     user_counts = df["actor"].value_counts().reset_index()
     user_counts.columns = ["actor", "count"]
+    return _save_user_anomalies(user_counts, threshold)
 
-    if len(user_counts) < 2:
-        print("⚠ 사용자 수가 너무 적어 Z-score를 계산할 수 없습니다.")
-        return False
 
-    user_counts["zscore"] = zscore(user_counts["count"])
+# ==========================
+# 3️⃣ 이벤트(action) 단위 이상탐지 (event_anomalies.csv)
+# ==========================
 
-    anomalies = user_counts[user_counts["zscore"] > threshold]
+def _save_event_anomalies(event_counts, threshold, out_path=EVENT_ANOM_PATH):
+    if len(event_counts) < 2:
+        print("⚠ 이벤트 종류가 너무 적어 Z-score를 계산할 수 없습니다.")
+        return False
 
-    OUT_DIR.mkdir(parents=True, exist_ok=True)
-    anomalies.to_csv(USER_ANOM_PATH, index=False, encoding="utf-8-sig")
+    if "zscore" not in event_counts.columns:
+        event_counts["zscore"] = zscore(event_counts["count"])
+    anomalies = event_counts[event_counts["zscore"] > threshold]
 
-    print(f"✅ 사용자 이상행동 탐지 완료 → {USER_ANOM_PATH} (임계값 Z>{threshold}, 총 {len(anomalies)}명)")
-    return True
+    with AtomicWriter(out_path, text=True, encoding="utf-8-sig") as f:
+        anomalies.to_csv(f, index=False)
 
+    print(f"✅ 이벤트 이상탐지 완료 → {out_path} (임계값 Z>{threshold}, 총 {len(anomalies)}개)")
+    return True
 
-# ==========================
-# 3️⃣ 이벤트(action) 단위 이상탐지 (event_anomalies.csv)
-# ==========================
 
 def detect_event_anomalies(threshold=2.0):
     """
-    alerts.csv 기반으로 action별 발생 횟수를 세고,
+    alerts(event_store 또는 alerts.csv)의 action 컬럼만 읽어서 action별 발생 횟수를 세고,
     Z-score > threshold 인 action만 event_anomalies.csv에 저장
     """
-    if not ALERTS_PATH.exists():
+    if not alerts_available():
         print(f"⚠ alerts.csv 가 없습니다: {ALERTS_PATH}")
         print("   → generate_alerts()를 먼저 실행해야 합니다.")
         return False
 
-    df = pd.read_csv(ALERTS_PATH)
+    df = load_alerts(columns=["action"])
 
     if "action" not in df.columns:
         print("⚠ alerts.csv 에 'action' 컬럼이 없습니다. 이상 이벤트 탐지를 건너뜁니다.")
@@ -179,50 +582,97 @@ def detect_event_anomalies(threshold=2.0):
 
     event_counts = df["action"].value_counts().reset_index()
     event_counts.columns = ["action", "count"]
-
-    if len(event_counts) < 2:
-        print("⚠ 이벤트 종류가 너무 적어 Z-score를 계산할 수 없습니다.")
-        return False
-
-    event_counts["zscore"] = zscore(event_counts["count"])
-    anomalies = event_counts[event_counts["zscore"] > threshold]
-
-    OUT_DIR.mkdir(parents=True, exist_ok=True)
-    anomalies.to_csv(EVENT_ANOM_PATH, index=False, encoding="utf-8-sig")
-
-    print(f"✅ 이벤트 이상탐지 완료 → {EVENT_ANOM_PATH} (임계값 Z>{threshold}, 총 {len(anomalies)}개)")
-    return True
+    return _save_event_anomalies(event_counts, threshold)
 
 
 # ==========================
 # 🔔 V4용 통합 엔트리 포인트
 # ==========================
 
-def analyze_logs(user_thresh=2.0, event_thresh=2.0):
+def _print_timings(timings):
+    total = sum(v for k, v in timings.items() if k != "events")
+    n = timings.get("events", 0)
+    parts = ", ".join(f"{k} {v:.2f}s" for k, v in timings.items() if k != "events")
+    rate = n / total if total > 0 else 0.0
+    print(f"⏱ Analyzer 단계별 시간: {parts} (총 {total:.2f}s, {rate:,.0f} events/s)")
+
+
+def analyze_logs(user_thresh=2.0, event_thresh=2.0, export_csv=True, fused=True, by_account=False,
+                 sketch=SKETCH_MODE, since=None):
     """
     V4에서 main.py 등에서 호출할 통합 함수.
-    1) alerts.csv 생성
+    1) event_store / alerts.csv 생성 (export_csv=False 면 CSV 생략)
     2) anomalies.csv 생성 (사용자)
     3) event_anomalies.csv 생성 (이벤트)
+    fused=True 면 1) 을 만드는 같은 패스에서 actor/action 건수를 세서
+    2), 3) 을 alerts 재읽기 없이 바로 계산 (parsed_logs.jsonl 한 번만 읽음)
+    fused=False 면 예전처럼 단계마다 alerts 를 다시 읽음
+    by_account=True 면 1) 에서 계정별 alerts 도 나눠 씀 (src/accounts.py)
+    sketch=True 면 actor/action 을 정확히 세는 대신 고정 메모리 sketch(src/sketches.py)로 세고
+    heavy hitter 후보의 근사 Z-score 로 2), 3) 을 계산, out/sketches.json 도 저장 (fused 일 때만)
+      이때 rollup 도 actor 를 나누지 않음 (대시보드 Actor 목록은 sketch 의 heavy hitter)
+    since (UTC datetime) 를 주면 그 시각 이후 이벤트만 일별 파티션에서 읽어 1)~3) 을 만듦
     """
+    timings = {}
+    if fused:
+        counts = SketchBuilder() if sketch else _CountSink()
+    else:
+        counts = None
+
     print("\n=== [Analyzer] Step 1: Generate alerts.csv ===")
-    ok = generate_alerts()
+    ok = generate_alerts(export_csv=export_csv, sinks=[counts] if counts else (),
+                         timings=timings, by_account=by_account, since=since,
+                         rollup_by_actor=not isinstance(counts, SketchBuilder))
     if not ok:
         print("❌ alerts.csv 생성 실패 → 이후 단계를 건너뜁니다.")
         return
+    if isinstance(counts, SketchBuilder):
+        # alerts 출력보다 나중에 기록되어야 최신으로 판단됨
+        print(f"✅ sketch 저장 완료 → {counts.close()}")
 
     print("\n=== [Analyzer] Step 2: User anomaly detection (anomalies.csv) ===")
-    detect_user_anomalies(threshold=user_thresh)
+    t0 = time.perf_counter()
+    if counts is None:
+        detect_user_anomalies(threshold=user_thresh)
+    elif timings["events"] == 0:
+        print("⚠ alerts.csv 가 비어 있습니다. 이상 사용자 탐지를 건너뜁니다.")
+    elif isinstance(counts, SketchBuilder):
+        _save_user_anomalies(_sketch_frame(counts.actors, "actor"), user_thresh)
+    else:
+        _save_user_anomalies(_counts_frame(counts.actors, "actor"), user_thresh)
+    timings["user_anomalies"] = time.perf_counter() - t0
 
     print("\n=== [Analyzer] Step 3: Event anomaly detection (event_anomalies.csv) ===")
-    detect_event_anomalies(threshold=event_thresh)
+    t0 = time.perf_counter()
+    if counts is None:
+        detect_event_anomalies(threshold=event_thresh)
+    elif timings["events"] == 0:
+        print("⚠ alerts.csv 가 비어 있습니다. 이상 이벤트 탐지를 건너뜁니다.")
+    elif isinstance(counts, SketchBuilder):
+        _save_event_anomalies(_sketch_frame(counts.actions, "action"), event_thresh)
+    else:
+        _save_event_anomalies(_counts_frame(counts.actions, "action"), event_thresh)
+    timings["event_anomalies"] = time.perf_counter() - t0
 
+    _print_timings(timings)
     print("\n✅ Analyzer 전체 작업 완료\n")
 
 
 def main():
-    """단독 실행용 (python src/log_analyzer.py)"""
-    analyze_logs()
+    """단독 실행용 (python src/log_analyzer.py --since 24h)"""
+    ap = argparse.ArgumentParser(description="alerts / 이상탐지 생성")
+    ap.add_argument("--since", default=os.environ.get("CF_SINCE"),
+                    help="이 시각 이후 이벤트만 분석 (24h, 7d, 2025-11-20 …, 기본: 환경변수 CF_SINCE 또는 전체)")
+    ap.add_argument("--by-account", action="store_true", help="계정별 alerts 도 나눠 씀")
+    args = ap.parse_args()
+    since = None
+    if args.since:
+        try:
+            from src.retention import parse_since
+        except ImportError:
+            from retention import parse_since
+        since = parse_since(args.since)
+    analyze_logs(by_account=args.by_account, since=since)
 
 
 if __name__ == "__main__":
@@ -1,12 +1,86 @@
 # src/log_collector.py
+import os
+import re
+import sys
 import json
 import gzip
+import time
+import shutil
+import hashlib
+import argparse
 from pathlib import Path
+from functools import lru_cache
+from typing import NamedTuple
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from src.log_discovery import discover_raw_files
+    from src.serializer import dumps_line
+    from src.atomic_writer import AtomicWriter, WRITE_BUFFER
+except ImportError:  # python src/log_collector.py 로 직접 실행한 경우
+    from log_discovery import discover_raw_files
+    from serializer import dumps_line
+    from atomic_writer import AtomicWriter, WRITE_BUFFER
 
 # 프로젝트 루트 기준으로 paths 계산
 ROOT_DIR = Path(__file__).resolve().parents[1]
 RAW_DIR  = ROOT_DIR / "data" / "raw_logs"
 OUT_PATH = ROOT_DIR / "data" / "parsed_logs.jsonl"
+SHARD_DIR = ROOT_DIR / "data" / "parsed_shards"
+STATE_PATH = ROOT_DIR / "data" / "collector_state.json"
+# retention.compact_raw_logs 가 만드는 세그먼트 (raw_logs 는 건드리지 않고 따로 보관)
+COMPACT_DIR = ROOT_DIR / "data" / "compacted"
+COMPACT_MANIFEST = COMPACT_DIR / "manifest.json"
+# 수집 상태 / 파일 목록에서 세그먼트를 raw 파일과 구분하는 접두어
+SEGMENT_REL_PREFIX = "@compacted/"
+
+# 정규화 워커 프로세스 수 (1 이면 단일 프로세스, 환경변수로 덮어쓰기 가능)
+WORKERS = int(os.environ.get("COLLECTOR_WORKERS", "1"))
+
+# 정규화 결과 형식 버전 (필드가 바뀌면 올림 → 예전 shard 는 버리고 전체 재정규화)
+NORMALIZE_VERSION = 2
+
+# 스트리밍 파서가 한 번에 읽는 크기 (문자 단위)
+CHUNK_SIZE = 1 << 16
+
+# 읽었던 구간이 그대로인지 확인할 때 해시하는 앞 / 뒤 크기 (prefix_fingerprint)
+FINGERPRINT_BYTES = 4096
+
+# 정규화된 줄(JSONL)에서 eventTime 날짜만 디코딩 없이 찾기
+_EVENT_DATE = re.compile(rb'"eventTime":\s*"(\d{4}-\d{2}-\d{2})')
+
+_decoder = json.JSONDecoder()
+_WS = " \t\n\r"
+
+
+# ==========================
+# 🧩 이벤트 정규화
+# ==========================
+
+class NormalizedEvent(NamedTuple):
+    """
+    정규화된 이벤트 (튜플 기반, dict 대신 쓸 수 있는 가벼운 형태)
+    _asdict() 는 normalize_event() 결과와 같은 dict
+    """
+    eventTime: str
+    service: str
+    action: str
+    actor: str
+    result: str
+    region: str
+    account: str
+
+
+# eventSource / ARN 은 trail 전체에서 종류가 수백 개뿐이므로 파생값을 캐시하고
+# 결과 문자열은 intern 해서 이벤트마다 새 문자열 사본을 만들지 않음
+@lru_cache(maxsize=4096)
+def _service_of(src: str) -> str:
+    return sys.intern(src.split(".")[0].lower())
+
+
+@lru_cache(maxsize=65536)
+def _actor_of_arn(arn: str) -> str:
+    return sys.intern(arn.split("/")[-1] if "/" in arn else arn)
 
 
 def normalize_event(event: dict) -> dict:
@@ -16,7 +90,7 @@ def normalize_event(event: dict) -> dict:
     service = ""
     src = event.get("eventSource")
     if src:
-        service = src.split(".")[0].lower()
+        service = _service_of(src) if type(src) is str else src.split(".")[0].lower()
 
     action = event.get("eventName") or "Unknown"
 
@@ -25,71 +99,636 @@ def normalize_event(event: dict) -> dict:
     actor = identity.get("userName")
     if not actor:
         arn = identity.get("arn", "Unknown")
-        actor = arn.split("/")[-1] if "/" in arn else arn
+        if type(arn) is str:
+            actor = _actor_of_arn(arn)
+        else:
+            actor = arn.split("/")[-1] if "/" in arn else arn
 
     result = "Allowed"
     err = event.get("errorCode")
     if err:
         result = err
 
+    # 계정: 이벤트를 받은 계정(recipientAccountId) 우선, 없으면 호출자 계정
+    account = event.get("recipientAccountId") or identity.get("accountId") or ""
+
     return {
         "eventTime": event.get("eventTime", ""),
         "service": service,
         "action": action,
         "actor": actor,
         "result": result,
+        "region": event.get("awsRegion", ""),
+        "account": account,
     }
 
 
-def collect_logs():
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+def normalize_event_tuple(event: dict) -> NormalizedEvent:
     """
-    data/raw_logs 안의 *.json, *.json.gz 를 모두 읽어서
-    data/parsed_logs.jsonl 로 정규화해서 저장
+    normalize_event 와 같은 값을 NormalizedEvent 로 반환.
+    이벤트를 메모리에 많이 들고 있을 때용이라 action / actor / result / region / account 도 intern 함
+    (바로 직렬화하고 버리는 수집 경로에서는 intern 비용이 더 커서 normalize_event 는 하지 않음)
     """
-    RAW_DIR.mkdir(parents=True, exist_ok=True)
-    OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    e = normalize_event(event)
+    return NormalizedEvent(e["eventTime"], e["service"], _intern(e["action"]), _intern(e["actor"]),
+                           _intern(e["result"]), _intern(e["region"]), _intern(e["account"]))
 
-    # .json + .json.gz 모두 대상
-    all_files = list(RAW_DIR.glob("*.json")) + list(RAW_DIR.glob("*.json.gz"))
-    print(f"[collector] Found {len(all_files)} raw log files")
 
-    total_events = 0
+# ==========================
+# 🌊 스트리밍 Records 파서
+# ==========================
 
-    with OUT_PATH.open("w", encoding="utf-8") as out_f:
-        for fp in all_files:
-            # CloudTrail-Digest 파일은 무시 (Records가 아니라 서명 정보라서)
-            if "CloudTrail-Digest" in fp.name:
-                # 필요하면 여기에서 따로 로깅만 하고 continue
-                continue
+class _StreamBuffer:
+    """
+    파일을 CHUNK_SIZE 씩 읽으면서 JSON 값을 하나씩 꺼내는 작은 토크나이저.
+    json.JSONDecoder.raw_decode 로 값 하나를 디코드하고,
+    값이 버퍼 경계에서 잘렸으면 더 읽어서 다시 시도한다.
+    """
 
-            # 압축 여부에 따라 다르게 열기
-            if fp.suffix == ".gz":
-                f = gzip.open(fp, "rt", encoding="utf-8")
-            else:
-                f = fp.open("r", encoding="utf-8")
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
 
+    def _fill(self, size=None):
+        chunk = self.f.read(size or self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """공백을 건너뛰고 다음 글자 반환 (EOF 면 None)"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WS:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return None
+
+    def expect(self, ch):
+        if self.peek() != ch:
+            raise json.JSONDecodeError(f"Expecting {ch!r}", self.buf, self.pos)
+        self.pos += 1
+
+    def value(self):
+        """다음 JSON 값 하나를 디코드해서 반환"""
+        self.peek()
+        size = self.chunk_size
+        while True:
             try:
-                with f:
-                    data = json.load(f)
+                obj, end = _decoder.raw_decode(self.buf, self.pos)
             except json.JSONDecodeError:
-                print(f"[collector] Invalid JSON, skip: {fp}")
+                if self.eof:
+                    raise
+                # 값이 잘렸음 → 더 읽고 재시도 (큰 값은 읽는 크기를 늘려서 재디코드 횟수 제한)
+                self._fill(size)
+                size *= 2
                 continue
-
-            records = data.get("Records", [])
-            if not records:
-                # CloudTrail-Digest 처럼 Records 없는 것도 많음
+            if end == len(self.buf) and not self.eof and not isinstance(obj, (dict, list, str)):
+                # 숫자/리터럴이 버퍼 끝에 걸렸으면 뒤가 더 있을 수 있음
+                self._fill(size)
                 continue
+            self.pos = end
+            return obj
 
-            for e in records:
-                parsed = normalize_event(e)
-                out_f.write(json.dumps(parsed, ensure_ascii=False) + "\n")
-                total_events += 1
 
-    print(f"✅ 정규화 완료 → {OUT_PATH} (총 {total_events} events)")
+def iter_records(f, chunk_size=CHUNK_SIZE):
+    """
+    CloudTrail 파일의 {"Records": [...]} 에서 레코드를 하나씩 yield.
+    파일 전체를 메모리에 올리지 않으므로 파일 크기와 무관하게 메모리 사용량이 일정.
+    Records 외의 최상위 키는 읽고 버린다.
+    """
+    sb = _StreamBuffer(f, chunk_size)
+    sb.expect("{")
+    if sb.peek() == "}":
+        return
 
+    while True:
+        key = sb.value()
+        sb.expect(":")
+        if key == "Records" and sb.peek() == "[":
+            sb.expect("[")
+            if sb.peek() == "]":
+                sb.pos += 1
+            else:
+                while True:
+                    yield sb.value()
+                    c = sb.peek()
+                    sb.pos += 1
+                    if c == "]":
+                        break
+                    if c != ",":
+                        raise json.JSONDecodeError("Expecting ',' or ']'", sb.buf, sb.pos - 1)
+        else:
+            sb.value()
 
-if __name__ == "__main__":
-    collect_logs()
+        c = sb.peek()
+        sb.pos += 1
+        if c == "}":
+            return
+        if c != ",":
+            raise json.JSONDecodeError("Expecting ',' or '}'", sb.buf, sb.pos - 1)
+
+
+def _open_raw(fp: Path):
+    """압축 여부에 따라 다르게 열기"""
+    if fp.suffix == ".gz":
+        return gzip.open(fp, "rt", encoding="utf-8")
+    return fp.open("r", encoding="utf-8")
+
+
+def iter_raw_records(fp: Path):
+    """raw 파일 하나의 CloudTrail 레코드(정규화 전)를 하나씩 yield (잘못된 JSON 이면 JSONDecodeError)"""
+    with _open_raw(fp) as f:
+        yield from iter_records(f)
+
+
+def iter_file_events(fp: Path, streaming=True):
+    """
+    raw 로그 파일 하나에서 정규화된 이벤트를 하나씩 yield
+      streaming=True  : iter_records 로 레코드 단위 파싱 (메모리 일정)
+      streaming=False : 예전 방식 (json.load 로 파일 전체 로드)
+    잘못된 JSON 이면 json.JSONDecodeError 가 발생한다.
+    """
+    with _open_raw(fp) as f:
+        if streaming:
+            for e in iter_records(f):
+                yield normalize_event(e)
+            return
+
+        data = json.load(f)
+
+    # CloudTrail-Digest 처럼 Records 없는 것도 많음
+    for e in data.get("Records") or []:
+        yield normalize_event(e)
+
+
+def _is_date(t):
+    return type(t) is str and len(t) >= 10 and t[4] == "-" and t[7] == "-"
+
+
+def line_event_date(line: bytes):
+    """정규화된 JSONL 한 줄 → eventTime 날짜 'YYYY-MM-DD' (없거나 형식이 다르면 None)"""
+    m = _EVENT_DATE.search(line)
+    return m.group(1).decode("ascii") if m else None
+
+
+def _shard_path(rel: str) -> Path:
+    """raw 파일 상대경로(raw_logs 기준) → 고정 이름의 shard 파일 경로"""
+    return SHARD_DIR / (hashlib.sha1(rel.encode("utf-8")).hexdigest()[:20] + ".jsonl")
+
+
+def _normalize_to_shard(args):
+    """
+    (워커 프로세스) raw 파일 하나(raw_logs 기준 상대경로, 또는 세그먼트) → 자기 shard 파일.
+    반환값: 이벤트 수 (잘못된 JSON 이면 None, shard 도 남기지 않음)
+    """
+    rel, streaming, drop_before = args
+    shard = _shard_path(rel)
+    written = 0
+    # 이벤트 줄은 버퍼에 모아 큰 덩어리로 기록, 다 쓰면 shard 로 교체
+    with AtomicWriter(shard) as out:
+        try:
+            for parsed in iter_file_events(source_path(rel), streaming):
+                # retention 으로 이미 rollup 에 보관하고 지운 날짜는 다시 넣지 않음
+                t = parsed["eventTime"]
+                if drop_before and _is_date(t) and t[:10] < drop_before:
+                    continue
+                out.write(dumps_line(parsed))
+                written += 1
+        except json.JSONDecodeError:
+            out.abort()
+            written = None
+    if written is None and shard.exists():
+        shard.unlink()
+    return written
+
+
+# ==========================
+# 🗜 압축 세그먼트 (retention.compact_raw_logs)
+# ==========================
+
+def source_path(rel: str) -> Path:
+    """수집 목록의 상대경로 → 실제 파일 (SEGMENT_REL_PREFIX 로 시작하면 data/compacted/ 아래 세그먼트)"""
+    if rel.startswith(SEGMENT_REL_PREFIX):
+        return COMPACT_DIR / rel[len(SEGMENT_REL_PREFIX):]
+    return RAW_DIR / rel
+
+
+def load_compact_manifest():
+    """
+    data/compacted/manifest.json
+      segments : 세그먼트 상대경로(data/compacted 기준) → {"sources": {raw 상대경로: {mtime_ns, size}}}
+    세그먼트를 다 쓴 뒤에만 여기에 기록하므로, 목록에 없는 세그먼트 파일은 중단된 압축의 잔여물
+    """
+    try:
+        with COMPACT_MANIFEST.open("r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"segments": {}}
+
+
+def save_compact_manifest(manifest):
+    with AtomicWriter(COMPACT_MANIFEST, text=True) as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+
+def _apply_segments(files):
+    """
+    raw 파일 목록에서 유효한 세그먼트가 대신하는 원본을 빼고 세그먼트를 넣음.
+    원본이 없어졌거나 mtime/size 가 manifest 와 다르면 그 세그먼트는 버리고 (manifest 에서도 삭제)
+    원본들을 각각 다시 수집 → 같은 레코드가 원본과 세그먼트로 두 번 들어가지 않음.
+    반환값: (수집할 목록, 사용한 세그먼트 수, 대신한 원본 수)
+    """
+    manifest = load_compact_manifest()
+    segments = manifest.get("segments") or {}
+    if not segments:
+        return files, 0, 0
 
+    present = set(files)
+    covered = set()
+    valid, dropped = [], []
+    for seg_rel, entry in segments.items():
+        ok = (COMPACT_DIR / seg_rel).exists()
+        for src, meta in entry["sources"].items():
+            if not ok:
+                break
+            if src not in present:
+                ok = False
+                break
+            st = (RAW_DIR / src).stat()
+            ok = st.st_mtime_ns == meta["mtime_ns"] and st.st_size == meta["size"]
+        if ok:
+            valid.append(seg_rel)
+            covered.update(entry["sources"])
+        else:
+            dropped.append(seg_rel)
 
+    if dropped:
+        for seg_rel in dropped:
+            del segments[seg_rel]
+            (COMPACT_DIR / seg_rel).unlink(missing_ok=True)
+        save_compact_manifest(manifest)
+        print(f"[collector] 원본이 바뀐 세그먼트 {len(dropped)}개를 버리고 원본을 다시 수집합니다.")
 
+    files = [f for f in files if f not in covered] + [SEGMENT_REL_PREFIX + s for s in valid]
+    files.sort()
+    return files, len(valid), len(covered)
+
+
+# ==========================
+# 🧾 증분 수집 상태
+# ==========================
+
+def _file_sha1(fp: Path) -> str:
+    h = hashlib.sha1()
+    with fp.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _load_state():
+    """
+    data/collector_state.json
+      files : raw 파일 상대경로 → {mtime_ns, size, sha1, events}
+      generation : parsed_logs.jsonl 을 처음부터 다시 쓸 때마다 +1
+      version    : shard 를 만든 정규화 형식 (NORMALIZE_VERSION)
+      drop_before: (retention) 이 날짜 이전 이벤트는 정규화할 때 버림
+      out_size / out_fingerprint : 상태를 저장할 때의 parsed_logs.jsonl 크기와 prefix_fingerprint
+    """
+    if STATE_PATH.exists():
+        try:
+            with STATE_PATH.open("r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            print(f"[collector] ⚠ 상태 파일을 읽을 수 없어 전체 재수집: {STATE_PATH}")
+    return {"generation": 0, "version": NORMALIZE_VERSION, "files": {}}
+
+
+def collector_generation():
+    """
+    지금 parsed_logs.jsonl 의 generation (수집 상태 파일이 없으면 None)
+    같은 generation 안에서는 parsed_logs.jsonl 이 뒤에 append 만 되므로
+    읽은 바이트 위치까지의 내용은 바뀌지 않는다 (user_profiler 증분 갱신이 이걸 이용)
+    """
+    if not STATE_PATH.exists():
+        return None
+    try:
+        with STATE_PATH.open("r", encoding="utf-8") as f:
+            return json.load(f).get("generation")
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def complete_size(path):
+    """파일에서 마지막 줄바꿈까지의 크기 (collector 가 쓰는 중인 마지막 줄은 다음 번에 읽도록)"""
+    path = Path(path)
+    size = path.stat().st_size
+    with open(path, "rb") as f:
+        pos = size
+        while pos > 0:
+            step = min(pos, 1 << 16)
+            f.seek(pos - step)
+            block = f.read(step)
+            nl = block.rfind(b"\n")
+            if nl >= 0:
+                return pos - step + nl + 1
+            pos -= step
+    return 0
+
+
+def prefix_fingerprint(path, offset):
+    """[0, offset) 구간의 앞 / 뒤 FINGERPRINT_BYTES 해시 (증분으로 읽었던 구간이 그대로인지 확인용)"""
+    h = hashlib.sha1(str(offset).encode())
+    with open(path, "rb") as f:
+        h.update(f.read(min(offset, FINGERPRINT_BYTES)))
+        f.seek(max(0, offset - FINGERPRINT_BYTES))
+        h.update(f.read(min(offset, FINGERPRINT_BYTES)))
+    return h.hexdigest()
+
+
+def _save_state(state):
+    tmp = STATE_PATH.with_name(STATE_PATH.name + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp, STATE_PATH)
+
+
+def _mark_output(state):
+    """상태 저장 직전에 지금 parsed_logs.jsonl 크기 / fingerprint 기록 (_recover_output 용)"""
+    size = OUT_PATH.stat().st_size if OUT_PATH.exists() else 0
+    state["out_size"] = size
+    state["out_fingerprint"] = prefix_fingerprint(OUT_PATH, size) if size else None
+
+
+def _recover_output(state):
+    """
+    지난 실행이 parsed_logs.jsonl 을 쓴 뒤 상태를 저장하기 전에 중단됐는지 확인.
+      - 기록된 크기 뒤에 append 만 된 경우 → 그 크기로 잘라냄 (그 파일들은 상태상 아직 새 파일이라 다시 append 됨)
+      - 그 밖에 내용이 다르면 → False (shard 로 다시 조립해야 함)
+    """
+    size = state.get("out_size")
+    if size is None or not OUT_PATH.exists():
+        return True
+    actual = OUT_PATH.stat().st_size
+    prefix_ok = actual >= size and (
+        not size or prefix_fingerprint(OUT_PATH, size) == state.get("out_fingerprint"))
+    if prefix_ok and actual == size:
+        return True
+    if prefix_ok:
+        print(f"[collector] ⚠ 상태 저장 전에 중단된 append 발견 → {actual - size:,} bytes 잘라냄")
+        with OUT_PATH.open("r+b") as f:
+            f.truncate(size)
+        return True
+    print("[collector] ⚠ parsed_logs.jsonl 이 상태와 맞지 않아 shard 로 다시 조립합니다.")
+    return False
+
+
+def _concat_shards(rels, out_f):
+    """파일 순서대로 shard 를 out_f 에 이어붙임"""
+    for rel in rels:
+        shard = _shard_path(rel)
+        if shard.exists():
+            with shard.open("rb") as sf:
+                shutil.copyfileobj(sf, out_f, WRITE_BUFFER)
+
+
+def iter_shard_lines(rels):
+    """
+    rel 들의 shard 줄 (collect_logs 반환값의 new_files 처럼 이번에 새로 정규화한 파일만 읽을 때,
+    parsed_logs.jsonl 을 다시 조립해서 offset 으로는 새 줄을 찾을 수 없는 경우용)
+    """
+    for rel in rels:
+        shard = _shard_path(rel)
+        if shard.exists():
+            with shard.open("rb") as sf:
+                yield from sf
+
+
+def collect_logs(streaming=True, workers=WORKERS, full=False):
+    """
+    data/raw_logs 아래(하위 폴더 포함) *.json, *.json.gz 를 읽어서
+    data/parsed_logs.jsonl 로 정규화해서 저장 (증분 방식)
+
+      - 파일별 정규화 결과는 data/parsed_shards/ 에 shard 로 보관
+      - data/collector_state.json 에 파일별 mtime/size/sha1 기록
+      - 새 파일만 있고 모두 기존 파일보다 경로상 뒤면 → 새 shard 를 parsed_logs.jsonl 뒤에 append
+      - 변경/삭제된 파일이 있거나 새 파일이 중간 경로에 끼어들면 → shard 들로 parsed_logs.jsonl 을
+        다시 조립 (raw 파일을 다시 정규화하지는 않음)
+    어느 쪽이든 줄 순서는 raw 경로 순 (같은 파일 집합이면 수집 이력과 상관없이 같은 출력).
+    mtime/size 가 바뀌어도 sha1 이 같으면 변경 없음으로 처리.
+    폴더 목록은 log_discovery 의 mtime 캐시로 다시 나열하지 않지만, 아는 파일도 모두 stat 해서
+    같은 이름으로 제자리 수정한 파일도 찾아냄.
+
+    streaming=False 면 예전처럼 파일 단위 json.load 사용
+    workers > 1 이면 새/변경 파일 정규화를 프로세스 풀로 나눠 처리
+    full=True 면 상태를 무시하고 전체를 다시 정규화
+
+    반환값: {"generation", "rebuilt", "new_events", "total_events", "new_files"}
+      generation 이 바뀌었으면 parsed_logs.jsonl 을 처음부터 다시 쓴 것 (append 가 아님)
+      new_files: 이번에 새로 정규화한 raw 파일 (세그먼트 제외, 그 원본은 이미 수집된 것이므로)
+    """
+    RAW_DIR.mkdir(parents=True, exist_ok=True)
+    OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    state = _load_state()
+    if state.get("version") != NORMALIZE_VERSION and state["files"]:
+        print("[collector] 정규화 형식이 바뀌어 전체를 다시 정규화합니다.")
+        full = True
+    if full and SHARD_DIR.exists():
+        shutil.rmtree(SHARD_DIR)
+    SHARD_DIR.mkdir(parents=True, exist_ok=True)
+
+    # 하위 폴더(account/region/날짜 파티션, expanded/ 등)까지 .json + .json.gz 재귀 탐색
+    # (CloudTrail-Digest 는 Records가 아니라 서명 정보라서 제외), 경로 순 정렬로 출력 순서 고정
+    files, _ = discover_raw_files(RAW_DIR, use_index=not full)
+    # 압축된 원본 대신 세그먼트 하나를 읽음 (raw 파일 자체는 그대로 둠)
+    files, n_segments, n_covered = _apply_segments(files)
+
+    started = time.perf_counter()
+    if full or not OUT_PATH.exists():
+        state["files"] = {}
+    known = state["files"]
+    consistent = _recover_output(state)
+
+    # 1) 새 파일 / 변경 파일 / 삭제 파일 구분
+    current = {}
+    todo = []
+    changed = 0
+    for rel in files:
+        prev = known.get(rel)
+        # 폴더 목록 캐시와 상관없이 아는 파일도 stat 은 함 (log_mutator 처럼 제자리에서 다시 쓰면
+        # 폴더 mtime 은 그대로라서 목록 캐시로는 알 수 없음, stat 은 나열보다 훨씬 쌈)
+        fp = source_path(rel)
+        st = fp.stat()
+        entry = {"mtime_ns": st.st_mtime_ns, "size": st.st_size}
+        if prev and prev["mtime_ns"] == entry["mtime_ns"] and prev["size"] == entry["size"]:
+            current[rel] = prev
+            continue
+
+        entry["sha1"] = _file_sha1(fp)
+        if prev and prev.get("sha1") == entry["sha1"]:
+            # 내용은 그대로 (touch 등) → 메타데이터만 갱신
+            entry["events"] = prev.get("events")
+            current[rel] = entry
+            continue
+
+        changed += prev is not None
+        current[rel] = entry
+        todo.append(rel)
+
+    deleted = [rel for rel in known if rel not in current]
+    for rel in deleted:
+        shard = _shard_path(rel)
+        if shard.exists():
+            shard.unlink()
+
+    print(f"[collector] Found {len(files)} raw log files "
+          f"(new {len(todo) - changed}, changed {changed}, deleted {len(deleted)})")
+    if n_segments:
+        print(f"[collector] 세그먼트 {n_segments}개가 작은 raw 파일 {n_covered}개를 대신함")
+
+    # 2) 새/변경 파일만 정규화 → shard
+    drop_before = state.get("drop_before")
+    if workers > 1 and len(todo) > 1:
+        # 작은 파일이 많을 때 IPC 비용을 줄이려고 chunksize 로 묶어서 전달
+        chunksize = max(1, len(todo) // (workers * 8))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_normalize_to_shard,
+                                    [(rel, streaming, drop_before) for rel in todo],
+                                    chunksize=chunksize))
+    else:
+        results = [_normalize_to_shard((rel, streaming, drop_before)) for rel in todo]
+
+    new_events = 0
+    for rel, written in zip(todo, results):
+        current[rel]["events"] = written
+        if written is None:
+            print(f"[collector] Invalid JSON, skip: {source_path(rel)}")
+        else:
+            new_events += written
+
+    # 3) parsed_logs.jsonl 반영
+    # append 는 새 파일이 모두 기존 파일보다 경로상 뒤에 올 때만 (앞에 끼어드는 파일이 있으면
+    # 재조립해야 append 든 rebuild 든 줄 순서가 항상 경로 순으로 같음)
+    in_order = not todo or not known or todo[0] > max(known)
+    rebuild = (bool(changed or deleted) or not OUT_PATH.exists() or not known
+               or not consistent or not in_order)
+    if rebuild:
+        # 변경/삭제/중간 삽입이 있으면 shard 로 전체 재조립 (임시파일 → rename)
+        with AtomicWriter(OUT_PATH) as out_f:
+            _concat_shards(files, out_f)
+        state["generation"] = state.get("generation", 0) + 1
+    elif todo:
+        with OUT_PATH.open("ab", buffering=WRITE_BUFFER) as out_f:
+            _concat_shards(todo, out_f)
+
+    state["files"] = current
+    state["version"] = NORMALIZE_VERSION
+    _mark_output(state)
+    _save_state(state)
+
+    total_events = sum(e.get("events") or 0 for e in current.values())
+    elapsed = time.perf_counter() - started
+    rate = new_events / elapsed if elapsed > 0 else 0.0
+    mode = "rebuilt" if rebuild else "appended"
+    print(f"✅ 정규화 완료 → {OUT_PATH} (총 {total_events} events, "
+          f"{mode} {new_events} new, {elapsed:.2f}s, {rate:,.0f} events/s, "
+          f"workers={max(1, workers)})")
+    return {
+        "generation": state.get("generation", 0),
+        "rebuilt": rebuild,
+        "new_events": new_events,
+        "total_events": total_events,
+        "new_files": [rel for rel in todo
+                      if current[rel]["events"] and not rel.startswith(SEGMENT_REL_PREFIX)],
+    }
+
+
+def prune_events(before):
+    """
+    (retention) eventTime 날짜가 before('YYYY-MM-DD') 이전인 이벤트를 지움
+      - shard 를 줄 단위로 걸러 다시 씀 (raw 파일은 증거 원본이므로 절대 지우지 않음,
+        이벤트가 다 지워진 파일도 상태에 events 0 으로 남겨서 다시 정규화하지 않음)
+      - parsed_logs.jsonl 을 shard 로 다시 조립하고 generation +1
+        (shard 가 없으면 parsed_logs.jsonl 을 직접 걸러 씀)
+      - 상태에 drop_before 를 남겨서 이후 수집(full 포함)에서도 그 이전 이벤트는 버림
+    eventTime 이 없거나 형식이 다른 이벤트는 지우지 않는다.
+    반환값: {"generation", "removed", "kept"}
+    """
+    state = _load_state()
+    removed = kept = 0
+
+    def keep(line):
+        d = line_event_date(line)
+        return d is None or d >= before
+
+    if state["files"]:
+        for rel, entry in list(state["files"].items()):
+            shard = _shard_path(rel)
+            if not shard.exists():
+                continue
+            with shard.open("rb") as f:
+                lines = [line for line in f if line.strip()]
+            survivors = [line for line in lines if keep(line)]
+            removed += len(lines) - len(survivors)
+            kept += len(survivors)
+            if len(survivors) != len(lines):
+                with AtomicWriter(shard) as out:
+                    out.writelines(survivors)
+                entry["events"] = len(survivors)
+        if removed:
+            # discover_raw_files 와 같은 경로 순서로 재조립
+            with AtomicWriter(OUT_PATH) as out_f:
+                _concat_shards(sorted(state["files"]), out_f)
+    elif OUT_PATH.exists():
+        out_f = AtomicWriter(OUT_PATH)
+        with OUT_PATH.open("rb") as fin:
+            for line in fin:
+                if not line.strip():
+                    continue
+                if keep(line):
+                    out_f.write(line)
+                    kept += 1
+                else:
+                    removed += 1
+        if removed:
+            out_f.close()
+        else:
+            out_f.abort()
+
+    if removed:
+        state["generation"] = state.get("generation", 0) + 1
+    state["drop_before"] = max(before, state.get("drop_before") or before)
+    _mark_output(state)
+    _save_state(state)
+    print(f"[collector] retention: {before} 이전 이벤트 {removed}건 삭제, {kept}건 유지 "
+          f"→ generation {state['generation']}")
+    return {"generation": state["generation"], "removed": removed, "kept": kept}
+
+
+def main():
+    """단독 실행용 (python src/log_collector.py --workers 8)"""
+    ap = argparse.ArgumentParser(description="CloudTrail raw 로그 정규화")
+    ap.add_argument("--workers", type=int, default=WORKERS,
+                    help="정규화 프로세스 수 (기본: 환경변수 COLLECTOR_WORKERS 또는 1)")
+    ap.add_argument("--no-stream", action="store_true",
+                    help="스트리밍 파서 대신 json.load 사용")
+    ap.add_argument("--full", action="store_true",
+                    help="증분 상태를 무시하고 전체를 다시 정규화")
+    args = ap.parse_args()
+    collect_logs(streaming=not args.no_stream, workers=args.workers, full=args.full)
+
+
+if __name__ == "__main__":
+    main()
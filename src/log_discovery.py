@@ -0,0 +1,120 @@
+"""
+raw 로그 파일 탐색 (data/raw_logs 아래 재귀)
+
+s3_downloader 는 CloudTrail key 를 account / region / 날짜 파티션 폴더로 저장한다.
+    data/raw_logs/<account>/<region>/YYYY/MM/DD/<파일>.json.gz
+log_mutator 출력(data/raw_logs/expanded/)이나 예전 평탄화 파일명도 그대로 찾는다.
+
+폴더별 mtime 과 그 안의 파일/하위폴더 목록을 data/discovery_index.json 에 캐시해서
+mtime 이 그대로인 폴더는 다시 나열(scandir)하지 않는다.
+(폴더 안에 파일이 생기거나 지워지거나 rename 되면 그 폴더의 mtime 이 바뀜)
+"""
+import os
+import json
+import time
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+RAW_DIR = ROOT_DIR / "data" / "raw_logs"
+INDEX_PATH = ROOT_DIR / "data" / "discovery_index.json"
+
+LOG_SUFFIXES = (".json", ".json.gz")
+
+# mtime 해상도가 거친 파일시스템 대비: 방금 바뀐 폴더는 다음 번에도 다시 나열
+_RECENT_NS = 2_000_000_000
+
+
+def is_raw_log_name(name: str) -> bool:
+    """정규화 대상 raw 로그 파일 이름인지 (.json / .json.gz, CloudTrail-Digest 제외)"""
+    return name.endswith(LOG_SUFFIXES) and "CloudTrail-Digest" not in name
+
+
+def partition_rel_path(key: str) -> str:
+    """
+    S3 key → raw_logs 아래 상대경로
+      AWSLogs/[o-xxx/]<account>/CloudTrail/<region>/YYYY/MM/DD/<file>
+        → <account>/<region>/YYYY/MM/DD/<file>
+    CloudTrail 레이아웃이 아니면 예전처럼 '/' 를 '_' 로 바꾼 파일명 하나
+    """
+    parts = key.split("/")
+    try:
+        i = parts.index("CloudTrail")
+    except ValueError:
+        i = -1
+    if i >= 1 and len(parts) == i + 6:
+        account = parts[i - 1]
+        region, year, month, day, name = parts[i + 1:]
+        return "/".join([account, region, year, month, day, name])
+    return key.replace("/", "_")
+
+
+# ==========================
+# 🗂 폴더 mtime 캐시
+# ==========================
+
+def _load_index(path):
+    if path.exists():
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError):
+            print(f"[discovery] ⚠ 인덱스를 읽을 수 없어 전체 탐색: {path}")
+    return {}
+
+
+def _save_index(index, path):
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def discover_raw_files(root=RAW_DIR, index_path=INDEX_PATH, use_index=True):
+    """
+    root 아래 raw 로그 파일을 재귀로 찾아서
+      (root 기준 상대경로 문자열 목록 ('/' 구분, 정렬), 이번에 다시 나열한 폴더의 상대경로 set)
+    를 반환한다. (파일 수백만 개에서 Path 객체 생성/비교 비용을 피하려고 문자열로 돌려줌)
+    두 번째 값에 없는 폴더는 지난번과 목록이 같다는 뜻일 뿐, 파일 내용은 제자리에서 바뀌었을 수 있으므로
+    (폴더 mtime 은 그대로) 호출하는 쪽은 아는 파일도 stat 으로 mtime/size 를 확인해야 한다.
+    use_index=False 면 캐시를 무시하고 전부 다시 나열 (인덱스는 새로 저장).
+    """
+    root = Path(root)
+    index_path = Path(index_path)
+    old = _load_index(index_path) if use_index else {}
+    new = {}
+    rescanned = set()
+    files = []
+
+    stack = [""]
+    while stack:
+        rel = stack.pop()
+        full = os.path.join(root, rel) if rel else str(root)
+        try:
+            mtime = os.stat(full).st_mtime_ns
+        except FileNotFoundError:
+            continue
+
+        entry = old.get(rel)
+        if entry is None or entry["mtime_ns"] != mtime:
+            names, dirs = [], []
+            with os.scandir(full) as it:
+                for e in it:
+                    if e.is_dir(follow_symlinks=False):
+                        dirs.append(e.name)
+                    elif is_raw_log_name(e.name):
+                        names.append(e.name)
+            if time.time_ns() - mtime < _RECENT_NS:
+                mtime = None
+            entry = {"mtime_ns": mtime, "files": names, "dirs": dirs}
+            rescanned.add(rel)
+        new[rel] = entry
+
+        prefix = rel + "/" if rel else ""
+        files.extend(prefix + name for name in entry["files"])
+        stack.extend(f"{rel}/{d}" if rel else d for d in entry["dirs"])
+
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    _save_index(new, index_path)
+
+    files.sort()
+    return files, rescanned
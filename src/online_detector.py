@@ -0,0 +1,332 @@
+"""
+온라인(스트리밍) 이상탐지
+
+detect_user_anomalies / detect_event_anomalies 는 전체 기간 건수에 대해
+Z-score 를 한 번 계산하므로 오늘 생긴 급증이 몇 달치 이력에 묻히고,
+실행할 때마다 전체를 다시 계산한다.
+
+여기서는 actor / action 별로 5분 / 1시간 / 24시간 시간 버킷 건수를 세고,
+닫힌 버킷 건수들의 평균·분산을 Welford 방식으로 누적해서
+이벤트가 들어올 때마다 O(1) 로 "지금 버킷 건수"의 Z-score 를 계산한다.
+
+    det = OnlineAnomalyDetector()
+    for evt in events:                 # parsed_logs.jsonl 의 dict
+        for anomaly in det.update(evt):
+            print(anomaly)
+
+CloudTrail 파일 안의 이벤트는 시간순이 아니므로 최근 LATENESS 초 이내의 버킷은
+열어 두었다가(늦게 온 이벤트도 반영) 그보다 오래되면 기준선(baseline)에 합친다.
+그보다 더 늦게 도착한 이벤트는 점수 계산 없이 late 로만 센다.
+"""
+import argparse
+import csv
+import math
+import time
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+
+try:
+    from src.serializer import loads, DecodeError
+except ImportError:  # python src/online_detector.py 로 직접 실행한 경우
+    from serializer import loads, DecodeError
+
+# ==========================
+# 📁 경로 / 기본값
+# ==========================
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+PARSED_PATH = ROOT_DIR / "data" / "parsed_logs.jsonl"
+OUT_DIR = ROOT_DIR / "out"
+ONLINE_ANOM_PATH = OUT_DIR / "online_anomalies.csv"
+
+# 창 이름 → 버킷 크기(초)
+WINDOWS = {"5m": 300, "1h": 3600, "24h": 86400}
+# 건수를 셀 이벤트 필드
+DIMENSIONS = ("actor", "action")
+
+THRESHOLD = 3.0     # Z-score 임계값
+MIN_HISTORY = 3     # 기준선에 닫힌 버킷이 이만큼 있어야 점수 계산
+MIN_COUNT = 5       # 지금 버킷 건수가 이보다 적으면 알리지 않음
+MIN_STD = 1.0       # 기준선이 거의 일정할 때(분산 0) 분모 하한
+LATENESS = 900      # 늦게 도착한 이벤트를 받아줄 시간(초)
+
+ANOMALY_HEADER = ["time", "dimension", "key", "window", "count", "mean", "std", "zscore"]
+
+# _update_one 이 늦게 도착한 이벤트에 돌려주는 표시
+_LATE = object()
+
+
+@lru_cache(maxsize=65536)
+def _parse_time(t):
+    """'2025-11-20T10:59:52Z' → epoch 초 (형식이 이상하면 None)"""
+    try:
+        return datetime.fromisoformat(t.replace("Z", "+00:00")).timestamp()
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+# ==========================
+# 📈 키 × 창 하나의 상태
+# ==========================
+
+class _WindowState:
+    """
+    open : 아직 닫지 않은 버킷 번호 → 건수 (최대 LATENESS/버킷크기 + 1 개)
+    done : 이 번호 미만의 버킷은 기준선(n, mean, m2)에 이미 합쳐짐
+    start: 처음 이벤트가 있었던 버킷 (그 이전은 빈 버킷으로 치지 않음)
+    last : 마지막으로 이벤트가 있었던 버킷 (오래 조용한 상태를 정리할 때 사용)
+    """
+    __slots__ = ("open", "done", "start", "last", "n", "mean", "m2", "flagged")
+
+    def __init__(self, bucket, keep):
+        self.open = {}
+        self.done = bucket - keep + 1
+        self.start = bucket
+        self.last = bucket
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.flagged = None
+
+    def _add(self, x):
+        """Welford: 값 하나 추가"""
+        self.n += 1
+        d = x - self.mean
+        self.mean += d / self.n
+        self.m2 += d * (x - self.mean)
+
+    def _add_zeros(self, k):
+        """건수 0 인 버킷 k 개를 한 번에 합침 (병렬 Welford 병합) → 긴 공백도 O(1)"""
+        if k <= 0:
+            return
+        n = self.n + k
+        d = -self.mean
+        self.mean += d * k / n
+        self.m2 += d * d * self.n * k / n
+        self.n = n
+
+    def _close_until(self, cutoff):
+        """cutoff 미만 버킷을 기준선에 합침"""
+        if cutoff <= self.done:
+            return
+        for b in sorted(b for b in self.open if b < cutoff):
+            self._add_zeros(b - max(self.done, self.start))
+            self._add(self.open.pop(b))
+            self.done = b + 1
+        self._add_zeros(cutoff - max(self.done, self.start))
+        self.done = cutoff
+
+    def std(self):
+        return math.sqrt(self.m2 / self.n) if self.n else 0.0
+
+
+# ==========================
+# 🚨 온라인 탐지기
+# ==========================
+
+class OnlineAnomalyDetector:
+    """
+    actor / action 별 시간 창 건수에 대한 Welford 기준선 + Z-score.
+    update(evt) 는 이벤트 하나를 반영하고, 임계값을 넘은 (차원, 키, 창) 마다
+    이상 dict 를 반환한다. 같은 버킷에서는 한 번만 알린다.
+    창마다 지금까지 본 가장 늦은 버킷(watermark)보다 keep 개 넘게 뒤처진 상태는 지워서
+    (role session ARN 처럼 한 번 보이고 마는 키) 긴 재생에서도 메모리가 계속 늘지 않게 한다.
+    지워진 키가 다시 나타나면 기준선을 처음부터 다시 쌓는다.
+    """
+
+    def __init__(self, windows=None, threshold=THRESHOLD, min_history=MIN_HISTORY,
+                 min_count=MIN_COUNT, lateness=LATENESS, dimensions=DIMENSIONS):
+        self.windows = dict(windows or WINDOWS)
+        self.threshold = threshold
+        self.min_history = min_history
+        self.min_count = min_count
+        self.dimensions = tuple(dimensions)
+        # 창별로 열어 둘 버킷 수
+        self._keep = {name: math.ceil(lateness / width) + 1
+                      for name, width in self.windows.items()}
+        self._states = {name: {} for name in self.windows}   # window → (dimension, key) → _WindowState
+        self._watermark = dict.fromkeys(self.windows)         # window → 지금까지 본 가장 늦은 버킷
+        self._swept = dict.fromkeys(self.windows)             # window → 마지막으로 정리한 watermark
+        self.events = 0
+        self.late = 0       # 늦게 도착해서 (창 하나 이상에서) 점수 계산 없이 버린 이벤트 수
+        self.evicted = 0    # 오래 조용해서 지운 상태 수
+
+    def update(self, evt):
+        ts = _parse_time(evt.get("eventTime"))
+        if ts is None:
+            return []
+        self.events += 1
+
+        buckets = {}
+        for name, width in self.windows.items():
+            buckets[name] = int(ts // width)
+            self._advance(name, buckets[name])
+
+        anomalies = []
+        late = False
+        for dim in self.dimensions:
+            key = evt.get(dim)
+            if not key:
+                continue
+            for name, bucket in buckets.items():
+                a = self._update_one(dim, key, name, bucket, evt)
+                if a is _LATE:
+                    late = True
+                elif a:
+                    anomalies.append(a)
+        # 차원 × 창 상태마다가 아니라 이벤트 하나당 한 번만 셈
+        self.late += late
+        return anomalies
+
+    def _advance(self, window, bucket):
+        """watermark 를 올리고, keep 버킷 이상 올라갈 때마다 뒤처진 상태를 정리"""
+        mark = self._watermark[window]
+        if mark is not None and bucket <= mark:
+            return
+        self._watermark[window] = bucket
+        keep = self._keep[window]
+        if self._swept[window] is None:
+            self._swept[window] = bucket
+        elif bucket - self._swept[window] >= keep:
+            states = self._states[window]
+            stale = [k for k, st in states.items() if st.last < bucket - keep]
+            for k in stale:
+                del states[k]
+            self.evicted += len(stale)
+            self._swept[window] = bucket
+
+    def _update_one(self, dim, key, window, bucket, evt):
+        states = self._states[window]
+        st = states.get((dim, key))
+        keep = self._keep[window]
+        if st is None:
+            st = states[(dim, key)] = _WindowState(bucket, keep)
+
+        if bucket < st.done:
+            return _LATE
+        if bucket < st.start:
+            st.start = bucket
+        if bucket > st.last:
+            st.last = bucket
+        st._close_until(bucket - keep + 1)
+
+        count = st.open.get(bucket, 0) + 1
+        st.open[bucket] = count
+
+        if st.n < self.min_history or count < self.min_count or st.flagged == bucket:
+            return None
+        std = st.std()
+        z = (count - st.mean) / max(std, MIN_STD)
+        if z <= self.threshold:
+            return None
+
+        st.flagged = bucket
+        return {
+            "time": evt.get("eventTime"),
+            "dimension": dim,
+            "key": key,
+            "window": window,
+            "count": count,
+            "mean": round(st.mean, 3),
+            "std": round(std, 3),
+            "zscore": round(z, 3),
+        }
+
+    def process(self, events):
+        """이벤트 iterable → 이상 dict 를 도착 순서대로 yield"""
+        for evt in events:
+            yield from self.update(evt)
+
+    def __len__(self):
+        """추적 중인 (차원, 키, 창) 상태 수"""
+        return sum(map(len, self._states.values()))
+
+
+# ==========================
+# ▶ parsed_logs.jsonl 재생 (단독 실행)
+# ==========================
+
+def _iter_parsed(path):
+    with open(path, "rb") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield loads(line)
+            except DecodeError:
+                continue
+
+
+def replay(path=PARSED_PATH, out_path=ONLINE_ANOM_PATH, sort=True, since=None, **kwargs):
+    """
+    parsed_logs.jsonl 을 처음부터 흘려보내며 온라인 탐지 → online_anomalies.csv
+    sort=True 면 eventTime 순으로 정렬해서 재생 (파일 순서는 시간순이 아니므로
+    과거 데이터 백필용. 전체를 메모리에 올림)
+    since (UTC datetime) 를 주면 그 날짜 이후의 일별 파티션(data/partitions/)만 읽고
+    그 시각 이전 이벤트는 건너뜀 (기준선도 그 구간으로만 만들어짐)
+    탐지 건수를 반환 (parsed_logs 가 없으면 None)
+    """
+    path = Path(path)
+    if not path.exists():
+        print(f"❌ 정규화 로그 파일이 없습니다: {path}")
+        return None
+    paths = [path]
+    if since is not None:
+        try:
+            from src.retention import partition_events, partition_files
+        except ImportError:
+            from retention import partition_events, partition_files
+        partition_events()
+        paths = partition_files(since=since)
+
+    det = OnlineAnomalyDetector(**kwargs)
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+
+    t0 = time.perf_counter()
+    events = (e for p in paths for e in _iter_parsed(p))
+    if since is not None:
+        since_text = since.strftime("%Y-%m-%dT%H:%M:%S")
+        events = (e for e in events if str(e.get("eventTime") or "") >= since_text)
+    if sort:
+        events = sorted(events, key=lambda e: str(e.get("eventTime") or ""))
+
+    count = 0
+    with open(out_path, "w", newline="", encoding="utf-8-sig") as fout:
+        writer = csv.DictWriter(fout, fieldnames=ANOMALY_HEADER)
+        writer.writeheader()
+        for a in det.process(events):
+            writer.writerow(a)
+            count += 1
+    elapsed = time.perf_counter() - t0
+
+    rate = det.events / elapsed if elapsed > 0 else 0.0
+    print(f"✅ 온라인 이상탐지 완료 → {out_path} "
+          f"(이벤트 {det.events}건, 이상 {count}건, 늦게 도착 {det.late}건, "
+          f"상태 {len(det)}개 (정리 {det.evicted}개), {rate:,.0f} events/s)")
+    return count
+
+
+def main():
+    ap = argparse.ArgumentParser(description="parsed_logs.jsonl 재생 → 시간 창 기반 온라인 이상탐지")
+    ap.add_argument("--threshold", type=float, default=THRESHOLD)
+    ap.add_argument("--min-count", type=int, default=MIN_COUNT)
+    ap.add_argument("--lateness", type=int, default=LATENESS, help="늦게 도착한 이벤트 허용 시간(초)")
+    ap.add_argument("--no-sort", action="store_true", help="eventTime 정렬 없이 파일 순서대로 재생")
+    ap.add_argument("--since", help="이 시각 이후 이벤트만 재생 (24h, 7d, 2025-11-20 …)")
+    args = ap.parse_args()
+    since = None
+    if args.since:
+        try:
+            from src.retention import parse_since
+        except ImportError:
+            from retention import parse_since
+        since = parse_since(args.since)
+    replay(sort=not args.no_sort, since=since, threshold=args.threshold,
+           min_count=args.min_count, lateness=args.lateness)
+
+
+if __name__ == "__main__":
+    main()
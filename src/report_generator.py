@@ -5,32 +5,49 @@ from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
 import pandas as pd
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from pathlib import Path
+import argparse
+import io
 import json
+import threading
+import time
+
+try:
+    from src.event_store import load_alerts
+    from src.rollups import load_rollups
+    from src.top_events import TopEventsBuilder, load_top_events, top_frame
+    from src.accounts import load_account_alerts
+except ImportError:  # python src/report_generator.py 로 직접 실행한 경우
+    from event_store import load_alerts
+    from rollups import load_rollups
+    from top_events import TopEventsBuilder, load_top_events, top_frame
+    from accounts import load_account_alerts
 
 ROOT_DIR = Path(__file__).resolve().parents[1]
 ALERTS = ROOT_DIR / "out" / "alerts.csv"
 REPORTS = ROOT_DIR / "reports" / "report.pdf"
+DAILY_DIR = ROOT_DIR / "reports" / "daily"
 
+FONT = 'HYSMyeongJo-Medium'
+ALERT_COLS = ["time", "actor", "service", "action", "result", "risk_score", "reason"]
 
-def generate_report():
-    df = pd.read_csv(ALERTS)
-    cols = ["time", "actor", "service", "action", "result", "risk_score", "reason"]
-    df = df[cols]
 
-    REPORTS.parent.mkdir(parents=True, exist_ok=True)
-    pdfmetrics.registerFont(UnicodeCIDFont('HYSMyeongJo-Medium'))
+# ==========================
+# 🔤 폰트 / 스타일 (프로세스당 한 번만 초기화)
+# ==========================
 
-    doc = SimpleDocTemplate(
-        str(REPORTS),
-        pagesize=landscape(A4),
-        leftMargin=18, rightMargin=18, topMargin=24, bottomMargin=22
-    )
+@lru_cache(maxsize=None)
+def _styles():
+    """CID 폰트 등록 + 스타일시트 생성 → (styles, wrap_style). 같은 프로세스에서는 재사용"""
+    pdfmetrics.registerFont(UnicodeCIDFont(FONT))
 
     styles = getSampleStyleSheet()
-    styles["Normal"].fontName = 'HYSMyeongJo-Medium'
-    styles["Title"].fontName = 'HYSMyeongJo-Medium'
+    styles["Normal"].fontName = FONT
+    styles["Title"].fontName = FONT
     styles["Normal"].fontSize = 9
     styles["Normal"].leading = 11
 
@@ -38,27 +55,155 @@ def generate_report():
         'wrap',
         parent=styles['Normal'],
         wordWrap='CJK',
-        fontName='HYSMyeongJo-Medium',
+        fontName=FONT,
         fontSize=9,
         leading=11
     )
+    return styles, wrap_style
+
+
+PROFILE_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0,0), (-1,0), colors.HexColor("#3b5998")),
+    ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
+    ('GRID', (0,0), (-1,-1), 0.5, colors.black),
+    ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+    ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+    ('BACKGROUND', (0,1), (-1,-1), colors.whitesmoke),
+    ('FONTNAME', (0,0), (-1,-1), FONT),
+    ('FONTSIZE', (0,0), (-1,-1), 9),
+    ('BOTTOMPADDING', (0,0), (-1,-1), 4),
+    ('TOPPADDING', (0,0), (-1,-1), 4),
+])
+
+
+def _event_table_style(header_color):
+    return TableStyle([
+        ('BACKGROUND', (0,0), (-1,0), header_color),
+        ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
+        ('GRID', (0,0), (-1,-1), 0.5, colors.black),
+        ('VALIGN', (0,0), (-1,-1), 'TOP'),
+        ('ALIGN', (0,0), (-3,-1), 'CENTER'),
+        ('ALIGN', (-2,1), (-2,-1), 'RIGHT'),
+        ('LEFTPADDING', (0,0), (-1,-1), 4),
+        ('RIGHTPADDING', (0,0), (-1,-1), 4),
+        ('TOPPADDING', (0,0), (-1,-1), 3),
+        ('BOTTOMPADDING', (0,0), (-1,-1), 3),
+        ('BACKGROUND', (0,1), (-1,-1), colors.whitesmoke),
+    ])
+
+
+TOP_TABLE_STYLE = _event_table_style(colors.grey)
+RECENT_TABLE_STYLE = _event_table_style(colors.HexColor("#2f5496"))
+EVENT_HEADER = ["Time", "Actor", "Service", "Action", "Result", "Risk", "Reason"]
+EVENT_COL_WIDTHS = [120, 70, 70, 120, 90, 40, 320]
+
+
+# ==========================
+# 📈 차트 (메모리에서 렌더링)
+# ==========================
+
+@lru_cache(maxsize=None)
+def _chart_template():
+    """
+    재사용하는 Figure / Axes (프로세스당 한 번 생성)
+    pyplot 전역 상태 대신 Figure 를 직접 다뤄서 다른 코드의 그림과 섞이지 않음
+    """
+    fig = Figure(figsize=(7.5, 3.8))
+    FigureCanvasAgg(fig)
+    return fig, fig.add_subplot(), threading.Lock()
+
+
+def service_chart(service_counts, top_n=15):
+    """서비스별 건수 막대그래프 → PNG BytesIO (디스크에 쓰지 않고 바로 Image 로 전달)"""
+    svc_counts = service_counts.head(top_n)
+
+    fig, ax, lock = _chart_template()
+    with lock:
+        ax.clear()
+        svc_counts.plot(kind='bar', color='skyblue', ax=ax)
+        ax.set_title(f"Top {len(svc_counts)} Services by Event Count")
+        ax.set_xlabel('Service')
+        ax.set_ylabel('Count')
+        for label in ax.get_xticklabels():
+            label.set_rotation(45)
+            label.set_horizontalalignment("right")
+        fig.tight_layout()
+
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png", dpi=150)
+    buf.seek(0)
+    return buf
+
+
+# ==========================
+# 📊 리포트 데이터
+# ==========================
+
+
+def _frame_report_data(df):
+    """alerts DataFrame → (총 이벤트 수, 평균 위험도, 서비스별 건수, 위험도 Top 5, 최신 5개)"""
+    # 전체 정렬 대신 크기 5 힙으로 선택
+    picker = TopEventsBuilder(k=5)
+    rows = df.astype(object).where(df.notna(), None)
+    picker.write_rows(rows.itertuples(index=False, name=None))
+    top = picker.result()
+    return (len(df), df["risk_score"].mean(), df["service"].value_counts(),
+            top_frame(top, "risky"), top_frame(top, "recent"))
+
+
+def _report_data(date=None, account=None, since=None):
+    """
+    전체 리포트: rollup + top_events.json 이 있으면 그것만 읽고 (전체 alerts 를 읽거나 정렬하지 않음),
+    없으면 alerts 를 읽어서 같은 값을 계산
+    date='YYYY-MM-DD' : 그 날짜 파티션만 읽어서 계산 (일별 리포트)
+    account           : out/accounts/<account>/alerts.csv 만 읽어서 계산 (계정별 리포트)
+    since (UTC datetime) : 그 날짜 이후 파티션만 읽고 그 시각 이후 이벤트만으로 계산
+    """
+    if since is not None:
+        df = load_alerts(columns=ALERT_COLS, date_from=since.strftime("%Y-%m-%d"))
+        return _frame_report_data(df[df["time"].astype(str) >= since.strftime("%Y-%m-%dT%H:%M:%S")])
+    if account is not None:
+        return _frame_report_data(load_account_alerts(account, columns=ALERT_COLS,
+                                                      date_from=date, date_to=date))
+    if date is not None:
+        return _frame_report_data(load_alerts(columns=ALERT_COLS, date_from=date, date_to=date))
+
+    rollup = load_rollups()
+    top = load_top_events()
+    if rollup is not None and top is not None:
+        total = int(rollup["count"].sum())
+        scored = rollup["count"][rollup["risk_score"].notna()].sum()
+        avg_risk = rollup["risk_sum"].sum() / scored if scored else float("nan")
+        service_counts = (rollup.groupby("service")["count"].sum()
+                          .sort_values(ascending=False, kind="stable"))
+        return total, avg_risk, service_counts, top_frame(top, "risky"), top_frame(top, "recent")
+
+    return _frame_report_data(load_alerts(columns=ALERT_COLS))
+
+
+def _event_rows(frame, wrap_style):
+    rows = []
+    for _, r in frame.iterrows():
+        rows.append([
+            Paragraph(str(r["time"]), wrap_style),
+            Paragraph(str(r["actor"]), wrap_style),
+            Paragraph(str(r["service"]), wrap_style),
+            Paragraph(str(r["action"]), wrap_style),
+            Paragraph(str(r["result"]), wrap_style),
+            int(r["risk_score"]),
+            Paragraph(str(r["reason"]), wrap_style)
+        ])
+    return rows
 
-    elements = []
-
-    # 제목
-    elements.append(Paragraph("<b>Cloud Forensics Automatic Report (V4)</b>", styles['Title']))
-    elements.append(Spacer(1, 14))
 
-    # 이벤트 요약
-    elements.append(Paragraph("&#9632; Event Summary", styles['Heading2']))
-    elements.append(Paragraph(f"Total Events: {len(df)}", styles['Normal']))
-    elements.append(Paragraph(f"Average Risk Score: {df['risk_score'].mean():.1f}", styles['Normal']))
-    elements.append(Spacer(1, 8))
+# ==========================
+# 📄 PDF 생성
+# ==========================
 
-    # ✅ Anomaly Summary
+def _anomaly_summary(elements, styles, anomaly_path, event_anom_path):
+    """Anomaly Summary 섹션 (이상 사용자 / 이상 action CSV)"""
     elements.append(Paragraph("&#9632; Anomaly Summary", styles['Heading2']))
 
-    anomaly_path = Path(__file__).resolve().parent.parent / "out" / "anomalies.csv"
     if anomaly_path.exists():
         df_user = pd.read_csv(anomaly_path)
         if not df_user.empty:
@@ -72,7 +217,6 @@ def generate_report():
     else:
         elements.append(Paragraph("No anomalous users detected.", styles['Normal']))
 
-    event_anom_path = Path(__file__).resolve().parent.parent / "out" / "event_anomalies.csv"
     if event_anom_path.exists():
         df_event = pd.read_csv(event_anom_path)
         if not df_event.empty:
@@ -85,10 +229,62 @@ def generate_report():
 
     elements.append(Spacer(1, 12))
 
+
+def generate_report(output=REPORTS, date=None, account=None, summary_path=None, timings=None,
+                    since=None, anomaly_paths=None):
+    """
+    output  : PDF 경로
+    date    : 'YYYY-MM-DD' 면 그 날짜 이벤트만으로 리포트 (이상탐지/프로파일 요약은 전체 기준)
+    account : 계정 ID 면 그 계정 이벤트만으로 리포트 (src/accounts.py)
+    since   : UTC datetime 이면 그 시각 이후 이벤트만으로 리포트 (retention.parse_since("24h") 등)
+    summary_path : 사용자 프로파일 JSON (기본: out/user_summary.json)
+    anomaly_paths : (이상 사용자 CSV, 이상 action CSV) (기본: out/anomalies.csv, out/event_anomalies.csv)
+                    account 리포트는 다른 계정 정보가 섞이지 않게 기본값을 쓰지 않음
+                    → 넘기지 않으면 Anomaly Summary 를 생략
+    timings : dict 를 넘기면 단계별 소요 시간(load / chart / build)을 채워줌
+    """
+    output = Path(output)
+    t0 = time.perf_counter()
+    total_events, avg_risk, service_counts, top, recent = _report_data(date, account, since)
+    t_load = time.perf_counter() - t0
+
+    styles, wrap_style = _styles()
+    output.parent.mkdir(parents=True, exist_ok=True)
+
+    doc = SimpleDocTemplate(
+        str(output),
+        pagesize=landscape(A4),
+        leftMargin=18, rightMargin=18, topMargin=24, bottomMargin=22
+    )
+
+    elements = []
+
+    # 제목
+    title = "Cloud Forensics Automatic Report (V4)"
+    if account:
+        title += f" - Account {account}"
+    if date:
+        title += f" - {date}"
+    if since is not None:
+        title += f" - since {since:%Y-%m-%d %H:%M} UTC"
+    elements.append(Paragraph(f"<b>{title}</b>", styles['Title']))
+    elements.append(Spacer(1, 14))
+
+    # 이벤트 요약
+    elements.append(Paragraph("&#9632; Event Summary", styles['Heading2']))
+    elements.append(Paragraph(f"Total Events: {total_events}", styles['Normal']))
+    elements.append(Paragraph(f"Average Risk Score: {avg_risk:.1f}", styles['Normal']))
+    elements.append(Spacer(1, 8))
+
+    if anomaly_paths is None and account is None:
+        anomaly_paths = (ROOT_DIR / "out" / "anomalies.csv", ROOT_DIR / "out" / "event_anomalies.csv")
+    if anomaly_paths is not None:
+        _anomaly_summary(elements, styles, *map(Path, anomaly_paths))
+
     # ✅ User Profiling Summary
     elements.append(Paragraph("&#9632; User Profiling Summary", styles['Heading2']))
 
-    user_summary_path = Path(__file__).resolve().parent.parent / "out" / "user_summary.json"
+    user_summary_path = Path(summary_path) if summary_path else ROOT_DIR / "out" / "user_summary.json"
     if user_summary_path.exists():
         with open(user_summary_path, "r", encoding="utf-8") as f:
             profiles = json.load(f)
@@ -108,18 +304,7 @@ def generate_report():
             ])
 
         t = Table(table_data, colWidths=[100, 150, 100, 80])
-        t.setStyle(TableStyle([
-            ('BACKGROUND', (0,0), (-1,0), colors.HexColor("#3b5998")),
-            ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-            ('GRID', (0,0), (-1,-1), 0.5, colors.black),
-            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-            ('BACKGROUND', (0,1), (-1,-1), colors.whitesmoke),
-            ('FONTNAME', (0,0), (-1,-1), 'HYSMyeongJo-Medium'),
-            ('FONTSIZE', (0,0), (-1,-1), 9),
-            ('BOTTOMPADDING', (0,0), (-1,-1), 4),
-            ('TOPPADDING', (0,0), (-1,-1), 4),
-        ]))
+        t.setStyle(PROFILE_TABLE_STYLE)
         elements.append(t)
         elements.append(Spacer(1, 12))
     else:
@@ -127,102 +312,28 @@ def generate_report():
         elements.append(Spacer(1, 12))
 
     # ✅ 서비스 분포 그래프 (Top N + 라벨 정리)
+    t0 = time.perf_counter()
     try:
-        service_counts = df["service"].value_counts()
-        top_n = 15
-        if len(service_counts) > top_n:
-            svc_counts = service_counts.head(top_n)
-        else:
-            svc_counts = service_counts
-
-        plt.figure(figsize=(7.5, 3.8))
-        svc_counts.plot(kind='bar', color='skyblue')
-        plt.title(f"Top {len(svc_counts)} Services by Event Count")
-        plt.xlabel('Service')
-        plt.ylabel('Count')
-        plt.xticks(rotation=45, ha="right")
-        plt.tight_layout()
-
-        chart_path = Path(__file__).resolve().parent.parent / "out" / "service_chart.png"
-        chart_path.parent.mkdir(parents=True, exist_ok=True)
-        plt.savefig(chart_path, dpi=150)
-        plt.close()
-
+        chart = service_chart(service_counts)
         elements.append(Paragraph("&#9632; Service-wise Event Distribution", styles['Heading2']))
         elements.append(Spacer(1, 8))
-        if chart_path.exists():
-            elements.append(Image(str(chart_path), width=420, height=260))
-            elements.append(Spacer(1, 12))
+        elements.append(Image(chart, width=420, height=260))
+        elements.append(Spacer(1, 12))
     except Exception as e:
         elements.append(Paragraph(f"(그래프 생성 중 오류 발생: {e})", styles['Normal']))
         elements.append(Spacer(1, 12))
+    t_chart = time.perf_counter() - t0
 
     # 상위 5개 위험 이벤트
-    top = df.sort_values("risk_score", ascending=False).head(5)
-    header = ["Time", "Actor", "Service", "Action", "Result", "Risk", "Reason"]
-    rows = []
-    for _, r in top.iterrows():
-        rows.append([
-            Paragraph(str(r["time"]), wrap_style),
-            Paragraph(str(r["actor"]), wrap_style),
-            Paragraph(str(r["service"]), wrap_style),
-            Paragraph(str(r["action"]), wrap_style),
-            Paragraph(str(r["result"]), wrap_style),
-            int(r["risk_score"]),
-            Paragraph(str(r["reason"]), wrap_style)
-        ])
-
-    data = [header] + rows
-    col_widths = [120, 70, 70, 120, 90, 40, 320]
-
-    t = Table(data, colWidths=col_widths, repeatRows=1)
-    t.setStyle(TableStyle([
-        ('BACKGROUND', (0,0), (-1,0), colors.grey),
-        ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-        ('GRID', (0,0), (-1,-1), 0.5, colors.black),
-        ('VALIGN', (0,0), (-1,-1), 'TOP'),
-        ('ALIGN', (0,0), (-3,-1), 'CENTER'),
-        ('ALIGN', (-2,1), (-2,-1), 'RIGHT'),
-        ('LEFTPADDING', (0,0), (-1,-1), 4),
-        ('RIGHTPADDING', (0,0), (-1,-1), 4),
-        ('TOPPADDING', (0,0), (-1,-1), 3),
-        ('BOTTOMPADDING', (0,0), (-1,-1), 3),
-        ('BACKGROUND', (0,1), (-1,-1), colors.whitesmoke),
-    ]))
+    t = Table([EVENT_HEADER] + _event_rows(top, wrap_style), colWidths=EVENT_COL_WIDTHS, repeatRows=1)
+    t.setStyle(TOP_TABLE_STYLE)
     elements.append(t)
     elements.append(Spacer(1, 14))
     
     # ✅ 최신 5개 이벤트 추가
     elements.append(Paragraph("&#9632; Recent 5 Events", styles['Heading2']))
-    recent = df.sort_values("time", ascending=False).head(5)
-
-    recent_rows = []
-    for _, r in recent.iterrows():
-        recent_rows.append([
-            Paragraph(str(r["time"]), wrap_style),
-            Paragraph(str(r["actor"]), wrap_style),
-            Paragraph(str(r["service"]), wrap_style),
-            Paragraph(str(r["action"]), wrap_style),
-            Paragraph(str(r["result"]), wrap_style),
-            int(r["risk_score"]),
-            Paragraph(str(r["reason"]), wrap_style)
-        ])
-
-    recent_data = [header] + recent_rows
-    t2 = Table(recent_data, colWidths=col_widths, repeatRows=1)
-    t2.setStyle(TableStyle([
-        ('BACKGROUND', (0,0), (-1,0), colors.HexColor("#2f5496")),
-        ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-        ('GRID', (0,0), (-1,-1), 0.5, colors.black),
-        ('VALIGN', (0,0), (-1,-1), 'TOP'),
-        ('ALIGN', (0,0), (-3,-1), 'CENTER'),
-        ('ALIGN', (-2,1), (-2,-1), 'RIGHT'),
-        ('LEFTPADDING', (0,0), (-1,-1), 4),
-        ('RIGHTPADDING', (0,0), (-1,-1), 4),
-        ('TOPPADDING', (0,0), (-1,-1), 3),
-        ('BOTTOMPADDING',(0,0), (-1,-1), 3),
-        ('BACKGROUND', (0,1), (-1,-1), colors.whitesmoke),
-    ]))
+    t2 = Table([EVENT_HEADER] + _event_rows(recent, wrap_style), colWidths=EVENT_COL_WIDTHS, repeatRows=1)
+    t2.setStyle(RECENT_TABLE_STYLE)
     elements.append(t2)
     elements.append(Spacer(1, 14))
 
@@ -231,10 +342,85 @@ def generate_report():
         styles['Normal']
     ))
 
+    t0 = time.perf_counter()
     doc.build(elements)
-    print("✅ PDF report generated →", REPORTS)
+    t_build = time.perf_counter() - t0
+    print("✅ PDF report generated →", output)
+
+    if timings is not None:
+        timings["load"] = t_load
+        timings["chart"] = t_chart
+        timings["build"] = t_build
+    return output
+
+
+# ==========================
+# 🗂 여러 리포트 병렬 생성 (일별)
+# ==========================
+
+def report_dates():
+    """리포트를 만들 수 있는 날짜 목록 ('YYYY-MM-DD', rollup 이 있으면 rollup 기준)"""
+    # 보관(archive)된 날짜는 이벤트가 지워졌으므로 일별 리포트를 만들 수 없음
+    rollup = load_rollups(archive=False)
+    if rollup is not None:
+        hours = rollup["hour"].dropna()
+        return sorted(hours.dt.strftime("%Y-%m-%d").unique())
+    times = load_alerts(columns=["time"])["time"].dropna().astype(str)
+    return sorted(d for d in times.str[:10].unique() if len(d) == 10)
+
+
+def _build_daily(date):
+    """워커 프로세스에서 실행 (폰트/스타일은 워커마다 첫 리포트에서 한 번만 초기화)"""
+    timings = {}
+    t0 = time.perf_counter()
+    generate_report(DAILY_DIR / f"report_{date}.pdf", date=date, timings=timings)
+    timings["total"] = time.perf_counter() - t0
+    return date, timings
+
+
+def generate_daily_reports(dates=None, workers=None):
+    """
+    날짜별 리포트를 reports/daily/report_YYYY-MM-DD.pdf 로 생성.
+    workers : 프로세스 수 (None 이면 CPU 수, 1 이면 현재 프로세스에서 순서대로)
+    """
+    dates = list(dates) if dates is not None else report_dates()
+    if not dates:
+        print("⚠ 리포트를 만들 날짜가 없습니다.")
+        return {}
+
+    started = time.perf_counter()
+    if workers == 1 or len(dates) == 1:
+        results = dict(map(_build_daily, dates))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = dict(pool.map(_build_daily, dates))
+    elapsed = time.perf_counter() - started
 
-if __name__ == "__main__":
-    generate_report()
+    for date, t in results.items():
+        parts = ", ".join(f"{k} {v:.2f}s" for k, v in t.items())
+        print(f"   {date}: {parts}")
+    print(f"⏱ 일별 리포트 {len(results)}개 생성 ({elapsed:.2f}s)")
+    return results
 
 
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="PDF 포렌식 리포트 생성")
+    ap.add_argument("--daily", action="store_true", help="날짜별 리포트 (reports/daily/)")
+    ap.add_argument("--dates", nargs="*", help="--daily 와 함께: 만들 날짜 (YYYY-MM-DD)")
+    ap.add_argument("--workers", type=int, default=None, help="--daily 병렬 프로세스 수")
+    ap.add_argument("--since", help="이 시각 이후 이벤트만으로 리포트 (24h, 7d, 2025-11-20 …)")
+    args = ap.parse_args()
+
+    if args.daily:
+        generate_daily_reports(args.dates or None, workers=args.workers)
+    else:
+        timings = {}
+        since = None
+        if args.since:
+            try:
+                from src.retention import parse_since
+            except ImportError:
+                from retention import parse_since
+            since = parse_since(args.since)
+        generate_report(timings=timings, since=since)
+        print("⏱ 리포트 단계별 시간: " + ", ".join(f"{k} {v:.2f}s" for k, v in timings.items()))
@@ -0,0 +1,387 @@
+"""
+보존 기간(retention) / 압축(compaction) / 일별 파티션
+
+    python src/retention.py --compact           # 작은 raw 파일들 → data/compacted/ 세그먼트
+    python src/retention.py --partition         # parsed_logs.jsonl → data/partitions/date=YYYY-MM-DD/
+    python src/retention.py --retain --days 90  # 90일 지난 이벤트 → rollup archive 로 줄이고 삭제
+
+1) compact_raw_logs
+   CF_COMPACT_DIRS 로 명시한 폴더(기본 expanded/)에 log_mutated_N.json 처럼 레코드 몇 개짜리
+   raw 파일이 많이 쌓이면 (SMALL_FILE_BYTES 미만 파일이 MIN_COMPACT_FILES 개 이상) 레코드를 모아
+   data/compacted/<폴더>/_segment-NNNNN.json.gz ({"Records": [...]}) 로 합침.
+   raw 파일은 증거 원본이므로 지우거나 옮기지 않는다. data/compacted/manifest.json 에
+   세그먼트별 원본 목록을 남기고, collector 는 원본이 그대로인 동안 원본들 대신 세그먼트 하나를 읽는다.
+
+2) partition_events
+   parsed_logs.jsonl 의 줄을 eventTime 날짜별 data/partitions/date=YYYY-MM-DD/events.jsonl 에 나눠 둠.
+   collector generation + 읽은 위치(offset) + 앞부분 fingerprint 로 새로 append 된 구간만 처리하고,
+   parsed_logs 가 다시 조립됐으면(generation 변경) 처음부터 다시 나눔.
+   → analyze_logs(since=...) / online_detector --since 가 필요한 날짜 파티션만 읽음
+
+3) apply_retention
+   RETENTION_DAYS 보다 오래된 날짜 파티션의 알림 행을 일 단위 rollup(out/rollups/archive.*)에 보관하고
+   collector 의 prune_events 로 shard / parsed_logs.jsonl 에서 지움 (raw 파일은 그대로).
+   이후 alerts / 프로파일 / sketch 는 보존 기간 안의 이벤트만으로 다시 계산되고,
+   대시보드 / 전체 리포트의 rollup 합계에는 archive 가 더해진다.
+"""
+import os
+import re
+import json
+import shutil
+import argparse
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+
+try:
+    from src.atomic_writer import AtomicWriter
+    from src.log_collector import (RAW_DIR, OUT_PATH as PARSED_PATH, COMPACT_DIR,
+                                   collector_generation, complete_size, prefix_fingerprint,
+                                   iter_raw_records, line_event_date, prune_events,
+                                   load_compact_manifest, save_compact_manifest)
+    from src.log_discovery import is_raw_log_name
+    from src.log_analyzer import (iter_alert_rows, iter_line_chunks, load_rules, get_rule_engine,
+                                  SKETCH_MODE)
+    from src.rollups import RollupBuilder, append_archive
+except ImportError:  # python src/retention.py 로 직접 실행한 경우
+    from atomic_writer import AtomicWriter
+    from log_collector import (RAW_DIR, OUT_PATH as PARSED_PATH, COMPACT_DIR,
+                               collector_generation, complete_size, prefix_fingerprint,
+                               iter_raw_records, line_event_date, prune_events,
+                               load_compact_manifest, save_compact_manifest)
+    from log_discovery import is_raw_log_name
+    from log_analyzer import (iter_alert_rows, iter_line_chunks, load_rules, get_rule_engine,
+                              SKETCH_MODE)
+    from rollups import RollupBuilder, append_archive
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+PARTITION_DIR = ROOT_DIR / "data" / "partitions"
+PARTITION_STATE = PARTITION_DIR / "_state.json"
+PARTITION_FILE = "events.jsonl"
+UNKNOWN_DATE = "unknown"
+
+# 이보다 오래된(일) 이벤트는 rollup archive 로 줄이고 삭제 (환경변수로 덮어쓰기 가능)
+RETENTION_DAYS = int(os.environ.get("CF_RETENTION_DAYS", "90"))
+
+# 압축 대상 폴더 (raw_logs 기준, 쉼표 구분, 명시한 폴더만)
+# S3 에서 받은 CloudTrail 파일은 S3 key / digest 와 1:1 로 대응해야 하므로 기본은 log_mutator 출력만
+COMPACT_FOLDERS = [f.strip().strip("/") for f in os.environ.get("CF_COMPACT_DIRS", "expanded").split(",")
+                   if f.strip()]
+# 이 크기 미만 raw 파일이 한 폴더에 MIN_COMPACT_FILES 개 이상이면 세그먼트로 합침
+SMALL_FILE_BYTES = 256 << 10
+MIN_COMPACT_FILES = 8
+# 세그먼트 하나에 넣을 원본 크기 합 (압축 전)
+SEGMENT_BYTES = 64 << 20
+SEGMENT_PREFIX = "_segment-"
+
+_SINCE = re.compile(r"^\s*(\d+)\s*([mhdw])\s*$")
+_UNITS = {"m": "minutes", "h": "hours", "d": "days", "w": "weeks"}
+
+
+def parse_since(text, now=None):
+    """
+    '30m' / '24h' / '7d' / '2w' (지금부터 거꾸로) 또는 ISO 날짜/시각('2025-11-20', '2025-11-20T09:00')
+    → UTC datetime. 형식이 틀리면 ValueError
+    """
+    m = _SINCE.match(text)
+    if m:
+        now = now or datetime.now(timezone.utc)
+        return now - timedelta(**{_UNITS[m.group(2)]: int(m.group(1))})
+    t = datetime.fromisoformat(text.strip().replace("Z", "+00:00"))
+    return t.replace(tzinfo=timezone.utc) if t.tzinfo is None else t.astimezone(timezone.utc)
+
+
+# ==========================
+# 🗜 작은 raw 파일 → 세그먼트
+# ==========================
+
+def _next_segment(folder):
+    """폴더에 이미 있는 세그먼트 다음 번호"""
+    seqs = [p.name[len(SEGMENT_PREFIX):-len(".json.gz")] for p in folder.glob(SEGMENT_PREFIX + "*.json.gz")]
+    return max((int(s) for s in seqs if s.isdigit()), default=-1) + 1
+
+
+def _write_segment(path, files):
+    """
+    files(raw 상대경로) 의 레코드를 {"Records": [...]} 하나로 기록.
+    실제로 넣은 파일 → {mtime_ns, size} 반환 (잘못된 JSON 이나 읽는 도중 바뀐 파일은 건너뜀)
+    """
+    merged = {}
+    with AtomicWriter(path, text=True) as out:
+        out.write('{"Records":[')
+        first = True
+        for rel in files:
+            fp = RAW_DIR / rel
+            try:
+                before = fp.stat()
+                records = list(iter_raw_records(fp))
+                after = fp.stat()
+            except (json.JSONDecodeError, UnicodeDecodeError, OSError) as e:
+                print(f"⚠ 세그먼트에서 제외: {fp} ({e})")
+                continue
+            if (before.st_mtime_ns, before.st_size) != (after.st_mtime_ns, after.st_size):
+                print(f"⚠ 읽는 도중 바뀌어 세그먼트에서 제외: {fp}")
+                continue
+            for rec in records:
+                if not first:
+                    out.write(",")
+                out.write(json.dumps(rec, ensure_ascii=False, separators=(",", ":")))
+                first = False
+            merged[rel] = {"mtime_ns": after.st_mtime_ns, "size": after.st_size}
+        out.write("]}")
+    return merged
+
+
+def _clean_orphans(manifest):
+    """manifest 에 없는 세그먼트 파일 (manifest 기록 전에 중단된 압축) 삭제"""
+    listed = set(manifest["segments"])
+    for seg in COMPACT_DIR.rglob(SEGMENT_PREFIX + "*.json.gz"):
+        if seg.relative_to(COMPACT_DIR).as_posix() not in listed:
+            seg.unlink()
+
+
+def compact_raw_logs(folders=COMPACT_FOLDERS, small_bytes=SMALL_FILE_BYTES,
+                     min_files=MIN_COMPACT_FILES, segment_bytes=SEGMENT_BYTES):
+    """
+    folders(raw_logs 기준, 하위 폴더 제외) 의 작은 raw 파일들을
+    data/compacted/<폴더>/_segment-NNNNN.json.gz 로 합침. raw 파일은 지우거나 옮기지 않는다.
+    세그먼트를 다 쓴 뒤 manifest 에 원본 목록(mtime/size)을 기록하고, 그때부터 collector 는
+    원본 대신 세그먼트를 읽음 (원본이 바뀌면 collector 가 세그먼트를 버리고 원본으로 돌아감)
+    이미 유효한 세그먼트에 들어간 파일은 다시 합치지 않음.
+    반환값: {"segments", "merged_files", "merged_bytes"}
+    """
+    manifest = load_compact_manifest()
+    manifest.setdefault("segments", {})
+    if COMPACT_DIR.exists():
+        _clean_orphans(manifest)
+    covered = {src for e in manifest["segments"].values() for src in e["sources"]}
+
+    segments = merged_files = merged_bytes = 0
+    for folder in folders:
+        src_dir = RAW_DIR / folder
+        if not src_dir.is_dir():
+            continue
+        small = []
+        with os.scandir(src_dir) as it:
+            for e in it:
+                rel = f"{folder}/{e.name}" if folder else e.name
+                if (e.is_file() and is_raw_log_name(e.name) and rel not in covered
+                        and e.stat().st_size < small_bytes):
+                    small.append((rel, e.stat().st_size))
+        if len(small) < min_files:
+            continue
+
+        small.sort()
+        out_dir = COMPACT_DIR / folder
+        seq = _next_segment(out_dir) if out_dir.exists() else 0
+        batch, batch_bytes = [], 0
+        for i, (rel, size) in enumerate(small):
+            batch.append(rel)
+            batch_bytes += size
+            if batch_bytes < segment_bytes and i + 1 < len(small):
+                continue
+            seg_rel = f"{folder}/{SEGMENT_PREFIX}{seq:05d}.json.gz" if folder else \
+                f"{SEGMENT_PREFIX}{seq:05d}.json.gz"
+            merged = _write_segment(COMPACT_DIR / seg_rel, batch)
+            if merged:
+                # 세그먼트 파일이 완성된 뒤에 manifest 에 기록 → 이 시점부터만 원본 대신 사용됨
+                manifest["segments"][seg_rel] = {"sources": merged}
+                save_compact_manifest(manifest)
+                segments += 1
+                merged_files += len(merged)
+                merged_bytes += sum(m["size"] for m in merged.values())
+                seq += 1
+            else:
+                (COMPACT_DIR / seg_rel).unlink(missing_ok=True)
+            batch, batch_bytes = [], 0
+
+    print(f"🗜 raw 파일 {merged_files}개 ({merged_bytes / 1024:.0f} KB) → 세그먼트 {segments}개 "
+          f"({COMPACT_DIR}, 원본은 그대로)")
+    return {"segments": segments, "merged_files": merged_files, "merged_bytes": merged_bytes}
+
+
+# ==========================
+# 📅 일별 파티션
+# ==========================
+
+def _partition_path(date):
+    return PARTITION_DIR / f"date={date}" / PARTITION_FILE
+
+
+def _load_partition_state():
+    try:
+        with open(PARTITION_STATE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _save_partition_state(state):
+    PARTITION_DIR.mkdir(parents=True, exist_ok=True)
+    with AtomicWriter(PARTITION_STATE, text=True) as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+
+
+def _sync_sizes(state):
+    """
+    상태에 기록된 크기 뒤에 남은 줄(상태 저장 전에 중단된 append)을 잘라내고,
+    상태에 없는 파티션은 지움 → 같은 구간을 다시 나눠도 줄이 중복되지 않음
+    """
+    sizes = state.get("sizes", {})
+    for folder in PARTITION_DIR.glob("date=*"):
+        date = folder.name[len("date="):]
+        path = folder / PARTITION_FILE
+        if date not in sizes:
+            shutil.rmtree(folder)
+        elif path.exists() and path.stat().st_size > sizes[date]:
+            with open(path, "r+b") as f:
+                f.truncate(sizes[date])
+
+
+def partition_events(full=False):
+    """
+    parsed_logs.jsonl 의 새 구간을 날짜별 파티션에 append
+    반환값: {"rebuilt", "new_bytes", "dates"(이번에 줄이 추가된 날짜)}
+    """
+    if not PARSED_PATH.exists():
+        return {"rebuilt": False, "new_bytes": 0, "dates": []}
+    stop = complete_size(PARSED_PATH)
+    generation = collector_generation()
+
+    state = {} if full else _load_partition_state()
+    start = state.get("offset") or 0
+    rebuilt = (not state or state.get("generation") != generation or start > stop
+               or state.get("fingerprint") != prefix_fingerprint(PARSED_PATH, start))
+    if rebuilt:
+        if PARTITION_DIR.exists():
+            shutil.rmtree(PARTITION_DIR)
+        # archived_before 는 parsed_logs 가 다시 조립돼도 유지 (이미 archive 에 넣은 날짜)
+        state = {"archived_before": state.get("archived_before"), "sizes": {}}
+        start = 0
+    else:
+        _sync_sizes(state)
+    if stop == start and not rebuilt:
+        return {"rebuilt": False, "new_bytes": 0, "dates": []}
+
+    handles = {}
+    try:
+        for chunk in iter_line_chunks(PARSED_PATH, start, stop):
+            buckets = {}
+            for line in chunk.splitlines(keepends=True):
+                if not line.strip():
+                    continue
+                date = line_event_date(line) or UNKNOWN_DATE
+                buckets.setdefault(date, []).append(line)
+            for date, lines in buckets.items():
+                f = handles.get(date)
+                if f is None:
+                    path = _partition_path(date)
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    f = handles[date] = open(path, "ab")
+                f.writelines(lines)
+    finally:
+        for f in handles.values():
+            f.close()
+
+    sizes = state.setdefault("sizes", {})
+    for date in handles:
+        sizes[date] = _partition_path(date).stat().st_size
+    state.update(generation=generation, offset=stop,
+                 fingerprint=prefix_fingerprint(PARSED_PATH, stop))
+    _save_partition_state(state)
+    return {"rebuilt": rebuilt, "new_bytes": stop - start, "dates": sorted(handles)}
+
+
+def partition_dates():
+    """파티션이 있는 날짜 목록 ('YYYY-MM-DD', 날짜 없는 이벤트의 'unknown' 제외)"""
+    return sorted(d for d in _load_partition_state().get("sizes", {}) if d != UNKNOWN_DATE)
+
+
+def partition_files(since=None, until=None):
+    """
+    since(UTC datetime) 날짜 ~ until 날짜의 파티션 파일 경로 (날짜 순)
+    날짜 단위로만 고르므로 시각까지 거르려면 읽는 쪽에서 eventTime 으로 한 번 더 거름
+    """
+    lo = since.strftime("%Y-%m-%d") if since else None
+    hi = until.strftime("%Y-%m-%d") if until else None
+    return [_partition_path(d) for d in partition_dates()
+            if (lo is None or d >= lo) and (hi is None or d <= hi)]
+
+
+# ==========================
+# ⏳ 보존 기간 적용
+# ==========================
+
+def apply_retention(days=RETENTION_DAYS, now=None):
+    """
+    eventTime 날짜가 (오늘 - days) 이전인 이벤트를
+      1) 알림 행으로 만들어 일 단위 rollup archive 에 보관 (이미 보관한 날짜는 건너뜀)
+      2) collector 의 shard / parsed_logs.jsonl 에서 삭제 (raw 파일은 그대로)
+      3) 그 날짜 파티션도 삭제
+    반환값: {"cutoff", "archived_dates", "archived_rows", "removed"}
+    """
+    now = now or datetime.now(timezone.utc)
+    cutoff = (now - timedelta(days=days)).strftime("%Y-%m-%d")
+    partition_events()
+    state = _load_partition_state()
+    done = state.get("archived_before") or ""
+
+    old = [d for d in partition_dates() if d < cutoff]
+    todo = [d for d in old if d >= done]
+    archived_rows = 0
+    if todo:
+        rules = load_rules()
+        get_rule_engine(rules).reset_state()
+        # sketch 모드면 archive 도 actor 를 나누지 않음 (actor 종류 수만큼 커지지 않도록)
+        rollup = RollupBuilder(by_actor=not SKETCH_MODE)
+        for rows in iter_alert_rows([_partition_path(d) for d in todo], rules):
+            rollup.write_rows(rows)
+        archived_rows = append_archive(rollup.to_frame())
+    # archive 에 넣었다는 기록을 먼저 남겨야 삭제 도중 중단돼도 두 번 보관하지 않음
+    state["archived_before"] = max(cutoff, done)
+    _save_partition_state(state)
+
+    if not old:
+        print(f"⏳ {cutoff} 이전 이벤트 없음 (보존 {days}일)")
+        return {"cutoff": cutoff, "archived_dates": [], "archived_rows": 0, "removed": 0}
+
+    result = prune_events(cutoff)
+    for d in old:
+        shutil.rmtree(_partition_path(d).parent, ignore_errors=True)
+        state["sizes"].pop(d, None)
+    # 남은 파티션은 걸러진 parsed_logs.jsonl 과 같은 줄들 → 처음부터 다시 나누지 않도록 위치만 맞춤
+    stop = complete_size(PARSED_PATH) if PARSED_PATH.exists() else 0
+    state.update(generation=result["generation"], offset=stop,
+                 fingerprint=prefix_fingerprint(PARSED_PATH, stop) if stop else None)
+    _save_partition_state(state)
+
+    print(f"⏳ 보존 {days}일: {cutoff} 이전 {len(old)}일치 이벤트 {result['removed']}건 삭제 "
+          f"(archive rollup {archived_rows}행)")
+    return {"cutoff": cutoff, "archived_dates": todo, "archived_rows": archived_rows,
+            "removed": result["removed"]}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="raw 로그 압축 / 일별 파티션 / 보존 기간 적용")
+    ap.add_argument("--compact", action="store_true",
+                    help="CF_COMPACT_DIRS(기본 expanded) 의 작은 raw 파일들을 세그먼트로 합침 (원본 유지)")
+    ap.add_argument("--partition", action="store_true", help="parsed_logs.jsonl → 일별 파티션 갱신")
+    ap.add_argument("--retain", action="store_true", help="보존 기간이 지난 이벤트를 archive 후 삭제")
+    ap.add_argument("--days", type=int, default=RETENTION_DAYS,
+                    help="--retain 보존 기간 (일, 기본: 환경변수 CF_RETENTION_DAYS 또는 90)")
+    ap.add_argument("--full", action="store_true", help="--partition: 파티션을 처음부터 다시 나눔")
+    args = ap.parse_args()
+    if not (args.compact or args.partition or args.retain):
+        args.compact = args.partition = True
+
+    if args.compact:
+        compact_raw_logs()
+    if args.partition:
+        info = partition_events(full=args.full)
+        mode = "rebuilt" if info["rebuilt"] else "incremental"
+        print(f"📅 파티션 {mode}: +{info['new_bytes']:,} bytes, 날짜 {len(info['dates'])}개 → {PARTITION_DIR}")
+    if args.retain:
+        apply_retention(args.days)
+
+
+if __name__ == "__main__":
+    main()
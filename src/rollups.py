@@ -0,0 +1,222 @@
+"""
+알림 사전 집계(rollup) 큐브
+
+generate_alerts 가 알림 행을 만드는 같은 패스에서
+    시간(hour) × service × actor × action × risk_score → count, risk_sum, risk_max
+를 누적해서 out/rollups/hourly.parquet (pyarrow 없으면 hourly.csv)로 저장한다.
+risk_score 도 차원에 넣어서 대시보드의 "Min Risk Score" 필터를 rollup 만으로 정확히 적용할 수 있다.
+
+대시보드의 KPI 카드 / 서비스 분포 / 시간 추이 차트는 이 rollup 만 읽으므로
+원본 이벤트 수와 무관하게 (hour × 차원 조합 수) 크기만 다룬다.
+
+sketch 모드(CF_SKETCH=1)에서는 actor 종류 수만큼 rollup 이 커지지 않도록 actor 를 키에서 빼고
+모두 OTHER_ACTOR 로 합친다 (RollupBuilder(by_actor=False)). 대시보드는 이때 actor 목록을
+sketch 의 heavy hitter 로 만들고, actor 를 고르면 그 actor 의 원본 이벤트로 rollup 을 따로 만든다.
+
+retention(src/retention.py)으로 지워지는 오래된 이벤트는 먼저 일(day) 단위로 줄여서
+out/rollups/archive.parquet 에 누적하므로, load_rollups() 의 합계에는 보존 기간 밖의 이력도 남는다.
+"""
+import os
+import threading
+from collections import Counter
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow 없으면 CSV 로 저장
+    pa = None
+
+try:
+    from src.atomic_writer import AtomicWriter
+except ImportError:  # python src/xxx.py 로 직접 실행한 경우
+    from atomic_writer import AtomicWriter
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+OUT_DIR = ROOT_DIR / "out"
+ROLLUP_DIR = OUT_DIR / "rollups"
+ROLLUP_PARQUET = ROLLUP_DIR / "hourly.parquet"
+ROLLUP_CSV = ROLLUP_DIR / "hourly.csv"
+ARCHIVE_PARQUET = ROLLUP_DIR / "archive.parquet"
+ARCHIVE_CSV = ROLLUP_DIR / "archive.csv"
+
+DIMENSIONS = ["hour", "service", "actor", "action", "risk_score"]
+METRICS = ["count", "risk_sum", "risk_max"]
+ROLLUP_COLUMNS = DIMENSIONS + METRICS
+
+# by_actor=False 로 만든 rollup 행의 actor 값 (모든 actor 합계)
+OTHER_ACTOR = "<other>"
+
+# alerts 행(ALERT_HEADER 순서) 인덱스
+_TIME, _ACTOR, _SERVICE, _ACTION, _RISK = 0, 1, 2, 3, 5
+
+
+def _hour_of(t):
+    """'2025-11-20T10:59:52Z' → '2025-11-20T10' (형식이 이상하면 None)"""
+    if type(t) is str and len(t) >= 13 and t[10] == "T":
+        return t[:13]
+    return None
+
+
+class RollupBuilder:
+    """
+    write_rows(rows) 로 alerts 행을 받아 (hour, service, actor, action, risk_score) 별 건수를 셈.
+    risk_score 가 키에 있으므로 risk_sum = count × risk, risk_max = risk 로 바로 계산된다.
+    by_actor=False 면 actor 는 모두 OTHER_ACTOR 로 합침 (키 수가 actor 종류 수와 무관)
+    """
+
+    def __init__(self, by_actor=True):
+        self.by_actor = by_actor
+        self.counts = Counter()
+
+    def write_rows(self, rows):
+        if self.by_actor:
+            self.counts.update(
+                (_hour_of(r[_TIME]), r[_SERVICE], r[_ACTOR], r[_ACTION], r[_RISK]) for r in rows
+            )
+        else:
+            self.counts.update(
+                (_hour_of(r[_TIME]), r[_SERVICE], OTHER_ACTOR, r[_ACTION], r[_RISK]) for r in rows
+            )
+
+    def to_frame(self):
+        if not self.counts:
+            return _empty_frame()
+        keys = list(self.counts.keys())
+        df = pd.DataFrame(keys, columns=DIMENSIONS)
+        df["count"] = list(self.counts.values())
+        return _finish(df)
+
+    def close(self):
+        """rollup 파일로 저장하고 행 수 반환"""
+        df = self.to_frame()
+        save_rollups(df)
+        return len(df)
+
+
+def _empty_frame():
+    df = pd.DataFrame({c: pd.Series(dtype=object) for c in DIMENSIONS[1:4]})
+    df.insert(0, "hour", pd.Series(dtype="datetime64[ns, UTC]"))
+    df["risk_score"] = pd.Series(dtype="float64")
+    for m in METRICS:
+        df[m] = pd.Series(dtype="int64" if m == "count" else "float64")
+    return df
+
+
+def _finish(df):
+    """hour 문자열 → datetime, 빈 문자열 → 결측값 (alerts 를 read_csv 로 읽을 때와 같게), 지표 계산"""
+    df["hour"] = pd.to_datetime(df["hour"], format="%Y-%m-%dT%H", errors="coerce", utc=True)
+    for c in ("service", "actor", "action"):
+        df[c] = df[c].where(df[c].notna() & (df[c] != ""), None)
+    df["risk_score"] = pd.to_numeric(df["risk_score"], errors="coerce")
+    df["count"] = df["count"].astype("int64")
+    df["risk_sum"] = df["risk_score"] * df["count"]
+    df["risk_max"] = df["risk_score"]
+    return df.sort_values(["hour", "service", "actor", "action"], na_position="last",
+                          ignore_index=True)[ROLLUP_COLUMNS]
+
+
+# ==========================
+# 💾 저장 / 읽기
+# ==========================
+
+def _save(df, parquet_path, csv_path):
+    ROLLUP_DIR.mkdir(parents=True, exist_ok=True)
+    if pa is not None:
+        tmp = parquet_path.with_name(f".{parquet_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), str(tmp), compression="zstd")
+        os.replace(tmp, parquet_path)
+        if csv_path.exists():
+            csv_path.unlink()
+    else:
+        with AtomicWriter(csv_path, text=True) as f:
+            df.to_csv(f, index=False)
+        if parquet_path.exists():
+            parquet_path.unlink()
+
+
+def _load(parquet_path, csv_path):
+    for path in (parquet_path, csv_path):
+        if not path.exists():
+            continue
+        if path.suffix == ".parquet":
+            if pa is None:
+                return None
+            return pq.read_table(str(path)).to_pandas()
+        df = pd.read_csv(path)
+        df["hour"] = pd.to_datetime(df["hour"], errors="coerce", utc=True)
+        return df
+    return None
+
+
+def save_rollups(df):
+    _save(df, ROLLUP_PARQUET, ROLLUP_CSV)
+
+
+def rollups_path():
+    """저장된 rollup 파일 경로 (없으면 None)"""
+    for p in (ROLLUP_PARQUET, ROLLUP_CSV):
+        if p.exists():
+            return p
+    return None
+
+
+def load_archive():
+    """retention 으로 보관된 일 단위 rollup (없으면 None)"""
+    return _load(ARCHIVE_PARQUET, ARCHIVE_CSV)
+
+
+def append_archive(df):
+    """
+    보존 기간이 지난 이벤트의 rollup 을 일 단위로 줄여서 archive 에 합침.
+    hour 는 그 날 00시로 내리고 같은 (날짜, service, actor, action, risk_score) 는 합산.
+    보관된 행 수 반환
+    """
+    if df.empty:
+        return 0
+    df = df.copy()
+    df["hour"] = df["hour"].dt.floor("D")
+    old = load_archive()
+    if old is not None and not old.empty:
+        df = pd.concat([old, df], ignore_index=True)
+    df = (df.groupby(DIMENSIONS, dropna=False, sort=False)
+          .agg(count=("count", "sum"), risk_sum=("risk_sum", "sum"), risk_max=("risk_max", "max"))
+          .reset_index())
+    df["count"] = df["count"].astype("int64")
+    df = df.sort_values(["hour", "service", "actor", "action"], na_position="last",
+                        ignore_index=True)[ROLLUP_COLUMNS]
+    _save(df, ARCHIVE_PARQUET, ARCHIVE_CSV)
+    return len(df)
+
+
+def load_rollups(archive=True):
+    """
+    저장된 rollup 을 DataFrame 으로 (없으면 None)
+    archive=True 면 retention 으로 보관된 일 단위 rollup 도 앞에 붙임.
+    (hourly 가 아직 retention 전 출력이면 archive 와 겹치는 날짜는 archive 쪽만 사용)
+    """
+    df = _load(ROLLUP_PARQUET, ROLLUP_CSV)
+    if df is None or not archive:
+        return df
+    old = load_archive()
+    if old is None or old.empty:
+        return df
+    boundary = old["hour"].max() + pd.Timedelta(days=1)
+    df = df[~(df["hour"] < boundary)]
+    return pd.concat([old, df], ignore_index=True)
+
+
+def rollup_from_alerts(df):
+    """
+    alerts DataFrame(load_alerts 결과) → rollup
+    (rollup 파일이 없던 예전 출력용 대체 경로)
+    """
+    if df.empty:
+        return _empty_frame()
+    b = RollupBuilder()
+    cols = ["time", "actor", "service", "action", "result", "risk_score"]
+    sub = df.reindex(columns=cols).astype(object)
+    b.write_rows(sub.where(sub.notna(), None).itertuples(index=False, name=None))
+    return b.to_frame()
@@ -0,0 +1,221 @@
+"""
+rules/sensitive_apis.json 규칙 엔진
+
+규칙 키 형식
+  "service:action"        정확히 일치
+  "service:Prefix*"       action 접두어 매칭 (예: "iam:Delete*")
+  "service:*" / "*:action" / "*:*"  와일드카드
+  "...#라벨"              같은 패턴에 규칙을 여러 개 둘 때 키를 구분하는 용도 (매칭에는 영향 없음)
+
+규칙 값
+  {"risk": 80, "reason": "...",
+   "priority": 10,                      # 클수록 먼저 (기본 0)
+   "when": {                            # 모두 만족해야 매칭 (선택)
+       "result": "AccessDenied",        # 문자열: 일치, "Prefix*" 는 접두어
+       "region": ["us-east-1", "eu-*"], # 목록: 하나라도 일치
+       "actor": "admin*",
+       "new_region": true               # actor 가 이전에 본 적 없는 region 에서 발생
+   }}
+  "note" 등 그 밖의 키는 무시 (설명용)
+
+new_region 의 "이전" 은 eventTime 이 아니라 엔진에 들어온 순서 기준이다.
+parsed_logs.jsonl 은 raw 파일 경로 순이라 시간순이 아니므로, 시간상 더 오래된 이벤트가
+파일에서 뒤에 있으면 그 이벤트가 "새 region" 으로 잡힐 수 있다.
+또 상태는 generate_alerts 실행마다 (reset_state) 초기화되므로 --since 로 일부 구간만 분석하면
+그 구간 안에서 처음 본 region 만 기준이 된다.
+실행 이력이나 --since 구간에 따라 같은 이벤트의 risk 가 달라지므로 기본 규칙 파일에는 넣지 않고
+opt-in 예시(rules/examples/new_region_write.json)로만 제공한다.
+
+후보 규칙은 (priority, 구체성, 조건 수, 파일 순서) 순으로 정렬해서
+처음으로 조건을 만족하는 규칙을 사용한다.
+구체성: service:action > service:Prefix*(긴 접두어 우선) > service:* > *:action > *:Prefix* > *:*
+priority 가 모두 0 이면 예전 match_rule 우선순위와 같다.
+"""
+
+DEFAULT_RULE = {"risk": 10, "reason": "규칙 없음(기본)"}
+
+# (service, action) 조합별 후보 캐시 최대 크기
+CACHE_SIZE = 100_000
+
+
+def _compile_matcher(expected):
+    """조건 값 → 문자열 하나를 검사하는 함수"""
+    values = expected if isinstance(expected, list) else [expected]
+    exact = set()
+    prefixes = []
+    for v in values:
+        v = str(v)
+        if v.endswith("*"):
+            prefixes.append(v[:-1])
+        else:
+            exact.add(v)
+    prefixes = tuple(prefixes)
+
+    def match(value):
+        if value is None:
+            return False
+        value = str(value)
+        return value in exact or (bool(prefixes) and value.startswith(prefixes))
+
+    return match
+
+
+class CompiledRule:
+    __slots__ = ("rule_id", "key", "spec", "priority", "specificity",
+                 "conds", "new_region", "order")
+
+    def __init__(self, rule_id, key, spec, specificity, order):
+        self.rule_id = rule_id
+        self.key = key
+        self.spec = spec
+        self.priority = spec.get("priority", 0)
+        self.specificity = specificity
+        self.order = order
+
+        when = dict(spec.get("when") or {})
+        self.new_region = bool(when.pop("new_region", False))
+        self.conds = tuple((field, _compile_matcher(v)) for field, v in when.items())
+
+    @property
+    def conditional(self):
+        return bool(self.conds) or self.new_region
+
+    def sort_key(self):
+        n_conds = len(self.conds) + self.new_region
+        return (-self.priority, -self.specificity[0], -self.specificity[1], -n_conds, self.order)
+
+
+class RuleEngine:
+    """
+    규칙 dict 를 한 번 컴파일해서
+      service → {exact action → 규칙들, 접두어 길이 → {접두어 → 규칙들}, '*' → 규칙들}
+    해시 구조로 보관. (service, action) 조합별 정렬된 후보 목록은 캐시하므로
+    이벤트당 매칭 비용은 규칙 수와 무관하게 O(1) (amortized).
+    """
+
+    def __init__(self, rules):
+        self.specs = []        # rule_id → 규칙 dict (마지막은 기본 규칙)
+        self._by_service = {}  # service → {"exact": {}, "prefix": {len: {prefix: []}}, "any": []}
+        self._cache = {}
+        self._regions = {}     # actor → 지금까지 본 region 집합 (new_region 조건용)
+        self.condition_fields = set()
+        self.stateful = False
+
+        for order, (key, spec) in enumerate(rules.items()):
+            pattern = key.split("#", 1)[0]
+            if ":" not in pattern:
+                print(f"⚠ 규칙 키 형식 오류 (service:action 아님), 건너뜀: {key}")
+                continue
+            svc, act = pattern.split(":", 1)
+            svc = svc.strip().lower()
+            if "*" in act[:-1] or "?" in act or ("*" in svc and svc != "*"):
+                print(f"⚠ 지원하지 않는 와일드카드 형식, 건너뜀: {key}")
+                continue
+
+            wild_svc = svc == "*"
+            if act == "*":
+                specificity = (1 if wild_svc else 4, 0)
+            elif act.endswith("*"):
+                specificity = (2 if wild_svc else 5, len(act) - 1)
+            else:
+                specificity = (3 if wild_svc else 6, 0)
+
+            rule = CompiledRule(len(self.specs), key, spec, specificity, order)
+            self.specs.append(spec)
+            self.condition_fields.update(f for f, _ in rule.conds)
+            if rule.new_region:
+                self.stateful = True
+                self.condition_fields.update(("actor", "region"))
+
+            bucket = self._by_service.setdefault(svc, {"exact": {}, "prefix": {}, "any": []})
+            if act == "*":
+                bucket["any"].append(rule)
+            elif act.endswith("*"):
+                bucket["prefix"].setdefault(len(act) - 1, {}).setdefault(act[:-1], []).append(rule)
+            else:
+                bucket["exact"].setdefault(act, []).append(rule)
+
+        self.default_id = len(self.specs)
+        self.specs.append(DEFAULT_RULE)
+
+    # ---------- 후보 조회 ----------
+
+    def _collect(self, bucket, action, out):
+        if bucket is None:
+            return
+        out.extend(bucket["exact"].get(action, ()))
+        for length, table in bucket["prefix"].items():
+            if len(action) >= length:
+                out.extend(table.get(action[:length], ()))
+        out.extend(bucket["any"])
+
+    def candidates(self, service, action):
+        """(service, action) 에 해당하는 규칙들을 우선순위 순으로 (캐시)"""
+        key = (service, action)
+        cands = self._cache.get(key)
+        if cands is None:
+            found = []
+            self._collect(self._by_service.get(service), action, found)
+            if service != "*":
+                self._collect(self._by_service.get("*"), action, found)
+            found.sort(key=CompiledRule.sort_key)
+            # 조건 없는 규칙 뒤의 후보는 절대 선택되지 않으므로 잘라냄
+            for i, r in enumerate(found):
+                if not r.conditional:
+                    del found[i + 1:]
+                    break
+            cands = tuple(found)
+            if len(self._cache) >= CACHE_SIZE:
+                self._cache.clear()
+            self._cache[key] = cands
+        return cands
+
+    def static_rule_id(self, service, action):
+        """
+        이벤트 내용과 무관하게 규칙이 정해지면 그 rule_id,
+        조건부 규칙을 평가해야 하면 -1
+        """
+        cands = self.candidates(service, action)
+        if not cands:
+            return self.default_id
+        if cands[0].conditional:
+            return -1
+        return cands[0].rule_id
+
+    # ---------- 매칭 ----------
+
+    def _check(self, rule, evt):
+        for field, match in rule.conds:
+            if not match(evt.get(field)):
+                return False
+        if rule.new_region:
+            seen = self._regions.get(evt.get("actor"))
+            region = evt.get("region")
+            if not seen or not region or region in seen:
+                return False
+        return True
+
+    def reset_state(self):
+        """new_region 등 실행 중에 쌓은 상태 초기화"""
+        self._regions.clear()
+
+    def observe(self, evt):
+        """상태 갱신 (actor 별로 본 region 기록)"""
+        region = evt.get("region")
+        if region:
+            self._regions.setdefault(evt.get("actor"), set()).add(region)
+
+    def match_id(self, service, action, evt):
+        """이벤트 하나에 적용할 rule_id (상태도 함께 갱신)"""
+        rule_id = self.default_id
+        for rule in self.candidates(service, action):
+            if not rule.conditional or self._check(rule, evt):
+                rule_id = rule.rule_id
+                break
+        if self.stateful:
+            self.observe(evt)
+        return rule_id
+
+    def match(self, service, action, evt=None):
+        """이벤트 하나에 적용할 규칙 dict"""
+        return self.specs[self.match_id(service, action, evt or {})]
@@ -1,31 +1,261 @@
-import boto3
 import os
+import time
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
 
+try:
+    from src.ingest_manifest import IngestManifest, is_current, STATE_DOWNLOADED, STATE_FAILED
+    from src.log_discovery import partition_rel_path
+except ImportError:  # python src/s3_downloader.py 로 직접 실행한 경우
+    from ingest_manifest import IngestManifest, is_current, STATE_DOWNLOADED, STATE_FAILED
+    from log_discovery import partition_rel_path
+
+# ==========================
+# 📁 기본 설정
+# ==========================
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
 BUCKET_NAME = "cloudtrail-log-demo-goeun"   # 네가 만든 버킷 이름
-DOWNLOAD_DIR = "data/raw_logs"
+PREFIX = "AWSLogs/"
+DOWNLOAD_DIR = ROOT_DIR / "data" / "raw_logs"
 
-def download_latest_logs():
-    s3 = boto3.client("s3")
+# 동시 다운로드 수 / 재시도 설정 (환경변수로 덮어쓰기 가능)
+MAX_WORKERS = int(os.environ.get("S3_MAX_WORKERS", "16"))
+MAX_RETRIES = int(os.environ.get("S3_MAX_RETRIES", "4"))
+BACKOFF_BASE = 0.5   # 초 단위, 시도마다 2배씩 증가
 
-    # 폴더 없으면 생성
-    os.makedirs(DOWNLOAD_DIR, exist_ok=True)
 
-    # S3 객체 목록 가져오기
-    objects = s3.list_objects_v2(Bucket=BUCKET_NAME, Prefix="AWSLogs")
+def make_s3_client(max_workers=MAX_WORKERS):
+    """
+    스레드들이 함께 쓰는 boto3 S3 클라이언트 하나 생성.
+    커넥션 풀 크기를 워커 수에 맞춰야 풀 고갈 경고 없이 병렬 다운로드 가능.
+    """
+    cfg = Config(
+        max_pool_connections=max(10, max_workers),
+        retries={"max_attempts": 3, "mode": "adaptive"},
+    )
+    return boto3.client("s3", config=cfg)
 
-    if "Contents" not in objects:
-        print("⚠ No CloudTrail logs found in S3 yet.")
-        return
 
-    for obj in objects["Contents"]:
-        key = obj["Key"]
-        local_path = os.path.join(DOWNLOAD_DIR, key.replace("/", "_"))
+def is_log_key(key: str) -> bool:
+    """CloudTrail 로그 파일만 대상 (.json 또는 .json.gz)"""
+    return key.endswith(".json") or key.endswith(".json.gz")
+
+
+def local_path_for(key: str, dest_dir: Path) -> Path:
+    """
+    로컬 저장 경로: account/region/YYYY/MM/DD 파티션 폴더
+    (한 폴더에 수백만 개가 쌓이지 않게. CloudTrail 레이아웃이 아니면 '/' 를 '_' 로 치환한 파일명)
+    """
+    return Path(dest_dir) / partition_rel_path(key)
+
+
+# ==========================
+# 1️⃣ 페이지네이션 목록 조회
+# ==========================
+
+def _common_prefixes(s3, bucket, prefix):
+    """Delimiter='/' 로 prefix 바로 아래 '폴더' 목록 조회"""
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix, Delimiter="/"):
+        for cp in page.get("CommonPrefixes", []):
+            yield cp["Prefix"]
+
+
+def discover_trail_prefixes(s3, bucket=BUCKET_NAME, prefix=PREFIX):
+    """
+    CloudTrail 기본 레이아웃에서 account/region 단위 prefix 목록을 찾음
+      AWSLogs/[o-조직ID/]<account>/CloudTrail/<region>/YYYY/MM/DD/...
+    레이아웃이 다르면 prefix 자체 하나만 반환.
+    """
+    if not prefix.endswith("/"):
+        return [prefix]
+
+    result = []
+    pending = list(_common_prefixes(s3, bucket, prefix))
+    while pending:
+        p = pending.pop(0)
+        name = p[len(prefix):].split("/")[-2]
+        if name.startswith("o-"):
+            # Organization trail → 한 단계 더 내려감
+            pending.extend(_common_prefixes(s3, bucket, p))
+            continue
+        result.extend(_common_prefixes(s3, bucket, p + "CloudTrail/"))
+
+    return sorted(result) or [prefix]
+
+
+def list_log_objects(s3, bucket=BUCKET_NAME, prefix=PREFIX, start_after=""):
+    """
+    list_objects_v2 페이지네이터로 prefix 아래 객체를 전부 순회.
+    (한 번 호출하면 1,000개에서 끊기는 문제 해결)
+    start_after 가 있으면 그 key 이후부터만 조회 (워터마크)
+    """
+    paginator = s3.get_paginator("list_objects_v2")
+    kwargs = {"Bucket": bucket, "Prefix": prefix}
+    if start_after:
+        kwargs["StartAfter"] = start_after
+    for page in paginator.paginate(**kwargs):
+        for obj in page.get("Contents", []):
+            if is_log_key(obj["Key"]):
+                yield obj
+
+
+# ==========================
+# 2️⃣ 객체 단위 다운로드 (재시도 + 백오프)
+# ==========================
+
+def download_object(s3, bucket, key, local_path, max_retries=MAX_RETRIES):
+    """
+    객체 하나를 임시 파일로 받은 뒤 rename.
+    일시적 오류는 지수 백오프로 max_retries 번까지 재시도.
+    """
+    local_path = Path(local_path)
+    local_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = local_path.with_name(local_path.name + ".part")
 
-        # 이미 다운로드한 파일이면 skip
-        if os.path.exists(local_path):
+    for attempt in range(1, max_retries + 1):
+        try:
+            s3.download_file(bucket, key, str(tmp_path))
+            os.replace(tmp_path, local_path)
+            return True
+        except (BotoCoreError, ClientError, OSError) as e:
+            if tmp_path.exists():
+                tmp_path.unlink()
+            if attempt == max_retries:
+                print(f"[S3] ❌ {key} 다운로드 실패 ({attempt}회 시도): {e}")
+                return False
+            delay = BACKOFF_BASE * (2 ** (attempt - 1))
+            print(f"[S3] ⚠ {key} 다운로드 오류, {delay:.1f}s 후 재시도 ({attempt}/{max_retries}): {e}")
+            time.sleep(delay)
+    return False
+
+
+# ==========================
+# 3️⃣ 병렬 수집 엔진
+# ==========================
+
+def _download_prefix(s3, pool, bucket, prefix, dest_dir, manifest,
+                     max_workers, max_retries, full_rescan):
+    """
+    prefix 하나(account/region)를 워터마크 이후부터 조회해서 새 객체만 다운로드.
+    반환값: (listed, downloaded, failed)
+    """
+    start_after = "" if full_rescan else manifest.get_watermark(prefix)
+    known = manifest.load_known(prefix, start_after)
+
+    listed = 0
+    count = 0
+    failed = 0
+    order = []          # 목록 순서대로의 key (워터마크 계산용)
+    results = {}        # key → 성공 여부
+    pending_rows = {}   # key → 매니페스트에 기록할 값
+    futures = {}
+    rows = []           # 매니페스트 일괄 기록용
+
+    def collect(done):
+        nonlocal count, failed
+        for f in done:
+            key = futures.pop(f)
+            ok = f.result()
+            results[key] = ok
+            count += ok
+            failed += not ok
+            etag, size, last_modified = pending_rows.pop(key)
+            rows.append((key, etag, size, last_modified,
+                         STATE_DOWNLOADED if ok else STATE_FAILED))
+
+    for obj in list_log_objects(s3, bucket, prefix, start_after):
+        listed += 1
+        key = obj["Key"]
+        order.append(key)
+        if is_current(known, obj):
+            # 매니페스트상 이미 받은 객체 (ETag/Size 동일) → 스킵
+            results[key] = True
             continue
 
-        print(f"⬇ Downloading: {key}")
-        s3.download_file(BUCKET_NAME, key, local_path)
+        local_path = local_path_for(key, dest_dir)
+        pending_rows[key] = (obj.get("ETag"), obj.get("Size"), str(obj.get("LastModified", "")))
+        fut = pool.submit(download_object, s3, bucket, key, local_path, max_retries)
+        futures[fut] = key
+
+        # 목록이 아주 길 때 future가 무한정 쌓이지 않도록 일부 끝날 때까지 대기
+        if len(futures) >= max_workers * 64:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            collect(done)
+
+    collect(wait(futures).done)
+    manifest.record_many(rows)
+
+    # 실패 없이 연속으로 처리된 구간의 마지막 key 까지만 워터마크 전진
+    watermark = None
+    for key in order:
+        if not results.get(key):
+            break
+        watermark = key
+    if watermark and watermark > start_after:
+        manifest.set_watermark(prefix, watermark)
+
+    return listed, count, failed
+
+
+def download_logs(bucket=BUCKET_NAME, prefix=PREFIX, dest_dir=DOWNLOAD_DIR,
+                  max_workers=MAX_WORKERS, max_retries=MAX_RETRIES, s3=None,
+                  manifest=None, full_rescan=False):
+    """
+    S3 prefix 아래의 CloudTrail 로그를 병렬로 다운로드.
+      - account/region prefix 별로 워터마크(StartAfter) 이후만 목록 조회
+      - 다운로드는 bounded thread pool (클라이언트 하나 공유)
+      - 이미 받은 객체는 매니페스트(ETag/Size)로 판단해서 스킵 (파일 stat 없음)
+    s3 / manifest 인자로 클라이언트·매니페스트를 넘기면 그걸 사용 (moto 등 테스트용)
+    full_rescan=True 면 워터마크를 무시하고 전체 목록을 다시 확인
+    반환값: 새로 받은 파일 수
+    """
+    s3 = s3 or make_s3_client(max_workers)
+    dest_dir = Path(dest_dir)
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    own_manifest = manifest is None
+    manifest = manifest or IngestManifest()
+
+    print(f"[S3] Listing objects from s3://{bucket}/{prefix}")
+
+    listed = 0
+    count = 0
+    failed = 0
+    started = time.perf_counter()
+
+    try:
+        prefixes = discover_trail_prefixes(s3, bucket, prefix)
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for p in prefixes:
+                l, c, f = _download_prefix(s3, pool, bucket, p, dest_dir, manifest,
+                                           max_workers, max_retries, full_rescan)
+                listed += l
+                count += c
+                failed += f
+    finally:
+        if own_manifest:
+            manifest.close()
+
+    elapsed = time.perf_counter() - started
+    if listed == 0:
+        print("[S3] No new logs found in S3.")
+        return 0
+
+    print(f"[S3] ✅ S3 Log Download Complete "
+          f"(prefixes: {len(prefixes)}, listed: {listed}, new files: {count}, "
+          f"failed: {failed}, {elapsed:.1f}s)")
+    return count
+
+
+def download_latest_logs():
+    """예전 진입점 호환용 → download_logs() 로 위임"""
+    return download_logs()
+
 
-    print("✅ S3 download complete!")
+if __name__ == "__main__":
+    download_logs()
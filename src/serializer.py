@@ -0,0 +1,160 @@
+"""
+JSON 직렬화 계층 (collector 의 이벤트별 dumps, analyzer 의 줄별 loads 용)
+
+설치되어 있으면 orjson → msgspec 순으로 사용하고, 없으면 표준 json 모듈.
+환경변수 CF_JSON_BACKEND=orjson|msgspec|json 으로 강제할 수 있다.
+
+    from src.serializer import dumps_line, loads, DecodeError
+    out_f.write(dumps_line(evt))      # UTF-8 bytes + "\\n"
+    evt = loads(line)                 # bytes / str 모두 가능
+
+출력 호환성: 모든 백엔드가 같은 JSON 값(키 순서, 비ASCII 문자 그대로)을 쓴다.
+표준 json 은 예전과 바이트까지 같고(", " / ": " 구분자), orjson / msgspec 은
+공백 없는 compact 형식이라 바이트는 다르지만 읽는 쪽(json/pyarrow/pandas)에는 차이가 없다.
+"""
+import os
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # 선택 의존성
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # 선택 의존성
+    msgspec = None
+
+
+class _Backend:
+    """백엔드 하나: name / dumps(obj) -> bytes / loads(bytes|str) / decode_error(예외 튜플)"""
+
+    def __init__(self, name, dumps, loads, decode_error):
+        self.name = name
+        self.dumps = dumps
+        self.loads = loads
+        self.decode_error = decode_error
+
+    def dumps_line(self, obj):
+        return self.dumps(obj) + b"\n"
+
+    def __repr__(self):
+        return f"<serializer {self.name}>"
+
+
+def _json_dumps(obj):
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+
+def _make_json():
+    return _Backend("json", _json_dumps, json.loads, (json.JSONDecodeError,))
+
+
+def _make_orjson():
+    def dumps(obj):
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            # 64비트 넘는 정수 등 orjson 이 못 쓰는 값 → 표준 json
+            return _json_dumps(obj)
+
+    # orjson.JSONDecodeError 는 json.JSONDecodeError 의 하위 클래스
+    return _Backend("orjson", dumps, orjson.loads, (json.JSONDecodeError,))
+
+
+def _make_msgspec():
+    encoder = msgspec.json.Encoder()
+    decoder = msgspec.json.Decoder()
+
+    def dumps(obj):
+        try:
+            return encoder.encode(obj)
+        except (TypeError, OverflowError):
+            return _json_dumps(obj)
+
+    return _Backend("msgspec", dumps, decoder.decode,
+                    (json.JSONDecodeError, msgspec.DecodeError))
+
+
+_FACTORIES = {"orjson": _make_orjson, "msgspec": _make_msgspec, "json": _make_json}
+
+
+def available_backends():
+    """설치되어 있는 백엔드 이름 (선호 순)"""
+    names = []
+    if orjson is not None:
+        names.append("orjson")
+    if msgspec is not None:
+        names.append("msgspec")
+    names.append("json")
+    return names
+
+
+def get_backend(name=None):
+    """
+    이름으로 백엔드 생성. None 이면 CF_JSON_BACKEND 또는 설치된 것 중 가장 빠른 것.
+    설치되지 않은 이름이면 표준 json 으로 대체.
+    """
+    name = name or os.environ.get("CF_JSON_BACKEND") or available_backends()[0]
+    if name not in available_backends():
+        print(f"⚠ JSON 백엔드 '{name}' 를 쓸 수 없어 표준 json 사용")
+        name = "json"
+    return _FACTORIES[name]()
+
+
+_backend = get_backend()
+
+BACKEND = _backend.name
+dumps = _backend.dumps
+dumps_line = _backend.dumps_line
+loads = _backend.loads
+# except DecodeError: 로 잡을 수 있는 예외 튜플
+DecodeError = _backend.decode_error
+
+
+# ==========================
+# 🧱 타입 지정 디코딩 (analyzer 용)
+# ==========================
+
+_MISSING = object()
+
+# parsed_logs.jsonl 에서 항상 문자열인 필드
+STR_FIELDS = ("eventTime", "service", "action", "actor", "result", "region", "account")
+
+
+def _struct_get(self, key, default=None):
+    """dict.get 과 같은 의미 (키가 없던 필드는 default, null 은 None)"""
+    value = getattr(self, key, _MISSING)
+    if value is _MISSING or value is msgspec.UNSET:
+        return default
+    return value
+
+
+def event_decoder(fields, backend=None):
+    """
+    JSONL 한 줄 → 이벤트 객체 디코더 함수를 만든다.
+    msgspec 이 있으면 fields 만 가진 Struct 로 바로 디코딩 (dict 를 만들지 않음,
+    STR_FIELDS 는 str 타입 검사). 타입이 맞지 않는 줄은 dict 로 디코딩한다.
+    msgspec 이 없으면 backend(기본: 현재 백엔드)의 loads → dict.
+    어느 쪽이든 결과는 evt.get(key, default) 로 읽을 수 있다.
+    디코딩 실패는 (decoder, 잡을 예외 튜플) 의 예외 튜플로 잡으면 된다.
+    """
+    backend = backend or _backend
+    if msgspec is None:
+        return backend.loads, backend.decode_error
+
+    spec = []
+    for f in dict.fromkeys(fields):
+        typ = Union[str, None, msgspec.UnsetType] if f in STR_FIELDS else Any
+        spec.append((f, typ, msgspec.UNSET))
+    struct = msgspec.defstruct("ParsedEvent", spec, namespace={"get": _struct_get})
+    typed = msgspec.json.Decoder(struct)
+
+    def decode(line):
+        try:
+            return typed.decode(line)
+        except msgspec.ValidationError:
+            return backend.loads(line)
+
+    return decode, backend.decode_error + (msgspec.DecodeError,)
@@ -0,0 +1,387 @@
+"""
+고정 메모리 빈도 / 고유값 수 추정 (sketch)
+
+role session 처럼 actor 종류가 이벤트 수만큼 늘어나는 로그에서도
+이상탐지와 "Unique Actors" KPI 를 키 수와 무관한 메모리로 계산하기 위한 자료구조.
+
+  - CountMinSketch : 키별 건수 추정. 항상 실제 이상 (과대추정만 함)
+                     추정 ≤ 실제 + ε·N  (ε = e / width, 확률 1 - δ, δ = e^-depth)
+                     행별 제곱합으로 F2(건수 제곱합) 도 추정 → 표준편차 계산
+  - SpaceSaving    : 상위 k 개 heavy hitter. count - error ≤ 실제 ≤ count 이고
+                     실제 건수가 floor(가득 찼을 때 최소 count) 보다 큰 키는 반드시 포함
+  - HyperLogLog    : 고유값 수 추정. 상대 표준오차 1.04 / sqrt(2^p) (p=14 → 약 0.8%)
+
+모두 같은 설정끼리 merge 가능 (병렬 / 날짜별 sketch 를 합칠 수 있음).
+키 해시는 pandas.util.hash_array 로 묶음 단위 벡터화 (고정 hash_key → 실행마다 같은 값).
+
+analyze_logs(sketch=True) 는 generate_alerts 에 SketchBuilder 를 sink 로 붙여
+actor / action sketch 와 날짜별 actor HLL 을 out/sketches.json 에 저장한다.
+"""
+import base64
+import json
+import math
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    from src.atomic_writer import AtomicWriter
+    from src.event_store import newer_than_alerts
+except ImportError:  # python src/xxx.py 로 직접 실행한 경우
+    from atomic_writer import AtomicWriter
+    from event_store import newer_than_alerts
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+OUT_DIR = ROOT_DIR / "out"
+SKETCHES_PATH = OUT_DIR / "sketches.json"
+
+HASH_KEY = "cloudforensic-sk"   # hash_array 의 16자 키 (바꾸면 저장된 HLL 과 합칠 수 없음)
+
+# 기본 크기: CMS 4 × 32768 (int64 1MB) → ε ≈ 8.3e-5, δ ≈ 1.8%
+#            heavy hitter 10000 개, HLL 2^14 레지스터 (16KB, ±0.8%), 날짜별 HLL 2^12 (4KB, ±1.6%)
+CMS_WIDTH = 1 << 15
+CMS_DEPTH = 4
+TOP_K = 10_000
+HLL_P = 14
+DAILY_HLL_P = 12
+
+# alerts 행(ALERT_HEADER 순서) 인덱스
+_TIME, _ACTOR, _ACTION = 0, 1, 3
+
+
+def hash_keys(keys):
+    """
+    키 목록 → (행별 고유값 코드, 고유값, 고유값 64bit 해시, 고유값별 건수)
+    None / 빈 문자열은 코드 -1 (세지 않음). 해시는 고유값만 계산
+    """
+    codes, uniques = pd.factorize(np.asarray(keys, dtype=object))
+    uniques = np.asarray(uniques, dtype=object)
+    empty = np.flatnonzero(uniques == "")
+    if len(empty):
+        codes = np.where(codes == empty[0], -1, codes)
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    hashes = pd.util.hash_array(uniques, hash_key=HASH_KEY) if len(uniques) else \
+        np.zeros(0, dtype=np.uint64)
+    return codes, uniques, hashes, counts
+
+
+# ==========================
+# 🧮 Count-Min Sketch
+# ==========================
+
+class CountMinSketch:
+    """depth × width int64 카운터, 64bit 해시 하나로 double hashing (h1 + i·h2) mod width"""
+
+    def __init__(self, width=CMS_WIDTH, depth=CMS_DEPTH):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self.total = 0
+
+    def _columns(self, hashes):
+        h1 = (hashes & np.uint64(0xFFFFFFFF)).astype(np.int64)
+        h2 = (hashes >> np.uint64(32)).astype(np.int64) | 1
+        return [(h1 + i * h2) % self.width for i in range(self.depth)]
+
+    def add_hashed(self, hashes, counts):
+        for row, cols in zip(self.table, self._columns(hashes)):
+            np.add.at(row, cols, counts)
+        self.total += int(np.sum(counts))
+
+    def query_hashed(self, hashes):
+        """키별 건수 추정 (실제 이상, 실제 + ε·N 이하)"""
+        est = [row[cols] for row, cols in zip(self.table, self._columns(hashes))]
+        return np.min(est, axis=0)
+
+    def f2(self):
+        """
+        건수 제곱합 F2 추정: 행 제곱합 S 의 기댓값이 F2 + (N² - F2) / width 이므로
+        (width·S - N²) / (width - 1) 로 충돌분을 빼고 행들의 중앙값
+        """
+        n = float(self.total)
+        sq = np.sum(self.table.astype(np.float64) ** 2, axis=1)
+        est = (self.width * sq - n * n) / (self.width - 1)
+        return max(float(np.median(est)), n)
+
+    def merge(self, other):
+        self.table += other.table
+        self.total += other.total
+        return self
+
+    @property
+    def epsilon(self):
+        return math.e / self.width
+
+    @property
+    def delta(self):
+        return math.exp(-self.depth)
+
+
+# ==========================
+# 🔝 Space-Saving (heavy hitters)
+# ==========================
+
+class SpaceSaving:
+    """
+    Space-Saving heavy hitter 요약: 키 최대 k 개의 (count, error)
+    묶음 단위로 받은 정확한 건수를 요약에 merge 한다 (mergeable summaries 방식).
+      - 이미 있는 키 : count += 묶음 건수
+      - 새 키        : count = floor + 묶음 건수, error = floor
+        (floor = 요약이 가득 찼을 때의 최소 count, 요약에 없는 키의 실제 건수 상한)
+      - count 상위 k 개만 남김
+    count - error ≤ 실제 ≤ count 이고, 실제 건수가 floor 보다 큰 키는 반드시 요약에 있다.
+    """
+
+    def __init__(self, k=TOP_K):
+        self.k = k
+        self.keys = np.empty(0, dtype=object)
+        self.count = np.zeros(0, dtype=np.int64)
+        self.error = np.zeros(0, dtype=np.int64)
+        self.total = 0
+
+    @property
+    def floor(self):
+        return int(self.count.min()) if len(self.count) >= self.k else 0
+
+    def _combine(self, keys, count, error, other_floor):
+        """(keys, count, error) 요약과 합치기 — 한쪽에만 있는 키는 다른 쪽 floor 를 더함"""
+        mine = self.floor
+        pos = pd.Index(self.keys).get_indexer(keys)
+        hit = pos >= 0
+        own_count = self.count + other_floor
+        own_error = self.error + other_floor
+        # 양쪽에 다 있는 키는 다른 쪽 floor 대신 실제 count / error
+        own_count[pos[hit]] += count[hit] - other_floor
+        own_error[pos[hit]] += error[hit] - other_floor
+        new = ~hit
+        all_keys = np.concatenate([self.keys, keys[new]])
+        all_count = np.concatenate([own_count, count[new] + mine])
+        all_error = np.concatenate([own_error, error[new] + mine])
+        if len(all_keys) > self.k:
+            top = np.argpartition(-all_count, self.k - 1)[:self.k]
+            all_keys, all_count, all_error = all_keys[top], all_count[top], all_error[top]
+        self.keys, self.count, self.error = all_keys, all_count, all_error
+
+    def add_counts(self, keys, counts):
+        """묶음의 (고유 키, 정확한 건수) 반영 (건수 0 인 키는 무시)"""
+        keep = counts > 0
+        keys = np.asarray(keys, dtype=object)[keep]
+        counts = np.asarray(counts, dtype=np.int64)[keep]
+        self.total += int(counts.sum())
+        self._combine(keys, counts, np.zeros(len(keys), dtype=np.int64), 0)
+
+    def merge(self, other):
+        self.total += other.total
+        self._combine(other.keys, other.count, other.error, other.floor)
+        return self
+
+    def items(self):
+        """(key, count, error) 건수 내림차순"""
+        order = np.argsort(-self.count, kind="stable")
+        return list(zip(self.keys[order].tolist(), self.count[order].tolist(),
+                        self.error[order].tolist()))
+
+
+# ==========================
+# 🔢 HyperLogLog
+# ==========================
+
+class HyperLogLog:
+    """
+    2^p 개 uint8 레지스터. 해시 상위 p bit 로 레지스터를 고르고
+    나머지 (64 - p) bit 의 선행 0 개수 + 1 의 최댓값을 기록
+    (p ≥ 11 이면 나머지 bit 가 float64 로 정확히 표현되어 frexp 로 bit 길이를 바로 구함)
+    """
+
+    def __init__(self, p=HLL_P, registers=None):
+        self.p = p
+        self.registers = (np.zeros(1 << p, dtype=np.uint8) if registers is None
+                          else np.asarray(registers, dtype=np.uint8))
+
+    def add_hashed(self, hashes):
+        if not len(hashes):
+            return
+        p = self.p
+        idx = (hashes >> np.uint64(64 - p)).astype(np.int64)
+        rest = hashes & np.uint64((1 << (64 - p)) - 1)
+        _, bits = np.frexp(rest.astype(np.float64))   # rest 의 bit 길이 (0 이면 0)
+        rank = ((64 - p) - bits + 1).astype(np.uint8)
+        np.maximum.at(self.registers, idx, rank)
+
+    def estimate(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        est = alpha * m * m / float(np.sum(np.ldexp(1.0, -self.registers.astype(np.int64))))
+        if est <= 2.5 * m:
+            zeros = int(np.count_nonzero(self.registers == 0))
+            if zeros:
+                est = m * math.log(m / zeros)   # 적을 때는 linear counting
+        return est
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    @property
+    def error(self):
+        """상대 표준오차"""
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def to_json(self):
+        return {"p": self.p, "registers": base64.b64encode(self.registers.tobytes()).decode("ascii")}
+
+    @classmethod
+    def from_json(cls, data):
+        regs = np.frombuffer(base64.b64decode(data["registers"]), dtype=np.uint8).copy()
+        return cls(data["p"], regs)
+
+
+# ==========================
+# 📈 키 하나의 빈도 sketch 묶음
+# ==========================
+
+class FrequencySketch:
+    """한 컬럼(actor / action)의 CMS + Space-Saving + HLL"""
+
+    def __init__(self, width=CMS_WIDTH, depth=CMS_DEPTH, k=TOP_K, p=HLL_P):
+        self.cms = CountMinSketch(width, depth)
+        self.top = SpaceSaving(k)
+        self.hll = HyperLogLog(p)
+
+    def add_many(self, keys):
+        self.add_hashed(*hash_keys(keys)[1:])
+
+    def add_hashed(self, uniques, hashes, counts):
+        valid = counts > 0
+        self.cms.add_hashed(hashes[valid], counts[valid])
+        self.hll.add_hashed(hashes[valid])
+        self.top.add_counts(uniques, counts)
+
+    @property
+    def total(self):
+        return self.cms.total
+
+    def distinct(self):
+        return self.hll.estimate()
+
+    def heavy_hitters(self):
+        """
+        Space-Saving 후보 → DataFrame(key, count, error)
+        count 는 Space-Saving count 와 CMS 추정 중 작은 값 (둘 다 과대추정이라 더 좁은 상한)
+        """
+        items = self.top.items()
+        if not items:
+            return pd.DataFrame(columns=["key", "count", "error"])
+        keys = np.array([k for k, _, _ in items], dtype=object)
+        ss = np.array([c for _, c, _ in items], dtype=np.int64)
+        err = np.array([e for _, _, e in items], dtype=np.int64)
+        cms = self.cms.query_hashed(pd.util.hash_array(keys, hash_key=HASH_KEY))
+        count = np.minimum(ss, cms)
+        df = pd.DataFrame({"key": keys, "count": count, "error": count - np.maximum(ss - err, 0)})
+        return df.sort_values("count", ascending=False, kind="stable", ignore_index=True)
+
+    def moments(self):
+        """(고유 키 수, 키당 평균 건수, 건수 표준편차) 추정 — scipy.stats.zscore 와 같은 모집단 표준편차"""
+        n = self.total
+        d = max(self.distinct(), 1.0)
+        mean = n / d
+        var = max(self.cms.f2() / d - mean * mean, 0.0)
+        return d, mean, math.sqrt(var)
+
+    def zscores(self):
+        """heavy hitter 후보의 근사 Z-score → DataFrame(key, count, zscore)"""
+        df = self.heavy_hitters()
+        _, mean, std = self.moments()
+        df["zscore"] = (df["count"] - mean) / std if std > 0 else 0.0
+        return df[["key", "count", "zscore"]]
+
+    def summary(self, n=20):
+        d, mean, std = self.moments()
+        return {
+            "events": self.total,
+            "distinct": round(d),
+            "mean": mean,
+            "std": std,
+            "hll": self.hll.to_json(),
+            "top": [list(t) for t in self.top.items()[:n]],
+            "bounds": {"cms_epsilon": self.cms.epsilon, "cms_delta": self.cms.delta,
+                       "top_k": self.top.k, "top_floor": self.top.floor,
+                       "hll_error": self.hll.error},
+        }
+
+
+# ==========================
+# ✏️ 알림 패스 sink
+# ==========================
+
+class SketchBuilder:
+    """
+    generate_alerts 의 sink: actor / action FrequencySketch + 날짜별 actor HLL
+    메모리는 키 종류 수와 무관 (CMS 2개 + heavy hitter 2 × k 개 + 날짜 수 × 4KB)
+    """
+
+    def __init__(self, k=TOP_K):
+        self.actors = FrequencySketch(k=k)
+        self.actions = FrequencySketch(k=k)
+        self.daily = {}    # 'YYYY-MM-DD' → HyperLogLog
+
+    def write_rows(self, rows):
+        codes, uniques, hashes, counts = hash_keys([r[_ACTOR] for r in rows])
+        self.actors.add_hashed(uniques, hashes, counts)
+        self.actions.add_many([r[_ACTION] for r in rows])
+
+        # 날짜별 HLL: 묶음 안의 날짜는 몇 개뿐이므로 날짜마다 해당 행의 actor 해시를 넣음
+        day_codes, days = pd.factorize(np.asarray([(r[_TIME] or "")[:10] for r in rows], dtype=object))
+        has_actor = codes >= 0
+        for j, day in enumerate(days.tolist()):
+            rows_of_day = codes[(day_codes == j) & has_actor]
+            if len(day) != 10 or not len(rows_of_day):
+                continue
+            hll = self.daily.get(day)
+            if hll is None:
+                hll = self.daily[day] = HyperLogLog(DAILY_HLL_P)
+            hll.add_hashed(hashes[np.unique(rows_of_day)])
+
+    def close(self, path=SKETCHES_PATH):
+        data = {
+            "actors": self.actors.summary(),
+            "actions": self.actions.summary(),
+            "daily_actors": {d: h.to_json() for d, h in sorted(self.daily.items())},
+        }
+        with AtomicWriter(path, text=True) as f:
+            json.dump(data, f, ensure_ascii=False)
+        return path
+
+
+# ==========================
+# 📖 읽기
+# ==========================
+
+def load_sketches(path=SKETCHES_PATH):
+    """저장된 sketch (없거나 alerts 보다 오래됐으면 None)"""
+    if not newer_than_alerts(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def heavy_hitters(sketches, dim="actors"):
+    """저장된 heavy hitter 후보 키 (건수 내림차순, summary 에 남긴 상위 n 개)"""
+    return [t[0] for t in (sketches.get(dim) or {}).get("top", []) if t[0]]
+
+
+def unique_actors(sketches, date_from=None, date_to=None):
+    """
+    날짜 범위(포함, 'YYYY-MM-DD' 또는 date)의 고유 actor 수 추정 → (추정값, 상대 표준오차)
+    날짜별 HLL 을 합집합(레지스터 최댓값)으로 merge
+    """
+    merged = None
+    for day, data in sketches.get("daily_actors", {}).items():
+        if (date_from and day < str(date_from)) or (date_to and day > str(date_to)):
+            continue
+        hll = HyperLogLog.from_json(data)
+        merged = hll if merged is None else merged.merge(hll)
+    if merged is None:
+        return 0, 0.0
+    return round(merged.estimate()), merged.error
@@ -0,0 +1,96 @@
+"""
+위험도 상위 / 최신 이벤트 top-k (정렬 없는 스트리밍 선택)
+
+generate_alerts 가 알림 행을 만드는 같은 패스에서 크기 k 의 힙 두 개로
+  - risky  : risk_score 상위 k 건 (같은 점수면 먼저 나온 행)
+  - recent : time 최신 k 건 (같은 시각이면 나중에 나온 행)
+을 골라 out/top_events.json 에 저장한다. O(n log k), 메모리 O(k).
+
+리포트 / 대시보드는 전체 alerts 를 읽고 정렬하는 대신 이 파일만 읽는다.
+"""
+import json
+from heapq import heappush, heappushpop
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    from src.atomic_writer import AtomicWriter
+    from src.event_store import newer_than_alerts
+except ImportError:  # python src/xxx.py 로 직접 실행한 경우
+    from atomic_writer import AtomicWriter
+    from event_store import newer_than_alerts
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+OUT_DIR = ROOT_DIR / "out"
+TOP_EVENTS_PATH = OUT_DIR / "top_events.json"
+
+COLUMNS = ["time", "actor", "service", "action", "result", "risk_score", "reason",
+           "region", "account"]
+TOP_K = 50
+
+# alerts 행(ALERT_HEADER 순서) 인덱스
+_TIME, _RISK = 0, 5
+_NO_RISK = float("-inf")   # risk_score 가 없는 행은 맨 뒤로
+
+
+class TopEventsBuilder:
+    """
+    write_rows(rows) 로 alerts 행을 받아 위험도 / 시간 기준 상위 k 건만 힙에 유지.
+    힙이 찬 뒤에는 최솟값보다 작은 행은 비교 한 번으로 건너뛴다.
+    """
+
+    def __init__(self, k=TOP_K):
+        self.k = k
+        self.seq = 0
+        # (risk, -seq, row) / (time, seq, row) 최소 힙 → 루트가 다음에 밀려날 행
+        self.risky = []
+        self.recent = []
+
+    def write_rows(self, rows):
+        k, risky, recent = self.k, self.risky, self.recent
+        seq = self.seq
+        for r in rows:
+            seq += 1
+            risk = r[_RISK]
+            if risk is None:
+                risk = _NO_RISK
+            if len(risky) < k:
+                heappush(risky, (risk, -seq, r))
+            elif risk >= risky[0][0]:
+                heappushpop(risky, (risk, -seq, r))
+            t = r[_TIME] or ""
+            if len(recent) < k:
+                heappush(recent, (t, seq, r))
+            elif t >= recent[0][0]:
+                heappushpop(recent, (t, seq, r))
+        self.seq = seq
+
+    def result(self):
+        """{"total", "k", "risky", "recent"} (행은 컬럼 dict, 각각 순위 순)"""
+        def rows(heap):
+            return [dict(zip(COLUMNS, item[2])) for item in sorted(heap, reverse=True)]
+        return {"total": self.seq, "k": self.k,
+                "risky": rows(self.risky), "recent": rows(self.recent)}
+
+    def close(self, path=TOP_EVENTS_PATH):
+        with AtomicWriter(path, text=True) as f:
+            json.dump(self.result(), f, ensure_ascii=False, indent=2)
+        return path
+
+
+# ==========================
+# 📖 읽기
+# ==========================
+
+def load_top_events(path=TOP_EVENTS_PATH):
+    """저장된 top-k 결과 (없거나 alerts 보다 오래됐으면 None)"""
+    if not newer_than_alerts(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def top_frame(top, kind, n=5):
+    """load_top_events 결과에서 kind("risky" / "recent") 상위 n 건 → DataFrame"""
+    return pd.DataFrame(top[kind][:n], columns=COLUMNS)
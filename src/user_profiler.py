@@ -1,48 +1,387 @@
-import pandas as pd
+"""
+사용자 프로파일링 (out/user_summary.json)
+
+사용자별 건수 집계를 data/profile_state.json 에 상태로 보관하고
+(서비스 / 액션 / 리전 건수, 24시간 히스토그램, first/last seen)
+실행할 때마다 parsed_logs.jsonl 에서 지난번 이후 append 된 바이트 구간만 읽어 합친다.
+collector generation 이 바뀌었거나(parsed_logs 재조립) 읽었던 구간이 달라졌으면 처음부터 다시 계산.
+새 구간이 크면 줄 경계로 나눠 프로세스 풀에서 부분 상태를 만들고 순서대로 merge 한다.
+user_summary.json 은 이 상태를 정렬 / 자르기만 한 결과다.
+since 를 주면 (main.py 의 CF_SINCE) 그 시각 이후 이벤트만으로 저장하지 않는 임시 상태를 만들어서
+리포트의 다른 섹션과 같은 기간의 사용자만 요약한다.
+
+    python src/user_profiler.py [--full] [--workers 4] [--since 24h]
+"""
+import argparse
 import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+try:
+    from src.event_store import load_alerts
+    from src.atomic_writer import AtomicWriter
+    from src.log_analyzer import PARSED_PATH, iter_event_frames
+    from src.log_collector import collector_generation, complete_size, prefix_fingerprint
+    from src.retention import parse_since, partition_events, partition_files
+except ImportError:  # python src/user_profiler.py 로 직접 실행한 경우
+    from event_store import load_alerts
+    from atomic_writer import AtomicWriter
+    from log_analyzer import PARSED_PATH, iter_event_frames
+    from log_collector import collector_generation, complete_size, prefix_fingerprint
+    from retention import parse_since, partition_events, partition_files
 
 # 파일 경로
-ALERTS = Path(__file__).resolve().parent.parent / "out" / "alerts.csv"
-OUT_JSON = Path(__file__).resolve().parent.parent / "out" / "user_summary.json"
+ROOT_DIR = Path(__file__).resolve().parents[1]
+ALERTS = ROOT_DIR / "out" / "alerts.csv"
+OUT_JSON = ROOT_DIR / "out" / "user_summary.json"
+STATE_PATH = ROOT_DIR / "data" / "profile_state.json"
+
+# 상태 파일 형식이 바뀌면 올림 (다르면 처음부터 다시 계산)
+STATE_VERSION = 1
+
+# 6시간 단위 시간대 (hour // 6 → 라벨)
+HOUR_BINS = ["00-06", "06-12", "12-18", "18-24"]
+TOP_ACTIONS = 5
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+# 새 구간이 이보다 크면 프로세스 풀로 나눠 집계
+WORKERS = int(os.environ.get("PROFILER_WORKERS", "1"))
+PARALLEL_BYTES = 64 << 20
+
+PARSED_FIELDS = ["eventTime", "actor", "service", "action", "region"]
+
+
+def _counts_by_actor(codes, values, n_actors):
+    """
+    actor 코드별 values 건수 (결측값 제외) → actor 코드 순서의 dict 리스트
+    dict 는 값이 처음 나온 순서 (groupby 한 번으로 모든 actor 를 처리)
+    """
+    result = [{} for _ in range(n_actors)]
+    mask = (codes >= 0) & values.notna().to_numpy()
+    if not mask.any():
+        return result
+    sub = pd.DataFrame({"a": codes[mask], "v": values[mask].to_numpy()})
+    # sort=False → (actor, 값) 조합이 처음 나온 순서
+    table = sub.groupby(["a", "v"], sort=False).size()
+    for (a, v), n in zip(table.index.tolist(), table.tolist()):
+        result[a][v] = n
+    return result
+
+
+def _utc_times(times):
+    """
+    ISO8601 시각 문자열 Series → UTC 기준 datetime (tz 없음, 파싱 실패는 NaT)
+    CloudTrail 의 '...Z' 시각은 Z 를 떼고 고정 형식으로 빠르게 파싱하고,
+    그 형식이 아닌 값(소수점 초, +09:00 오프셋 등)만 pd.to_datetime(utc=True) 일반 파싱
+    """
+    parsed = pd.to_datetime(times.str.removesuffix("Z"), format="%Y-%m-%dT%H:%M:%S", errors="coerce")
+    retry = parsed.isna() & times.notna()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(times[retry], utc=True, errors="coerce",
+                                       format="ISO8601").dt.tz_localize(None)
+    return parsed
+
+
+def _ranked(counts, head=None):
+    """건수 내림차순 dict (같으면 먼저 나온 값 먼저) = value_counts().head(head).to_dict()"""
+    items = sorted(counts.items(), key=lambda kv: -kv[1])
+    return dict(items[:head] if head is not None else items)
+
+
+def _earlier(a, b):
+    if a is None or b is None:
+        return a if b is None else b
+    return min(a, b)
+
+
+def _later(a, b):
+    if a is None or b is None:
+        return a if b is None else b
+    return max(a, b)
+
+
+# ==========================
+# 🧮 합칠 수 있는 프로파일 상태
+# ==========================
+
+class ProfileState:
+    """
+    사용자별 누적 건수
+      actors[actor] = {"total", "services", "actions", "regions",
+                       "hours" (UTC 0~23시 24칸), "first_seen", "last_seen"}
+    services / actions / regions 는 자르지 않은 전체 건수이고 값이 처음 나온 순서를 유지하므로
+    이벤트 순서대로 나눈 부분 상태들을 같은 순서로 merge 하면 한 번에 집계한 것과 같다.
+    """
+
+    def __init__(self, has_region=False):
+        self.actors = {}
+        self.has_region = has_region   # region 컬럼이 있는 데이터였는지 (없으면 요약에서 생략)
+
+    @classmethod
+    def from_frame(cls, df):
+        """alerts 형태 DataFrame(time, actor, service, action[, region]) → 상태 (벡터화 집계)"""
+        state = cls(has_region="region" in df.columns)
+        codes, actors = pd.factorize(df["actor"], sort=False)
+        n = len(actors)
+        if n == 0:
+            return state
+        totals = np.bincount(codes[codes >= 0], minlength=n).tolist()
 
-def extract_hour(timestamp):
-    """이벤트 발생 시각에서 시(hour)만 추출"""
+        services = _counts_by_actor(codes, df["service"], n)
+        actions = _counts_by_actor(codes, df["action"], n)
+        regions = (_counts_by_actor(codes, df["region"], n) if state.has_region
+                   else [{} for _ in range(n)])
+
+        # 시간 통계: actor × 24시간 건수, actor 별 최초 / 최근 시각
+        times = _utc_times(df["time"].astype("str"))
+        ok = (codes >= 0) & times.notna().to_numpy()
+        ok_codes = codes[ok]
+        hours = times[ok].dt.hour.to_numpy().astype(np.int64)
+        hour_counts = np.bincount(ok_codes * 24 + hours, minlength=n * 24).reshape(n, 24).tolist()
+        seen = times[ok].groupby(ok_codes)
+        first = seen.min().dt.strftime(TIME_FORMAT).to_dict()
+        last = seen.max().dt.strftime(TIME_FORMAT).to_dict()
+
+        for i, actor in enumerate(actors.tolist()):
+            state.actors[actor] = {
+                "total": totals[i],
+                "services": services[i],
+                "actions": actions[i],
+                "regions": regions[i],
+                "hours": hour_counts[i],
+                "first_seen": first.get(i),
+                "last_seen": last.get(i),
+            }
+        return state
+
+    def merge(self, other):
+        """other(이 상태 뒤에 오는 이벤트들의 상태)를 합침, self 반환"""
+        self.has_region = self.has_region or other.has_region
+        for actor, o in other.actors.items():
+            p = self.actors.get(actor)
+            if p is None:
+                self.actors[actor] = {k: (v.copy() if isinstance(v, (dict, list)) else v)
+                                      for k, v in o.items()}
+                continue
+            p["total"] += o["total"]
+            for key in ("services", "actions", "regions"):
+                counts = p[key]
+                for v, n in o[key].items():
+                    counts[v] = counts.get(v, 0) + n
+            p["hours"] = [a + b for a, b in zip(p["hours"], o["hours"])]
+            p["first_seen"] = _earlier(p["first_seen"], o["first_seen"])
+            p["last_seen"] = _later(p["last_seen"], o["last_seen"])
+        return self
+
+    def to_summary(self):
+        """user_summary.json 내용 (actor 이름순, 서비스/리전은 건수순 전체, 액션은 상위 5개)"""
+        profiles = {}
+        for actor in sorted(self.actors):
+            p = self.actors[actor]
+            profile = {
+                "total_events": p["total"],
+                "services": _ranked(p["services"]),
+                "actions": _ranked(p["actions"], TOP_ACTIONS),  # 상위 5개
+            }
+            # 리전 통계 (있을 경우만)
+            if self.has_region:
+                profile["regions"] = _ranked(p["regions"])
+            bins = [sum(p["hours"][h:h + 6]) for h in range(0, 24, 6)]
+            if sum(bins):
+                profile["time_distribution"] = dict(zip(HOUR_BINS, bins))
+            profiles[actor] = profile
+        return profiles
+
+    def save(self, path=STATE_PATH, **meta):
+        """상태 + meta(generation, offset, fingerprint) 를 JSON 으로 저장"""
+        data = {"version": STATE_VERSION, **meta, "has_region": self.has_region,
+                "actors": self.actors}
+        # json.dump 는 조각마다 write 하므로 한 번에 문자열로 만들어 기록
+        with AtomicWriter(path, text=True) as f:
+            f.write(json.dumps(data, ensure_ascii=False))
+        return path
+
+
+def load_profile_state(path=STATE_PATH):
+    """저장된 상태 → (ProfileState, meta). 없거나 형식이 다르면 (None, {})"""
+    path = Path(path)
+    if not path.exists():
+        return None, {}
     try:
-        return datetime.fromisoformat(timestamp.replace("Z", "")).hour
-    except Exception:
-        return None
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        print(f"⚠ 프로파일 상태 파일을 읽을 수 없어 처음부터 다시 계산: {path}")
+        return None, {}
+    if data.get("version") != STATE_VERSION:
+        return None, {}
+    state = ProfileState(has_region=data.get("has_region", False))
+    state.actors = data.get("actors", {})
+    meta = {k: data.get(k) for k in ("generation", "offset", "fingerprint")}
+    return state, meta
+
+
+def build_profiles(df):
+    """
+    alerts DataFrame(time, actor, service, action[, region]) → 사용자별 프로파일 dict
+    actor 별 groupby 루프 / 행마다 datetime 파싱 없이 상태 한 번 집계 후 요약
+    """
+    return ProfileState.from_frame(df).to_summary()
+
+
+# ==========================
+# 📥 parsed_logs.jsonl 증분 집계
+# ==========================
+
+def _profile_frame(df):
+    """
+    parsed_logs 묶음 → alerts.csv 를 읽은 것과 같은 (time, actor, service, action, region)
+    (log_analyzer 의 알림 행 기본값 규칙과 같게, 빈 문자열은 결측값)
+    """
+    def column(name, default=""):
+        if name not in df.columns:
+            return pd.Series(default, index=df.index, dtype=object)
+        return df[name].fillna(default)
+
+    action = column("action")
+    frame = pd.DataFrame({
+        "time": column("eventTime"),
+        "actor": column("actor", "Unknown"),
+        "service": column("service").str.strip().str.lower(),
+        "action": action.where(action != "", "Unknown"),
+        "region": column("region"),
+    })
+    return frame.mask(frame == "")
 
-def generate_user_profile():
-    df = pd.read_csv(ALERTS)
-    profiles = {}
 
-    for user, group in df.groupby("actor"):
-        profile = {
-            "total_events": len(group),
-            "services": group["service"].value_counts().to_dict(),
-            "actions": group["action"].value_counts().head(5).to_dict(),  # 상위 5개
-        }
+def _split_lines(path, start, stop, parts):
+    """[start, stop) 를 줄 경계 기준으로 대략 parts 등분한 경계 목록"""
+    bounds = [start]
+    with open(path, "rb") as f:
+        for i in range(1, parts):
+            f.seek(start + (stop - start) * i // parts - 1)
+            f.readline()
+            pos = min(f.tell(), stop)
+            if pos > bounds[-1]:
+                bounds.append(pos)
+    if stop > bounds[-1]:
+        bounds.append(stop)
+    return bounds
 
-        # 리전 통계 (있을 경우만)
-        if "region" in group.columns:
-            profile["regions"] = group["region"].value_counts().to_dict()
 
-        # 시간대 통계
-        hours = group["time"].dropna().apply(extract_hour).dropna()
-        if not hours.empty:
-            hour_bins = pd.cut(hours, bins=[0,6,12,18,24], labels=["00-06","06-12","12-18","18-24"], right=False)
-            profile["time_distribution"] = hour_bins.value_counts().sort_index().to_dict()
+def _fold_range(args):
+    """(워커에서도 실행) parsed_logs 의 [start, stop) 구간 → ProfileState"""
+    path, start, stop = args
+    state = ProfileState(has_region=True)
+    for df in iter_event_frames(path, PARSED_FIELDS, start, stop):
+        state.merge(ProfileState.from_frame(_profile_frame(df)))
+    return state
 
-        profiles[user] = profile
+
+def fold_events(path, start, stop, workers=WORKERS):
+    """[start, stop) 구간 집계, 크면 줄 경계로 나눠 병렬 집계 후 순서대로 merge"""
+    if workers > 1 and stop - start >= PARALLEL_BYTES:
+        bounds = _split_lines(path, start, stop, workers)
+        jobs = [(path, a, b) for a, b in zip(bounds, bounds[1:])]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(_fold_range, jobs))
+        state = ProfileState(has_region=True)
+        for part in parts:
+            state.merge(part)
+        return state
+    return _fold_range((path, start, stop))
+
+
+def update_profile_state(path=PARSED_PATH, state_path=STATE_PATH, workers=WORKERS, full=False):
+    """
+    저장된 상태에 parsed_logs 의 새 구간만 합쳐서 저장
+    반환값: (ProfileState, {"rebuilt", "new_bytes", "offset"})
+    """
+    path = Path(path)
+    stop = complete_size(path)
+    # generation 은 collector 가 관리하는 parsed_logs.jsonl 에만 있음 (다른 파일은 fingerprint 로만 확인)
+    generation = collector_generation() if path == PARSED_PATH else None
+
+    state, meta = (None, {}) if full else load_profile_state(state_path)
+    start = meta.get("offset") or 0
+    rebuilt = (state is None or meta.get("generation") != generation or start > stop
+               or meta.get("fingerprint") != prefix_fingerprint(path, start))
+    if rebuilt:
+        state, start = ProfileState(has_region=True), 0
+
+    if stop > start or rebuilt:
+        state.merge(fold_events(path, start, stop, workers))
+        state.save(state_path, generation=generation, offset=stop,
+                   fingerprint=prefix_fingerprint(path, stop))
+    return state, {"rebuilt": rebuilt, "new_bytes": stop - start, "offset": stop}
+
+
+def profile_since(since):
+    """
+    since (UTC datetime) 이후 이벤트만으로 만든 ProfileState (상태 파일에는 저장하지 않음)
+    그 날짜 이후의 일별 파티션(data/partitions/)만 읽고 eventTime 으로 한 번 더 거름
+    """
+    partition_events()
+    since_text = since.strftime("%Y-%m-%dT%H:%M:%S")
+    state = ProfileState(has_region=True)
+    for path in partition_files(since=since):
+        for df in iter_event_frames(path, PARSED_FIELDS):
+            if "eventTime" not in df.columns:
+                continue
+            df = df[df["eventTime"].fillna("").astype(str) >= since_text]
+            if not df.empty:
+                state.merge(ProfileState.from_frame(_profile_frame(df)))
+    return state
+
+
+def generate_user_profile(df=None, out_path=OUT_JSON, full=False, workers=WORKERS, since=None):
+    """
+    df 가 없으면 parsed_logs.jsonl 기준 프로파일 상태를 증분 갱신해서 out/user_summary.json 생성
+    (parsed_logs 가 없으면 전체 alerts 로)
+    계정별 프로파일은 src/accounts.py 가 계정 alerts 와 out_path 를 넘겨서 호출
+    full=True 면 저장된 상태를 무시하고 처음부터 다시 계산
+    since (UTC datetime) 를 주면 그 시각 이후 이벤트만으로 (저장된 상태는 건드리지 않음)
+    """
+    started = time.perf_counter()
+    if df is not None:
+        profiles = build_profiles(df)
+    elif since is not None and PARSED_PATH.exists():
+        state = profile_since(since)
+        profiles = state.to_summary()
+        print(f"   {since:%Y-%m-%d %H:%M} UTC 이후 이벤트만 프로파일링 ({len(state.actors)} actors)")
+    elif PARSED_PATH.exists():
+        state, info = update_profile_state(workers=workers, full=full)
+        profiles = state.to_summary()
+        mode = "rebuilt" if info["rebuilt"] else "incremental"
+        print(f"   프로파일 상태 {mode}: +{info['new_bytes']:,} bytes "
+              f"({len(state.actors)} actors) → {STATE_PATH}")
+    else:
+        profiles = build_profiles(load_alerts(columns=["time", "actor", "service", "action", "region"]))
 
     # 저장
-    OUT_JSON.parent.mkdir(parents=True, exist_ok=True)
-    with open(OUT_JSON, "w", encoding="utf-8") as f:
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(out_path, "w", encoding="utf-8") as f:
         json.dump(profiles, f, indent=4, ensure_ascii=False)
 
-    print(f"✅ 사용자 프로파일링 완료 → {OUT_JSON}")
+    print(f"✅ 사용자 프로파일링 완료 → {out_path} ({time.perf_counter() - started:.2f}s)")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="사용자 프로파일링 (user_summary.json)")
+    ap.add_argument("--full", action="store_true", help="저장된 상태를 무시하고 처음부터 다시 계산")
+    ap.add_argument("--workers", type=int, default=WORKERS, help="새 구간이 클 때 병렬 프로세스 수")
+    ap.add_argument("--since", default=os.environ.get("CF_SINCE"),
+                    help="이 시각 이후 이벤트만 프로파일링 (24h, 7d, 2025-11-20 …, 기본: 환경변수 CF_SINCE 또는 전체)")
+    args = ap.parse_args()
+    since = parse_since(args.since) if args.since else None
+    generate_user_profile(full=args.full, workers=args.workers, since=since)
+
 
 if __name__ == "__main__":
-    generate_user_profile()
+    main()
@@ -1,41 +1,238 @@
+import os
 import time
-import subprocess
+import queue
+import argparse
+import threading
+from pathlib import Path
+
+import matplotlib
+matplotlib.use("Agg")   # 리포트 그래프를 워커 스레드에서 그리므로 GUI 백엔드 사용 안 함
+
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
-from pathlib import Path
 
-# 감시할 폴더 (raw_logs)
+try:
+    from src.log_collector import collect_logs, complete_size, iter_shard_lines, OUT_PATH as PARSED_PATH
+    from src.log_analyzer import analyze_logs
+    from src.report_generator import generate_report
+    from src.online_detector import OnlineAnomalyDetector
+    from src.log_discovery import is_raw_log_name
+    from src.serializer import loads, DecodeError
+except ImportError:  # python src/watcher.py 로 직접 실행한 경우
+    from log_collector import collect_logs, complete_size, iter_shard_lines, OUT_PATH as PARSED_PATH
+    from log_analyzer import analyze_logs
+    from report_generator import generate_report
+    from online_detector import OnlineAnomalyDetector
+    from log_discovery import is_raw_log_name
+    from serializer import loads, DecodeError
+
+# 감시할 폴더 (raw_logs, 하위 폴더 포함)
 WATCH_DIR = Path(__file__).resolve().parent.parent / "data" / "raw_logs"
-print(f"👀 Monitoring folder: {WATCH_DIR}")
 
-# 순서대로 실행할 스크립트
-SCRIPTS = [
-    "log_collector.py",
-    "log_analyzer.py",
-    "report_generator.py"
-]
+# 마지막 파일 이벤트 후 이만큼 조용하면 모아둔 파일들을 한 번에 처리 (초)
+DEBOUNCE_SEC = float(os.environ.get("WATCHER_DEBOUNCE_SEC", "2.0"))
+# 파일이 계속 들어와도 이 시간이 지나면 일단 처리 (초)
+MAX_BATCH_WAIT_SEC = float(os.environ.get("WATCHER_MAX_WAIT_SEC", "30.0"))
+
+
+def is_log_file(path):
+    """감시 대상 raw 로그인지 (.json / .json.gz, Digest·임시파일 제외)"""
+    return is_raw_log_name(os.path.basename(path))
+
 
 class LogHandler(FileSystemEventHandler):
+    """
+    watchdog 스레드에서는 경로만 큐에 넣고 바로 리턴.
+    (s3_downloader 는 .part 에 쓰고 rename 하므로 moved 이벤트도 받음)
+    """
+
+    def __init__(self, events):
+        super().__init__()
+        self.events = events
+
+    def _push(self, path):
+        if is_log_file(path):
+            self.events.put(path)
+
     def on_created(self, event):
-        if event.is_directory or not event.src_path.endswith(".json"):
-            return
-        print(f"\n🟢 새 로그 감지됨: {event.src_path}")
+        if not event.is_directory:
+            self._push(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self._push(event.dest_path)
+
+
+# ==========================
+# 🔁 상주 파이프라인
+# ==========================
+
+def _sorted_events(lines):
+    """JSONL 줄들 → eventTime 순으로 정렬한 이벤트 dict 목록 (깨진 줄은 건너뜀)"""
+    events = []
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            events.append(loads(line))
+        except DecodeError:
+            continue
+    events.sort(key=lambda e: str(e.get("eventTime") or ""))
+    return events
+
+
+class Pipeline:
+    """
+    collector → 온라인 이상탐지 → analyzer → report 를 같은 프로세스에서 함수 호출로 실행.
+    모듈 import / 규칙 엔진 컴파일은 한 번만 하고,
+    온라인 탐지기는 시작할 때 이미 있던 이벤트로 기준선만 채운 뒤(warm_up)
+    parsed_logs.jsonl 에서 이미 읽은 위치(offset) 이후의 새 줄만 받는다.
+    """
+
+    def __init__(self, report=True):
+        self.report = report
+        self.detector = OnlineAnomalyDetector()
+        self.offset = 0
+        self.generation = None
+
+    def _new_lines(self, end):
+        """parsed_logs.jsonl 의 offset ~ end 구간 줄"""
+        with PARSED_PATH.open("rb") as f:
+            f.seek(self.offset)
+            while f.tell() < end:
+                line = f.readline()
+                if not line:
+                    break
+                yield line
+
+    def warm_up(self, generation):
+        """
+        parsed_logs.jsonl 에 이미 있는 이벤트로 기준선만 채움 (알림 없음).
+        파일은 raw 경로 순이라 시간순이 아니므로 eventTime 순으로 정렬해서 넣음
+        → 시작하자마자 과거 이력으로 🚨 를 찍거나, 시각이 오락가락해서 late 로 버리지 않음
+        (replay(sort=True) 처럼 전체를 메모리에 올림)
+        """
+        self.detector = OnlineAnomalyDetector()
+        self.generation = generation
+        self.offset = 0
+        if not PARSED_PATH.exists():
+            return 0
+        end = complete_size(PARSED_PATH)
+        events = _sorted_events(self._new_lines(end))
+        for evt in events:
+            for _ in self.detector.update(evt):
+                pass
+        self.offset = end
+        print(f"📚 온라인 탐지 기준선: 이벤트 {len(events)}건 (알림 없음, 늦게 도착 {self.detector.late}건)")
+        return len(events)
 
-        for script in SCRIPTS:
-            script_path = Path(__file__).resolve().parent / script
-            print(f"▶ 실행 중: {script_path.name}")
+    def feed_detector(self, summary):
+        """이번 수집에서 새로 들어온 이벤트만 eventTime 순으로 온라인 탐지기에 흘려보냄"""
+        if self.generation is None or summary["new_events"] >= summary["total_events"]:
+            # 처음이거나 전체를 다시 정규화한 경우 → 전부 과거 이력으로 보고 기준선만 다시 채움
+            self.warm_up(summary["generation"])
+            return 0
+        if not PARSED_PATH.exists():
+            return 0
+
+        end = complete_size(PARSED_PATH)
+        if summary["generation"] != self.generation:
+            # parsed_logs.jsonl 을 다시 조립함 (변경/삭제, 중간 경로에 끼어든 새 파일)
+            # → offset 으로는 새 줄을 알 수 없으므로 이번에 새로 정규화한 파일의 shard 만 읽음
+            #   (탐지기 상태는 그대로 유지)
+            lines = iter_shard_lines(summary["new_files"])
+            self.generation = summary["generation"]
+        else:
+            lines = self._new_lines(end)
+        events = _sorted_events(lines)
+        self.offset = end
+
+        found = 0
+        for evt in events:
+            for a in self.detector.update(evt):
+                found += 1
+                print(f"🚨 [online] {a['dimension']}={a['key']} {a['window']} "
+                      f"건수 {a['count']} (평균 {a['mean']}, Z={a['zscore']}) @ {a['time']}")
+        return found
+
+    def run(self, paths):
+        started = time.perf_counter()
+        print(f"\n🟢 새 로그 {len(paths)}개 감지됨 → 처리 시작")
+        timings = {}
+
+        t0 = time.perf_counter()
+        summary = collect_logs()
+        timings["collect"] = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        found = self.feed_detector(summary)
+        timings["online"] = time.perf_counter() - t0
+        if found:
+            print(f"🚨 온라인 이상탐지 {found}건")
+
+        if summary["new_events"] or summary["rebuilt"]:
+            t0 = time.perf_counter()
+            analyze_logs()
+            timings["analyze"] = time.perf_counter() - t0
+
+            if self.report:
+                t0 = time.perf_counter()
+                generate_report()
+                timings["report"] = time.perf_counter() - t0
+        else:
+            print("ℹ 새 이벤트 없음 → 분석/리포트 생략")
+
+        parts = ", ".join(f"{k} {v:.2f}s" for k, v in timings.items())
+        print(f"✅ 처리 완료 ({time.perf_counter() - started:.2f}s: {parts})\n")
+
+
+def _worker(events, pipeline, stop):
+    """
+    큐에서 파일 이벤트를 꺼내 DEBOUNCE_SEC 동안 더 모은 뒤 한 번에 처리.
+    (파일 500개가 한꺼번에 들어와도 파이프라인은 몇 번만 실행됨)
+    """
+    while not stop.is_set():
+        try:
+            first = events.get(timeout=0.5)
+        except queue.Empty:
+            continue
+
+        batch = {first}
+        deadline = time.monotonic() + MAX_BATCH_WAIT_SEC
+        while True:
+            timeout = min(DEBOUNCE_SEC, deadline - time.monotonic())
+            if timeout <= 0:
+                break
             try:
-                subprocess.run(["python", str(script_path)], check=True)
-            except subprocess.CalledProcessError as e:
-                print(f"❌ 오류: {e}")
+                batch.add(events.get(timeout=timeout))
+            except queue.Empty:
                 break
 
-        print("✅ 모든 분석 및 리포트 완료!\n")
+        try:
+            pipeline.run(sorted(batch))
+        except Exception as e:  # 한 배치가 실패해도 감시는 계속
+            print(f"❌ 오류: {e}")
+
 
 def main():
-    event_handler = LogHandler()
+    ap = argparse.ArgumentParser(description="raw_logs 감시 → 상주 프로세스에서 정규화/분석/리포트")
+    ap.add_argument("--no-report", action="store_true", help="PDF 리포트 생성 생략")
+    args = ap.parse_args()
+
+    WATCH_DIR.mkdir(parents=True, exist_ok=True)
+    print(f"👀 Monitoring folder: {WATCH_DIR}")
+
+    pipeline = Pipeline(report=not args.no_report)
+    # 시작 시점까지 쌓인 이벤트로 온라인 탐지 기준선을 채워둠 (알림 없음)
+    pipeline.warm_up(collect_logs()["generation"])
+
+    events = queue.Queue()
+    stop = threading.Event()
+    worker = threading.Thread(target=_worker, args=(events, pipeline, stop), daemon=True)
+    worker.start()
+
     observer = Observer()
-    observer.schedule(event_handler, str(WATCH_DIR), recursive=False)
+    observer.schedule(LogHandler(events), str(WATCH_DIR), recursive=True)
     observer.start()
     print("🚀 실시간 로그 감시 시작 (Ctrl+C로 종료)")
 
@@ -44,9 +241,12 @@ def main():
             time.sleep(1)
     except KeyboardInterrupt:
         observer.stop()
+        stop.set()
         print("🛑 감시 중단됨")
 
     observer.join()
+    worker.join()
+
 
 if __name__ == "__main__":
     main()